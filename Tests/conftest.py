@@ -9,8 +9,25 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
 from backend.config.settings import UPLOAD_DIR
+from backend.services.post_processing.registry import reset_post_processors
+from backend.services.storage.variants import variant_builder
 from backend.utils.logger import app_logger
 
+
+@pytest.fixture(autouse=True)
+def fresh_post_processors():
+    """Providers are built once and cached; tests patch their classes and keys, so start each test clean."""
+    reset_post_processors()
+    yield
+    reset_post_processors()
+
+
+@pytest.fixture(autouse=True)
+def drain_result_variants():
+    """Variants are built in the background; finish them before the next test patches storage paths."""
+    yield
+    variant_builder.wait(timeout=60)
+
 @pytest.fixture(autouse=True, scope="session")
 def clean_uploads_dir():
 
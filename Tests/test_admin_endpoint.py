@@ -0,0 +1,177 @@
+import pytest
+import asyncio
+import random
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+import os, sys, time, pathlib
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.utils.latency_sampler import QuantileSketch, RollingQuantiles, latency_sampler
+from backend.utils.metrics import track_provider
+from backend.utils.profiler import ProfileController, profile_controller
+from backend.middleware.profiling_middleware import ProfilingMiddleware
+
+
+# Test client setup
+test_client = TestClient(app)
+
+ADMIN_HEADERS = {"x-admin-token": "secret"}
+
+
+class DummyService:
+    def generate_image(self, prompt: str, image_path: str = None):
+        with track_provider("gemini", "generate_image"):
+            return "generated.png"
+
+
+class TestLatencySampler:
+    """Tests for the quantile sketch and rolling windows."""
+
+    def test_sketch_relative_accuracy(self):
+        rng = random.Random(7)
+        values = [rng.lognormvariate(0, 1) for _ in range(20000)]
+        sketch = QuantileSketch(alpha=0.01)
+        for value in values:
+            sketch.add(value)
+
+        values.sort()
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            assert abs(sketch.quantile(q) - exact) / exact < 0.02
+
+    def test_rolling_window_expires_old_slices(self):
+        rolling = RollingQuantiles(window=60, slices=6)
+        rolling.add(100.0, now=0)
+        rolling.add(1.0, now=55)
+        assert rolling.summary(now=55)["count"] == 2
+        assert rolling.summary(now=75)["count"] == 1
+        assert rolling.summary(now=75)["p99"] == pytest.approx(1.0, rel=0.02)
+
+
+class TestAdminLatencyEndpoint:
+    """Tests for the /admin latency endpoints."""
+
+    @pytest.fixture(autouse=True)
+    def admin_token(self):
+        with patch("backend.endpoints.admin.ADMIN_TOKEN", "secret"):
+            latency_sampler.reset()
+            yield
+            latency_sampler.reset()
+
+    def test_requires_token(self):
+        assert test_client.get("/admin/latency").status_code == 401
+        assert test_client.get("/admin/latency", headers={"x-admin-token": "wrong"}).status_code == 401
+
+    def test_disabled_without_configured_token(self):
+        with patch("backend.endpoints.admin.ADMIN_TOKEN", None):
+            assert test_client.get("/admin/latency", headers=ADMIN_HEADERS).status_code == 404
+
+    def test_percentiles_per_endpoint_and_stage(self):
+        with patch("backend.endpoints.generation.get_service", return_value=DummyService()):
+            for _ in range(5):
+                test_client.post("/generate", data={"prompt": "A sunset", "model": "gemini"})
+
+        data = test_client.get("/admin/latency", headers=ADMIN_HEADERS).json()
+        assert data["endpoints"]["POST /generate"]["count"] == 5
+        assert data["endpoints"]["POST /generate"]["p99"] is not None
+        assert data["stages"]["POST /generate"]["gemini.generate_image"]["count"] == 5
+
+    def test_slow_requests_are_captured(self):
+        with patch.object(latency_sampler, "threshold", 0.0), \
+             patch("backend.endpoints.generation.get_service", return_value=DummyService()):
+            response = test_client.post("/generate", data={"prompt": "A sunset", "model": "gemini"})
+
+        data = test_client.get("/admin/slow-requests", headers=ADMIN_HEADERS).json()
+        captured = [r for r in data["requests"] if r["endpoint"] == "POST /generate"]
+        assert len(captured) == 1
+        slow = captured[0]
+        assert slow["request_id"] == response.headers["x-request-id"]
+        assert len(slow["trace_id"]) == 32
+        assert slow["providers"] == ["gemini"]
+        assert slow["attributes"]["model"] == "gemini"
+        assert slow["request_bytes"] > 0
+        assert slow["response_bytes"] > 0
+        assert [s["name"] for s in slow["stages"]] == ["get_service", "gemini.generate_image", "get_results_uri"]
+
+    def test_reset(self):
+        test_client.get("/")
+        assert test_client.delete("/admin/latency", headers=ADMIN_HEADERS).status_code == 200
+        data = test_client.get("/admin/latency", headers=ADMIN_HEADERS).json()
+        assert "GET /" not in data["endpoints"]
+
+
+class SlowService:
+    def generate_image(self, prompt: str, image_path: str = None):
+        time.sleep(0.1)
+        return "generated.png"
+
+
+class TestProfiling:
+    """Tests for the on-demand sampling profiler."""
+
+    @pytest.fixture(autouse=True)
+    def admin_token(self, tmp_path):
+        with patch("backend.endpoints.admin.ADMIN_TOKEN", "secret"), \
+             patch.object(profile_controller, "output_dir", str(tmp_path)):
+            yield
+            profile_controller.stop()
+
+    def test_profiles_next_requests(self, tmp_path):
+        response = test_client.post("/admin/profile?requests=1", headers=ADMIN_HEADERS)
+        assert response.status_code == 202
+        name = response.json()["profile"]["name"]
+        assert test_client.post("/admin/profile", headers=ADMIN_HEADERS).status_code == 409
+
+        with patch("backend.endpoints.generation.get_service", return_value=SlowService()):
+            response = test_client.post("/generate", data={"prompt": "A sunset", "model": "gemini"})
+        assert response.headers["x-profile"] == name
+
+        # The budget is spent, so the session was written when the request finished
+        status = test_client.get("/admin/profile", headers=ADMIN_HEADERS).json()
+        assert status["armed"] is False and status["current"] is None
+        assert status["profiles"][0]["name"] == name
+        assert status["profiles"][0]["requests"] == 1
+        assert "x-profile" not in test_client.get("/").headers
+
+        collapsed = test_client.get(f"/admin/profile/{name}", headers=ADMIN_HEADERS).text
+        assert (tmp_path / name).read_text() == collapsed
+        assert "generate_image (backend/endpoints/generation.py" in collapsed
+        assert "generate_image (Tests/test_admin_endpoint.py" in collapsed
+
+    def test_stop_and_unknown_profile(self):
+        assert test_client.delete("/admin/profile", headers=ADMIN_HEADERS).status_code == 404
+        test_client.post("/admin/profile?seconds=60", headers=ADMIN_HEADERS)
+        response = test_client.delete("/admin/profile", headers=ADMIN_HEADERS)
+        assert response.status_code == 200
+        assert response.json()["profile"]["requests"] == 0
+        assert test_client.get("/admin/profile/../../etc/passwd", headers=ADMIN_HEADERS).status_code == 404
+        assert test_client.get("/admin/profile/missing.collapsed", headers=ADMIN_HEADERS).status_code == 404
+
+    def test_header_triggers_single_request(self, tmp_path):
+        controller = ProfileController(output_dir=str(tmp_path))
+
+        async def inner(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+        client = TestClient(ProfilingMiddleware(inner, token="secret", controller=controller))
+        assert "x-profile" not in client.get("/", headers={"x-profile-token": "wrong"}).headers
+        response = client.get("/", headers={"x-profile-token": "secret"})
+        assert response.headers["x-profile"] == controller.history[0]["name"]
+        assert controller.running is False
+        assert (tmp_path / response.headers["x-profile"]).exists()
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
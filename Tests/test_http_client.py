@@ -0,0 +1,251 @@
+import pytest
+import asyncio
+import httpx
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from types import SimpleNamespace
+from io import BytesIO
+import os, sys, pathlib
+from PIL import Image
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.config.settings import PICSART_UPSCALE_URL, PHOTOROOM_SEGMENT_URL
+from backend.services.storage.storage_factory import get_storage_service
+from backend.services.storage.variants import variant_builder
+from backend.utils import http_client
+from backend.utils.http_client import _HostLimitedTransport, get_http_client
+from backend.utils.google_drive_utils import get_public_link
+from googleapiclient.errors import HttpError
+
+
+# Test client setup
+test_client = TestClient(app)
+
+
+def make_png(width: int, height: int) -> bytes:
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class ConcurrencyProbe:
+    """Async MockTransport handler that records the peak number of requests in flight per host."""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.in_flight = {}
+        self.peak = {}
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        self.peak[host] = max(self.peak.get(host, 0), self.in_flight[host])
+        await asyncio.sleep(self.delay)
+        self.in_flight[host] -= 1
+        # Streamed like a real transport's response, so the client reads (and closes) it
+        return httpx.Response(200, stream=httpx.ByteStream(b"ok"))
+
+
+class ChunkedStream(httpx.AsyncByteStream):
+    """Response body delivered in fixed-size chunks."""
+
+    def __init__(self, content: bytes, chunk_size: int):
+        self.content = content
+        self.chunk_size = chunk_size
+
+    async def __aiter__(self):
+        for offset in range(0, len(self.content), self.chunk_size):
+            yield self.content[offset:offset + self.chunk_size]
+
+
+class TestSharedHttpClient:
+    """Tests for the process-wide client used by the post-processing providers."""
+
+    # ------------------------- CLIENT REUSE -------------------------
+
+    def test_one_client_per_event_loop(self):
+        async def get_twice():
+            first, second = get_http_client(), get_http_client()
+            assert first is second
+            await http_client.close_http_client()
+            return first
+
+        first = asyncio.run(get_twice())
+        assert asyncio.run(get_twice()) is not first
+        assert first.is_closed
+
+    def test_timeouts_are_split(self):
+        async def timeout():
+            client = get_http_client()
+            await http_client.close_http_client()
+            return client.timeout
+
+        timeout = asyncio.run(timeout())
+        assert timeout.connect == http_client.HTTP_CONNECT_TIMEOUT
+        assert timeout.read == http_client.HTTP_READ_TIMEOUT
+
+    # ------------------------- PER-HOST LIMIT -------------------------
+
+    def test_per_host_limit(self):
+        probe = ConcurrencyProbe()
+
+        async def burst():
+            async with httpx.AsyncClient(transport=_HostLimitedTransport(httpx.MockTransport(probe), 2)) as client:
+                urls = ["https://a.example/x"] * 6 + ["https://b.example/x"] * 3
+                responses = await asyncio.gather(*(client.get(url) for url in urls))
+            return [r.status_code for r in responses]
+
+        assert asyncio.run(burst()) == [200] * 9
+        assert probe.peak == {"a.example": 2, "b.example": 2}
+
+    def test_slot_held_until_body_closed(self):
+        async def hold_slot():
+            transport = _HostLimitedTransport(httpx.MockTransport(ConcurrencyProbe(delay=0)), 1)
+            async with httpx.AsyncClient(transport=transport, timeout=httpx.Timeout(5, pool=0.05)) as client:
+                async with client.stream("GET", "https://a.example/x"):
+                    with pytest.raises(httpx.PoolTimeout):
+                        await client.get("https://a.example/y")
+                # Released once the streamed response is closed
+                return (await client.get("https://a.example/y")).status_code
+
+        assert asyncio.run(hold_slot()) == 200
+
+    # ------------------------- PROVIDERS -------------------------
+
+    def test_upscale_and_background_removal_use_shared_client(self):
+        result = make_png(64, 64)
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append((request.method, str(request.url)))
+            if str(request.url) == PICSART_UPSCALE_URL:
+                assert request.headers["X-Picsart-API-Key"] == "test-key"
+                assert b'name="upscale_factor"' in request.content
+                return httpx.Response(200, json={"data": {"url": "https://picsart.example/result.png"}})
+            return httpx.Response(200, content=result)
+
+        identifier = get_storage_service().save_result(make_png(32, 32), extension="png")
+        with patch("backend.utils.http_client.create_transport", lambda: httpx.MockTransport(handler)), \
+             patch("backend.services.upscale.upscale_service.PICSART_API_KEY", "test-key"), \
+             patch("backend.services.bg_rem.photoroom_service.PHOTOTOOM_API_KEY", "test-key"):
+            upscaled = test_client.post("/upscale", data={"image_identifier": identifier, "upscale_factor": 2})
+            cutout = test_client.post("/download", data={"file_identifier": identifier})
+
+        assert upscaled.status_code == 200
+        assert upscaled.json()["upscaled_resolution"] == "64x64"
+        assert cutout.status_code == 200
+        assert seen == [
+            ("POST", PICSART_UPSCALE_URL),
+            ("GET", "https://picsart.example/result.png"),
+            ("POST", PHOTOROOM_SEGMENT_URL),
+        ]
+
+    def test_upscale_passes_storage_url_through(self):
+        storage = get_storage_service()
+        identifier = storage.save_result(make_png(32, 32), extension="png")
+        bodies = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if str(request.url) == PICSART_UPSCALE_URL:
+                bodies.append(request.content)
+                return httpx.Response(200, json={"data": {"url": "https://picsart.example/result.png"}})
+            return httpx.Response(200, content=make_png(64, 64))
+
+        with patch("backend.utils.http_client.create_transport", lambda: httpx.MockTransport(handler)), \
+             patch("backend.services.upscale.upscale_service.PICSART_API_KEY", "test-key"), \
+             patch.object(type(storage), "_get_fetchable_url", lambda self, identifier: f"https://files.example/{identifier}"), \
+             patch.object(type(storage), "_get_result_content", side_effect=AssertionError("source bytes were read")):
+            response = test_client.post("/upscale", data={"image_identifier": identifier, "upscale_factor": 2})
+
+        assert response.status_code == 200
+        assert response.json()["input_resolution"] == "32x32"
+        assert f"https://files.example/{identifier}".encode() in bodies[0]
+        assert b"\x89PNG" not in bodies[0]
+
+    @pytest.mark.parametrize("permissions, expected", [
+        ([{"type": "anyone", "role": "reader"}], "https://drive.example/file"),
+        ([{"type": "user", "role": "owner"}], None),
+    ])
+    def test_drive_only_passes_public_files(self, permissions, expected):
+        calls = []
+
+        class Files:
+            def get(self, **kwargs):
+                calls.append(kwargs)
+                return SimpleNamespace(execute=lambda: {"webContentLink": "https://drive.example/file", "permissions": permissions})
+
+        service = SimpleNamespace(files=Files, permissions=lambda: pytest.fail("permissions were changed"))
+        assert get_public_link(service, "file-id") == expected
+        assert calls[0]["fileId"] == "file-id"
+
+    def test_missing_drive_file_is_not_found(self):
+        def missing(**kwargs):
+            raise HttpError(SimpleNamespace(status=404, reason="Not Found"), b"{}")
+
+        with pytest.raises(FileNotFoundError):
+            get_public_link(SimpleNamespace(files=lambda: SimpleNamespace(get=missing)), "file-id")
+
+        identifier = get_storage_service().save_result(make_png(32, 32), extension="png")
+        with patch("backend.services.upscale.upscale_service.PICSART_API_KEY", "test-key"), \
+             patch.object(type(get_storage_service()), "_get_fetchable_url", side_effect=FileNotFoundError("gone")):
+            response = test_client.post("/upscale", data={"image_identifier": identifier, "upscale_factor": 2, "provider": "picsart"})
+        assert response.status_code == 404
+
+    def test_provider_error_is_reported(self):
+        identifier = get_storage_service().save_result(make_png(32, 32), extension="png")
+        transport = httpx.MockTransport(lambda request: httpx.Response(402, json={"detail": "no credits"}))
+        with patch("backend.utils.http_client.create_transport", lambda: transport), \
+             patch("backend.services.bg_rem.photoroom_service.PHOTOTOOM_API_KEY", "test-key"):
+            response = test_client.post("/download", data={"file_identifier": identifier})
+
+        assert response.status_code == 500
+        assert "PhotoRoom API error: 402" in response.json()["detail"]
+
+    # ------------------------- BACKGROUND REMOVAL STREAMING -------------------------
+
+    def test_background_removal_streams_into_storage(self):
+        storage = get_storage_service()
+        source, cutout = make_png(32, 32), make_png(48, 48)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            assert source in request.content
+            # Several chunks, like a real response body
+            return httpx.Response(200, stream=ChunkedStream(cutout, 100))
+
+        # Bytes are compared verbatim, so the background PNG re-encode must not replace them
+        with patch("backend.services.storage.variants.RESULT_PNG_OPTIMIZE", False):
+            identifier = storage.save_result(source, extension="png")
+            with patch("backend.utils.http_client.create_transport", lambda: httpx.MockTransport(handler)), \
+                 patch("backend.services.bg_rem.photoroom_service.PHOTOTOOM_API_KEY", "test-key"), \
+                 patch("tempfile.NamedTemporaryFile", side_effect=AssertionError("no temp files")):
+                response = test_client.post("/download", data={"file_identifier": identifier})
+            variant_builder.wait(timeout=60)
+
+        assert response.status_code == 200
+        assert storage.get_result_content(response.json()["result_identifier"]) == cutout
+
+    def test_interrupted_stream_leaves_no_result(self, tmp_path):
+        async def broken_body():
+            yield b"partial"
+            raise httpx.ReadError("connection reset")
+
+        storage = get_storage_service()
+        with patch("backend.services.storage.local_storage.RESULT_DIR", str(tmp_path)):
+            with pytest.raises(httpx.ReadError):
+                asyncio.run(storage.save_result_stream(broken_body()))
+        assert list(tmp_path.iterdir()) == []
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
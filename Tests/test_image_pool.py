@@ -0,0 +1,155 @@
+import pytest
+import asyncio
+import time
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from types import SimpleNamespace
+from io import BytesIO
+import os, sys, pathlib
+from PIL import Image, ImageDraw, UnidentifiedImageError
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.services.generation_service.gemini_service import GeminiService
+from backend.services.storage.storage_factory import get_storage_service
+from backend.utils.custom_exceptions import ImagePoolBusyError
+from backend.utils.image_ops import decode_pixels
+from backend.utils.image_pool import ImagePool, SharedBuffer, _share, image_pool
+from backend.utils.metrics import IMAGE_POOL_TASKS, IMAGE_POOL_UTILIZATION
+
+
+# Test client setup
+test_client = TestClient(app)
+
+
+def make_image(width: int, height: int, format: str = "PNG") -> bytes:
+    buffer = BytesIO()
+    Image.frombytes("RGB", (width, height), os.urandom(width * height * 3)).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def shared_segments() -> set:
+    return {name for name in os.listdir("/dev/shm") if name.startswith("psm_")}
+
+
+class TestImagePool:
+    """Tests for the shared image process pool."""
+
+    # ------------------------- SHARED MEMORY -------------------------
+
+    def test_large_buffers_go_through_shared_memory(self):
+        segments = []
+        shared = _share(("RGB", b"x" * 10, b"y" * 100), 50, segments)
+        try:
+            assert shared[1] == b"x" * 10
+            assert isinstance(shared[2], SharedBuffer) and shared[2].size == 100
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
+
+    def test_round_trip_leaves_no_segments(self):
+        image = make_image(320, 240)
+        before = shared_segments()
+        mode, size, pixels = image_pool.run_sync(decode_pixels, image)
+
+        assert (mode, size, pixels) == decode_pixels(image)
+        assert len(image) >= image_pool.shm_threshold and len(pixels) >= image_pool.shm_threshold
+        assert shared_segments() == before
+
+    def test_worker_errors_are_raised(self):
+        before = shared_segments()
+        with pytest.raises(UnidentifiedImageError):
+            image_pool.run_sync(decode_pixels, b"not an image" * 10_000)
+        assert shared_segments() == before
+
+    # ------------------------- BOUNDS AND METRICS -------------------------
+
+    def test_full_queue_is_rejected(self):
+        pool = ImagePool(workers=1, max_pending=0)
+        try:
+            rejected = IMAGE_POOL_TASKS.get(operation="sleep", outcome="rejected")
+            running = pool.submit(time.sleep, 0.5)
+            with pytest.raises(ImagePoolBusyError):
+                pool.submit(time.sleep, 0)
+            running.result(timeout=60)
+            assert IMAGE_POOL_TASKS.get(operation="sleep", outcome="rejected") == rejected + 1
+            # Room again once the first task is done
+            pool.run_sync(time.sleep, 0)
+        finally:
+            pool.shutdown()
+
+    def test_utilization_is_reported(self):
+        image_pool.collect()
+        image_pool.run_sync(time.sleep, 0.2)
+        image_pool.collect()
+        assert 0 < IMAGE_POOL_UTILIZATION.get() <= 1
+
+    def test_metrics_are_exposed(self):
+        image_pool.run_sync(time.sleep, 0)
+        body = test_client.get("/metrics").text
+        assert 'image_pool_tasks_total{operation="sleep",outcome="success"}' in body
+        assert "image_pool_queue_depth" in body
+        assert "image_pool_utilization" in body
+
+    # ------------------------- CALLERS -------------------------
+
+    def test_busy_pool_returns_503_for_local_upscale(self):
+        identifier = get_storage_service().save_result(make_image(20, 10), extension="png")
+        with patch.object(image_pool, "submit", side_effect=ImagePoolBusyError("full")):
+            response = test_client.post("/upscale", data={"image_identifier": identifier, "upscale_factor": 2, "provider": "local"})
+        assert response.status_code == 503
+
+    def test_busy_pool_sends_background_removal_to_provider(self):
+        # A flat background the local engine would key out if it had a worker
+        image = Image.new("RGB", (64, 64), (255, 255, 255))
+        ImageDraw.Draw(image).rectangle((16, 16, 48, 48), fill=(200, 30, 30))
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        identifier = get_storage_service().save_result(buffer.getvalue(), extension="png")
+
+        class StubPhotoRoom:
+            async def remove_background(self, image_content, filename):
+                return "photoroom-result"
+
+        with patch.object(image_pool, "submit", side_effect=ImagePoolBusyError("full")), \
+             patch("backend.services.post_processing.registry.POST_PROCESSORS", {"remove_background": {"photoroom": StubPhotoRoom}}):
+            response = test_client.post("/download", data={"file_identifier": identifier})
+
+        assert response.status_code == 200
+        assert response.json()["engine"] == "photoroom"
+
+    @pytest.mark.parametrize("format, mime_type", [("PNG", "image/png"), ("JPEG", "image/jpeg"), ("GIF", "image/png")])
+    def test_gemini_is_sent_encoded_bytes(self, format, mime_type):
+        original = make_image(16, 16, format)
+        identifier = get_storage_service().save_result(original, extension=format.lower())
+        sent = []
+
+        def generate_content(model, contents, config=None):
+            sent.extend(contents[1:])
+            return SimpleNamespace(text="{}")
+
+        service = GeminiService()
+        service.client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+        service.storage_service = get_storage_service()
+        service.generate_image_description(identifier)
+
+        assert sent[0].inline_data.mime_type == mime_type
+        if format != "GIF":
+            assert sent[0].inline_data.data == original
+        else:
+            assert Image.open(BytesIO(sent[0].inline_data.data)).format == "PNG"
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
@@ -0,0 +1,133 @@
+import pytest
+import asyncio
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from io import BytesIO
+import sys, pathlib
+from PIL import Image
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.services.storage.metadata_index import MetadataIndex
+from backend.services.storage.storage_factory import get_storage_service
+from backend.utils.image_probe import DimensionProbe, image_dimensions, probe_dimensions, probe_metadata
+
+
+# Test client setup
+test_client = TestClient(app)
+
+
+def encode(format: str, size=(123, 45), mode="RGB", **params) -> bytes:
+    buffer = BytesIO()
+    Image.new(mode, size).save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+
+class TestImageProbe:
+    """Tests for reading image dimensions from header bytes."""
+
+    # ------------------------- FORMATS -------------------------
+
+    @pytest.mark.parametrize("format, params", [
+        ("PNG", {}),
+        ("JPEG", {}),
+        ("JPEG", {"progressive": True, "exif": b"Exif\x00\x00" + bytes(4096)}),
+        ("GIF", {}),
+        ("WEBP", {"lossless": False}),
+        ("WEBP", {"lossless": True}),
+    ])
+    def test_probe_dimensions(self, format, params):
+        assert probe_dimensions(encode(format, **params)) == (123, 45)
+
+    @pytest.mark.parametrize("format, mode", [
+        ("PNG", "RGBA"), ("PNG", "P"), ("PNG", "L"),
+        ("JPEG", "L"), ("JPEG", "CMYK"),
+        ("WEBP", "RGBA"),
+    ])
+    def test_probe_mode(self, format, mode):
+        metadata = probe_metadata(encode(format, mode=mode))
+        assert metadata["format"] == format
+        assert metadata["mode"] == Image.open(BytesIO(encode(format, mode=mode))).mode
+
+    def test_incomplete_or_unknown_header(self):
+        assert probe_dimensions(encode("PNG")[:20]) is None
+        assert probe_dimensions(b"not an image") is None
+
+    def test_image_dimensions_falls_back_to_pil(self):
+        assert image_dimensions(encode("BMP")) == (123, 45)
+
+    # ------------------------- STREAMING -------------------------
+
+    def test_probe_while_streaming(self):
+        data = encode("JPEG", exif=b"Exif\x00\x00" + bytes(20000))
+
+        async def chunks():
+            for offset in range(0, len(data), 1000):
+                yield data[offset:offset + 1000]
+
+        async def collect(probe):
+            return b"".join([chunk async for chunk in probe.watch(chunks())])
+
+        probe = DimensionProbe()
+        assert asyncio.run(collect(probe)) == data
+        assert probe.dimensions == (123, 45)
+        assert probe._head == b""
+
+
+class TestMetadataIndex:
+    """Tests for the per-identifier metadata index and its endpoint."""
+
+    # ------------------------- FIXTURES -------------------------
+
+    @pytest.fixture
+    def index(self, tmp_path):
+        index = MetadataIndex(str(tmp_path))
+        with patch("backend.services.storage.base.metadata_index", index):
+            yield index
+
+    # ------------------------- INDEXING -------------------------
+
+    def test_saved_results_are_indexed(self, index):
+        data = encode("PNG", size=(40, 30), mode="RGBA")
+        identifier = get_storage_service().save_result(data, extension="png")
+        assert index.get(identifier) == {
+            "identifier": identifier, "format": "PNG", "width": 40, "height": 30, "mode": "RGBA", "size": len(data), "kind": "result",
+        }
+
+    def test_endpoint_reads_the_index(self, index):
+        storage = get_storage_service()
+        identifier = storage.save_result(encode("PNG", size=(40, 30)), extension="png")
+        with patch.object(type(storage), "_get_result_content", side_effect=AssertionError("image was read")):
+            response = test_client.get(f"/images/{identifier}/metadata")
+
+        assert response.status_code == 200
+        assert response.json()["metadata"]["width"] == 40
+        assert response.json()["metadata"]["height"] == 30
+
+    def test_unindexed_image_is_probed_once(self, index):
+        storage = get_storage_service()
+        identifier = storage.save_result(encode("JPEG", size=(16, 8)), extension="jpg")
+        index.delete(identifier)
+
+        response = test_client.get(f"/images/{identifier}/metadata")
+        assert response.status_code == 200
+        assert response.json()["metadata"]["format"] == "JPEG"
+        assert index.get(identifier)["width"] == 16
+
+    def test_unknown_identifier(self, index):
+        response = test_client.get("/images/does_not_exist.png/metadata")
+        assert response.status_code == 404
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
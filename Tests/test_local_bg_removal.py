@@ -0,0 +1,145 @@
+import pytest
+import asyncio
+import httpx
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from io import BytesIO
+import os, sys, pathlib
+from PIL import Image, ImageDraw
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.services.storage.storage_factory import get_storage_service
+from backend.services.bg_rem.local_bg_removal import remove_flat_background
+
+
+# Test client setup
+test_client = TestClient(app)
+
+
+def encode(image: Image.Image) -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def sticker(size: int = 200) -> Image.Image:
+    """A red disc on a white background, like a generated sticker."""
+    image = Image.new("RGB", (size, size), (255, 255, 255))
+    ImageDraw.Draw(image).ellipse((size // 4, size // 4, 3 * size // 4, 3 * size // 4), fill=(200, 30, 30))
+    return image
+
+
+def gradient(size: int = 200) -> Image.Image:
+    """The same disc on a vertical gradient, which the local engine should not key."""
+    image = Image.linear_gradient("L").resize((size, size)).convert("RGB")
+    ImageDraw.Draw(image).ellipse((size // 4, size // 4, 3 * size // 4, 3 * size // 4), fill=(200, 30, 30))
+    return image
+
+
+def photoroom_transport(calls: list) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        return httpx.Response(200, stream=httpx.ByteStream(encode(Image.new("RGBA", (8, 8)))))
+    return httpx.MockTransport(handler)
+
+
+class TestLocalBackgroundRemoval:
+    """Tests for the flat-background engine and its PhotoRoom fallback on /download."""
+
+    # ------------------------- ENGINE -------------------------
+
+    def test_flat_background_is_keyed_out(self):
+        confidence, cutout = remove_flat_background(encode(sticker()), 0.9)
+
+        assert confidence >= 0.9
+        result = Image.open(BytesIO(cutout))
+        assert result.mode == "RGBA"
+        assert result.getpixel((2, 2))[3] == 0
+        assert result.getpixel((100, 100)) == (200, 30, 30, 255)
+
+    def test_gradient_background_is_not_confident(self):
+        confidence, cutout = remove_flat_background(encode(gradient()), 0.9)
+        assert confidence < 0.9
+        assert cutout is None
+
+    def test_edge_pixels_lose_background_colour(self):
+        # Anti-aliased edge: drawn at 4x and reduced, so the rim mixes red with white
+        image = sticker(800).resize((200, 200), Image.Resampling.LANCZOS)
+        _, cutout = remove_flat_background(encode(image), 0.9)
+        result = Image.open(BytesIO(cutout))
+
+        edge = [(x, y) for y in range(200) for x in range(200) if 0 < result.getpixel((x, y))[3] < 255]
+        assert edge
+        # Unmixed from white, every rim pixel is less white than it was in the source
+        for x, y in edge:
+            assert result.getpixel((x, y))[1] <= image.getpixel((x, y))[1]
+        assert any(result.getpixel((x, y))[1] < image.getpixel((x, y))[1] for x, y in edge)
+
+    # ------------------------- ENDPOINT -------------------------
+
+    def test_download_uses_local_engine_for_flat_background(self):
+        storage = get_storage_service()
+        identifier = storage.save_result(encode(sticker()), extension="png")
+        calls = []
+
+        with patch("backend.utils.http_client.create_transport", lambda: photoroom_transport(calls)), \
+             patch("backend.services.bg_rem.photoroom_service.PHOTOTOOM_API_KEY", None):
+            response = test_client.post("/download", data={"file_identifier": identifier})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["engine"] == "local"
+        assert data["confidence"] >= 0.9
+        assert calls == []
+        assert Image.open(BytesIO(storage.get_result_content(data["result_identifier"]))).mode == "RGBA"
+
+    def test_download_falls_back_to_photoroom(self):
+        identifier = get_storage_service().save_result(encode(gradient()), extension="png")
+        calls = []
+
+        with patch("backend.utils.http_client.create_transport", lambda: photoroom_transport(calls)), \
+             patch("backend.services.bg_rem.photoroom_service.PHOTOTOOM_API_KEY", "test-key"):
+            response = test_client.post("/download", data={"file_identifier": identifier})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["engine"] == "photoroom"
+        assert data["confidence"] < 0.9
+        assert len(calls) == 1
+
+    def test_fallback_without_api_key(self):
+        identifier = get_storage_service().save_result(encode(gradient()), extension="png")
+        with patch("backend.services.bg_rem.photoroom_service.PHOTOTOOM_API_KEY", None):
+            response = test_client.post("/download", data={"file_identifier": identifier})
+
+        assert response.status_code == 500
+        assert response.json()["detail"] == "PHOTOTOOM API KEY NOT CONFIGURED"
+
+    def test_local_engine_can_be_disabled(self):
+        identifier = get_storage_service().save_result(encode(sticker()), extension="png")
+        calls = []
+
+        with patch("backend.utils.http_client.create_transport", lambda: photoroom_transport(calls)), \
+             patch("backend.services.bg_rem.photoroom_service.PHOTOTOOM_API_KEY", "test-key"), \
+             patch("backend.services.bg_rem.download_service.LOCAL_BG_REMOVAL_ENABLED", False):
+            response = test_client.post("/download", data={"file_identifier": identifier})
+
+        assert response.status_code == 200
+        assert response.json()["engine"] == "photoroom"
+        assert response.json()["confidence"] is None
+        assert len(calls) == 1
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
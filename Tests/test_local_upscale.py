@@ -0,0 +1,98 @@
+import pytest
+import asyncio
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from io import BytesIO
+import os, sys, pathlib
+from PIL import Image, ImageChops
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.services.storage.storage_factory import get_storage_service
+from backend.services.upscale.local_upscale_service import LocalUpscaleService
+from backend.utils.image_pool import shared_segment
+from backend.utils.resample import upscale_strip
+
+
+# Test client setup
+test_client = TestClient(app)
+
+
+def noise_image(width: int, height: int, mode: str = "RGB") -> Image.Image:
+    return Image.frombytes("RGB", (width, height), os.urandom(width * height * 3)).convert(mode)
+
+
+def encode(image: Image.Image, format: str = "PNG") -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+class TestLocalUpscale:
+    """Tests for the in-process upscale provider."""
+
+    # ------------------------- ENDPOINT -------------------------
+
+    @pytest.mark.parametrize("upscale_factor", [2, 4])
+    def test_upscale_with_local_provider(self, upscale_factor):
+        storage = get_storage_service()
+        identifier = storage.save_result(encode(noise_image(40, 30)), extension="png")
+
+        response = test_client.post("/upscale", data={"image_identifier": identifier, "upscale_factor": upscale_factor, "provider": "local"})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["input_resolution"] == "40x30"
+        assert data["upscaled_resolution"] == f"{40 * upscale_factor}x{30 * upscale_factor}"
+        result = Image.open(BytesIO(storage.get_result_content(data["result_identifier"])))
+        assert result.size == (40 * upscale_factor, 30 * upscale_factor)
+
+    def test_palette_image_is_converted(self):
+        storage = get_storage_service()
+        identifier = storage.save_result(encode(noise_image(20, 20, "P")), extension="png")
+        response = test_client.post("/upscale", data={"image_identifier": identifier, "upscale_factor": 2, "provider": "local"})
+        assert response.status_code == 200
+
+    def test_invalid_provider(self):
+        response = test_client.post("/upscale", data={"image_identifier": "test_image_123", "upscale_factor": 2, "provider": "magic"})
+        assert response.status_code == 400
+
+    def test_image_not_found(self):
+        response = test_client.post("/upscale", data={"image_identifier": "missing.png", "upscale_factor": 2, "provider": "local"})
+        assert response.status_code == 404
+
+    def test_output_size_limit(self):
+        identifier = get_storage_service().save_result(encode(noise_image(100, 100)), extension="png")
+        with patch("backend.services.upscale.local_upscale_service.LOCAL_UPSCALE_MAX_OUTPUT_MEGAPIXELS", 0.1):
+            response = test_client.post("/upscale", data={"image_identifier": identifier, "upscale_factor": 4, "provider": "local"})
+        assert response.status_code == 413
+
+    # ------------------------- TILING -------------------------
+
+    @pytest.mark.parametrize("mode, factor", [("RGB", 2), ("RGBA", 4), ("L", 2)])
+    def test_strips_match_whole_image(self, mode, factor):
+        image = noise_image(37, 53, mode)
+        whole = Image.frombytes(mode, (37 * factor, 53 * factor), upscale_strip(mode, image.size, image.tobytes(), factor, 0, 0))
+
+        # Strips of a few rows, so there are many seams
+        length = len(whole.tobytes())
+        with shared_segment(length) as output, \
+             patch("backend.services.upscale.local_upscale_service.LOCAL_UPSCALE_STRIP_MEGAPIXELS", 0.0001):
+            asyncio.run(LocalUpscaleService(get_storage_service())._upscale(mode, image.size, image.tobytes(), factor, output.name))
+            tiled = Image.frombytes(mode, whole.size, bytes(output.buf[:length]))
+
+        assert ImageChops.difference(whole, tiled).getbbox() is None
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
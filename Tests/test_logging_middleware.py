@@ -0,0 +1,146 @@
+import pytest
+import asyncio
+import logging
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+import json, time
+import os, sys, pathlib
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.middleware.logging_middleware import LoggingMiddleware, DetailedLoggingMiddleware
+from backend.utils.latency_sampler import latency_sampler
+from backend.utils.traffic_capture import TrafficRecorder
+
+
+def build_app(middleware_class, **options):
+    app = FastAPI()
+    app.add_middleware(middleware_class, **options)
+
+    @app.get("/")
+    async def root():
+        return {"message": "ok"}
+
+    @app.get("/events")
+    async def events():
+        async def stream():
+            for i in range(3):
+                yield f"data: {i}\n\n".encode()
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/echo")
+    async def echo(payload: dict):
+        return payload
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    return app
+
+
+class TestLoggingMiddleware:
+    """Tests for the pure ASGI access-log middleware."""
+
+    @pytest.fixture(autouse=True)
+    def propagate_logs(self, caplog):
+        caplog.set_level(logging.DEBUG)
+        for name in ("image_gen_api", "image_gen_api.access"):
+            logging.getLogger(name).propagate = True
+
+    def test_access_log_fields(self, caplog):
+        client = TestClient(build_app(LoggingMiddleware))
+        response = client.get("/", headers={"x-forwarded-for": "10.0.0.1, 10.0.0.2"})
+        assert response.status_code == 200
+        assert f"GET http://testserver/ - IP: 10.0.0.1 - Status: 200" in caplog.text
+        assert f"Bytes: {len(response.content)}" in caplog.text
+
+    def test_streaming_response_passes_through(self, caplog):
+        client = TestClient(build_app(LoggingMiddleware))
+        with client.stream("GET", "/events") as response:
+            chunks = list(response.iter_bytes())
+        assert b"".join(chunks) == b"data: 0\n\ndata: 1\n\ndata: 2\n\n"
+        assert "Bytes: 27" in caplog.text
+
+    def test_error_status_is_logged_as_warning(self, caplog):
+        client = TestClient(build_app(LoggingMiddleware))
+        client.get("/missing")
+        assert "Request failed: GET http://testserver/missing - Status: 404" in caplog.text
+
+    def test_exception_is_logged_and_reraised(self, caplog):
+        client = TestClient(build_app(LoggingMiddleware))
+        with pytest.raises(RuntimeError):
+            client.get("/boom")
+        assert "Request failed with exception: GET http://testserver/boom" in caplog.text
+
+    def test_exception_is_sampled_as_500(self):
+        client = TestClient(build_app(LoggingMiddleware))
+        with patch.object(latency_sampler, "threshold", 0.0):
+            with pytest.raises(RuntimeError):
+                client.get("/boom", headers={"x-request-id": "boom-request"})
+            slow = latency_sampler.slow_requests[-1]
+
+        assert slow["endpoint"] == "GET /boom"
+        assert slow["status_code"] == 500
+        assert slow["request_id"] == "boom-request"
+
+    def test_detailed_middleware_logs_request_body(self, caplog):
+        client = TestClient(build_app(DetailedLoggingMiddleware, log_bodies=True))
+        response = client.post("/echo", json={"hello": "world"})
+        assert response.json() == {"hello": "world"}
+        assert "Request completed: POST http://testserver/echo" in caplog.text
+        assert "hello" in caplog.text
+
+
+class DummyService:
+    def generate_image(self, prompt: str, image_path: str = None):
+        return "generated.png"
+
+
+class TestTrafficCapture:
+    """The scrubbed capture written for offline replay."""
+
+    def read_capture(self, recorder, count):
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            if recorder.path and os.path.exists(recorder.path):
+                with open(recorder.path) as f:
+                    lines = f.readlines()
+                if len(lines) >= count:
+                    return [json.loads(line) for line in lines]
+            time.sleep(0.01)
+        raise AssertionError("capture not written")
+
+    def test_capture_is_scrubbed(self, tmp_path):
+        from app import app
+        recorder = TrafficRecorder(str(tmp_path))
+        with patch("backend.middleware.logging_middleware.traffic_recorder", recorder), \
+             patch("backend.endpoints.generation.get_service", return_value=DummyService()):
+            client = TestClient(app)
+            client.post("/generate", data={"prompt": "my secret prompt", "model": "gemini"},
+                        headers={"user-agent": "secret-agent", "x-forwarded-for": "10.1.2.3"})
+            client.get("/metrics")
+
+        (entry,) = self.read_capture(recorder, 1)
+        assert entry["endpoint"] == "POST /generate"
+        assert entry["status"] == 200
+        assert entry["attributes"] == {"model": "gemini", "prompt_length": len("my secret prompt")}
+        assert "get_service" in entry["stages"]
+        raw = json.dumps(entry)
+        for secret in ("my secret prompt", "secret-agent", "10.1.2.3", "generated.png"):
+            assert secret not in raw
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
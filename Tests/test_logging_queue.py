@@ -0,0 +1,95 @@
+import pytest
+import json
+import logging
+import queue
+import os, sys, pathlib
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.config.logging_config import BoundedQueueHandler, RoutingQueueListener, LogQueueStats
+from backend.utils.logger import JsonFormatter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+
+class TestQueueLogging:
+    """Tests for the bounded, non-blocking logging pipeline."""
+
+    def _logger(self, name, handler):
+        logger = logging.getLogger(name)
+        logger.handlers = [handler]
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        return logger
+
+    def test_drop_policy_counts_dropped_records(self):
+        log_queue = queue.Queue(maxsize=2)
+        stats = LogQueueStats(capacity=2, policy="drop")
+        stats.queue = log_queue
+        logger = self._logger("test_queue.drop", BoundedQueueHandler(log_queue, "route", stats, policy="drop"))
+
+        for i in range(5):
+            logger.info("record %d", i)
+
+        snapshot = stats.snapshot()
+        assert snapshot["enqueued"] == 2
+        assert snapshot["dropped"] == 3
+        assert snapshot["dropped_by_level"] == {"INFO": 3}
+        assert snapshot["depth"] == 2
+
+    def test_block_policy_drops_after_timeout(self):
+        log_queue = queue.Queue(maxsize=1)
+        stats = LogQueueStats(capacity=1, policy="block")
+        logger = self._logger(
+            "test_queue.block",
+            BoundedQueueHandler(log_queue, "route", stats, policy="block", block_timeout=0.01),
+        )
+        logger.info("first")
+        logger.info("second")
+        assert stats.enqueued == 1
+        assert stats.dropped == 1
+
+    def test_listener_routes_and_formats_off_thread(self):
+        log_queue = queue.Queue(maxsize=100)
+        stats = LogQueueStats(capacity=100, policy="drop")
+        access, errors = ListHandler(), ListHandler()
+        errors.setLevel(logging.ERROR)
+        listener = RoutingQueueListener(log_queue, {"access": [access], "app": [errors]}, stats)
+
+        access_logger = self._logger("test_queue.access", BoundedQueueHandler(log_queue, "access", stats))
+        app_logger = self._logger("test_queue.app", BoundedQueueHandler(log_queue, "app", stats))
+
+        listener.start()
+        try:
+            access_logger.info("GET / %s", 200)
+            app_logger.info("not written: below handler level")
+            app_logger.error("written")
+        finally:
+            listener.stop()
+
+        assert access.messages == ["GET / 200"]
+        assert errors.messages == ["written"]
+
+    # ------------------------- JSON FORMAT -------------------------
+
+    def test_extra_fields_cannot_overwrite_reserved_fields(self):
+        record = logging.LogRecord("test_json", logging.INFO, __file__, 1, "RESULT SAVED", None, None)
+        record.request_id = "req-1"
+        record.structured = {"message": "spoofed", "level": "DEBUG", "request_id": "other", "identifier": "abc.png"}
+
+        payload = json.loads(JsonFormatter().format(record))
+        assert payload["message"] == "RESULT SAVED"
+        assert payload["level"] == "INFO"
+        assert payload["request_id"] == "req-1"
+        assert payload["identifier"] == "abc.png"
+        assert payload["extra"] == {"message": "spoofed", "level": "DEBUG", "request_id": "other"}
@@ -0,0 +1,99 @@
+import pytest
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+import os, sys, pathlib
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.utils.metrics import MetricsRegistry, PROVIDER_CALLS, STORAGE_CALLS, track_provider
+from backend.services.storage.local_storage import LocalStorage
+
+
+# Test client setup
+test_client = TestClient(app)
+
+
+class DummyService:
+    def generate_image(self, prompt: str, image_path: str = None):
+        with track_provider("gemini", "generate_image"):
+            return "generated.png"
+
+
+class TestMetricsEndpoint:
+    """Tests for the /metrics endpoint and the metrics registry."""
+
+    def test_route_metrics_use_path_template(self):
+        with patch("backend.endpoints.generation.get_service", return_value=DummyService()):
+            assert test_client.post("/generate", data={"prompt": "A sunset", "model": "gemini"}).status_code == 200
+        test_client.get(f"/uploads/{'a' * 32}")
+
+        body = test_client.get("/metrics").text
+        assert 'http_requests_total{method="POST",route="/generate",status="200"}' in body
+        assert 'http_requests_total{method="GET",route="/uploads/{upload_id}",status="404"}' in body
+        assert 'http_request_duration_seconds_bucket{method="POST",route="/generate",le="+Inf"}' in body
+        assert "# TYPE http_requests_in_flight gauge" in body
+
+    @pytest.mark.parametrize("headers, status_code", [
+        ({"authorization": "Bearer scrape-token"}, 200),
+        ({"authorization": "Bearer wrong"}, 401),
+        ({}, 401),
+    ])
+    def test_token_is_required_when_configured(self, headers, status_code):
+        with patch("backend.endpoints.metrics.METRICS_TOKEN", "scrape-token"):
+            assert test_client.get("/metrics", headers=headers).status_code == status_code
+
+    def test_provider_metrics(self):
+        before = PROVIDER_CALLS.get(provider="gemini", operation="generate_image", outcome="success")
+        with patch("backend.endpoints.generation.get_service", return_value=DummyService()):
+            test_client.post("/generate", data={"prompt": "A sunset", "model": "gemini"})
+        after = PROVIDER_CALLS.get(provider="gemini", operation="generate_image", outcome="success")
+        assert after == before + 1
+        assert 'provider_request_duration_seconds_count{operation="generate_image",provider="gemini"}' in test_client.get("/metrics").text
+
+    def test_storage_metrics_count_errors(self, tmp_path):
+        storage = LocalStorage()
+        before = STORAGE_CALLS.get(backend="local", operation="get_result_content", outcome="error")
+        with pytest.raises(FileNotFoundError):
+            storage.get_result_content("does_not_exist.png")
+        assert STORAGE_CALLS.get(backend="local", operation="get_result_content", outcome="error") == before + 1
+
+    def test_multiprocess_aggregation(self, tmp_path):
+        registry = MetricsRegistry(multiprocess_dir=str(tmp_path))
+        requests = registry.counter("requests_total", "Requests.")
+        in_flight = registry.gauge("in_flight", "In flight.")
+        latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+
+        requests.inc(route="/generate")
+        in_flight.inc()
+        latency.observe(0.05)
+
+        # A snapshot written by another worker that has since exited
+        other = {
+            "requests_total": [[[["route", "/generate"]], 2.0]],
+            "in_flight": [[[], 5.0]],
+            "latency_seconds": [[[], [0, 1, 0, 0.5]]],
+        }
+        (tmp_path / "metrics_999999999.json").write_text(json.dumps(other))
+
+        body = registry.render()
+        assert 'requests_total{route="/generate"} 3.0' in body
+        assert "in_flight 1.0" in body  # gauges of dead workers are dropped
+        assert 'latency_seconds_bucket{le="0.1"} 1' in body
+        assert 'latency_seconds_bucket{le="1.0"} 2' in body
+        assert "latency_seconds_count 2" in body
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
@@ -0,0 +1,179 @@
+import pytest
+import asyncio
+import httpx
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from io import BytesIO
+import os, sys, pathlib
+from PIL import Image
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.config.settings import PICSART_UPSCALE_URL
+from backend.services.post_processing import registry
+from backend.services.post_processing.registry import get_post_processor, provider_health, run_with_failover
+from backend.services.storage.storage_factory import get_storage_service
+from backend.utils.custom_exceptions import ProviderHTTPError
+
+
+# Test client setup
+test_client = TestClient(app)
+
+
+def make_png(width: int, height: int) -> bytes:
+    buffer = BytesIO()
+    Image.frombytes("RGB", (width, height), os.urandom(width * height * 3)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def picsart_status(status_code: int, calls: list) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        return httpx.Response(status_code, json={"detail": "vendor says no"})
+    return httpx.MockTransport(handler)
+
+
+class FakeProvider:
+    def __init__(self, name: str, error: Exception = None, delay: float = 0):
+        self.name = name
+        self.error = error
+        self.delay = delay
+        self.calls = 0
+
+    async def run(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"{self.name}-result"
+
+
+def fake_chain(*providers: FakeProvider):
+    """Patch the registry with a 'test' operation served by ``providers`` in order."""
+    factories = {provider.name: (lambda provider=provider: provider) for provider in providers}
+    return patch.dict(registry.POST_PROCESSORS, {"test": factories}), \
+        patch.dict(registry.PROVIDER_ORDER, {"test": [provider.name for provider in providers]})
+
+
+class TestProviderRegistry:
+    """Tests for the post-processing provider registry and its failover."""
+
+    # ------------------------- FAILOVER -------------------------
+
+    @pytest.mark.parametrize("error", [
+        httpx.ConnectError("refused"),
+        httpx.ReadTimeout("slow"),
+        ProviderHTTPError("PhotoRoom API error: 503 - Service Unavailable", 503),
+    ])
+    def test_fails_over_on_transport_errors_and_5xx(self, error):
+        first, second = FakeProvider("first", error=error), FakeProvider("second")
+        chain_providers, chain_order = fake_chain(first, second)
+        with chain_providers, chain_order:
+            name, result = asyncio.run(run_with_failover("test", lambda provider: provider.run()))
+
+        assert (name, result) == ("second", "second-result")
+        assert first.calls == 1
+
+    @pytest.mark.parametrize("error", [ProviderHTTPError("PhotoRoom API error: 402 - Payment Required", 402), FileNotFoundError("missing")])
+    def test_client_errors_do_not_fail_over(self, error):
+        first, second = FakeProvider("first", error=error), FakeProvider("second")
+        chain_providers, chain_order = fake_chain(first, second)
+        with chain_providers, chain_order, pytest.raises(type(error)):
+            asyncio.run(run_with_failover("test", lambda provider: provider.run()))
+        assert second.calls == 0
+
+    def test_slow_provider_fails_over(self):
+        first, second = FakeProvider("first", delay=1), FakeProvider("second")
+        chain_providers, chain_order = fake_chain(first, second)
+        with chain_providers, chain_order, patch("backend.services.post_processing.registry.PROVIDER_ATTEMPT_TIMEOUT", 0.05):
+            name, _ = asyncio.run(run_with_failover("test", lambda provider: provider.run()))
+        assert name == "second"
+
+    def test_unhealthy_provider_goes_to_the_back(self):
+        first, second = FakeProvider("first", error=httpx.ConnectError("refused")), FakeProvider("second")
+        chain_providers, chain_order = fake_chain(first, second)
+        with chain_providers, chain_order, patch("backend.services.post_processing.registry.PROVIDER_FAILURE_THRESHOLD", 2):
+            for _ in range(4):
+                asyncio.run(run_with_failover("test", lambda provider: provider.run()))
+
+        # Out of rotation after the second failure, so not tried for the last two requests
+        assert first.calls == 2
+        assert second.calls == 4
+
+    def test_provider_that_cannot_be_built_is_skipped(self):
+        def missing_key():
+            raise ValueError("API key is not set")
+
+        second = FakeProvider("second")
+        factories = {"first": missing_key, "second": lambda: second}
+        with patch.dict(registry.POST_PROCESSORS, {"test": factories}), patch.dict(registry.PROVIDER_ORDER, {"test": ["first", "second"]}):
+            name, _ = asyncio.run(run_with_failover("test", lambda provider: provider.run()))
+            assert name == "second"
+            assert registry.get_provider_health("test", "first").consecutive_failures == 1
+
+            with patch.dict(registry.PROVIDER_ORDER, {"test": ["first"]}), pytest.raises(ValueError):
+                asyncio.run(run_with_failover("test", lambda provider: provider.run()))
+
+    def test_providers_are_built_once(self):
+        builds = []
+        factories = {"only": lambda: builds.append(1) or FakeProvider("only")}
+        with patch.dict(registry.POST_PROCESSORS, {"test": factories}):
+            assert get_post_processor("test", "only") is get_post_processor("test", "only")
+        assert len(builds) == 1
+
+    # ------------------------- ENDPOINTS -------------------------
+
+    def test_upscale_fails_over_to_local(self):
+        identifier = get_storage_service().save_result(make_png(20, 10), extension="png")
+        calls = []
+        with patch("backend.utils.http_client.create_transport", lambda: picsart_status(503, calls)), \
+             patch("backend.services.upscale.upscale_service.PICSART_API_KEY", "test-key"):
+            response = test_client.post("/upscale", data={"image_identifier": identifier, "upscale_factor": 2})
+
+        assert response.status_code == 200
+        assert response.json()["provider"] == "local"
+        assert response.json()["upscaled_resolution"] == "40x20"
+        assert calls == [PICSART_UPSCALE_URL]
+        assert provider_health()["upscale"]["picsart"]["consecutive_failures"] == 1
+
+    def test_upscale_without_picsart_key_uses_local(self):
+        identifier = get_storage_service().save_result(make_png(20, 10), extension="png")
+        with patch("backend.services.upscale.upscale_service.PICSART_API_KEY", None):
+            response = test_client.post("/upscale", data={"image_identifier": identifier, "upscale_factor": 2})
+
+        assert response.status_code == 200
+        assert response.json()["provider"] == "local"
+
+    def test_pinned_provider_does_not_fail_over(self):
+        identifier = get_storage_service().save_result(make_png(20, 10), extension="png")
+        calls = []
+        with patch("backend.utils.http_client.create_transport", lambda: picsart_status(503, calls)), \
+             patch("backend.services.upscale.upscale_service.PICSART_API_KEY", "test-key"):
+            response = test_client.post("/upscale", data={"image_identifier": identifier, "upscale_factor": 2, "provider": "picsart"})
+
+        assert response.status_code == 500
+
+    def test_background_removal_5xx_is_reported(self):
+        identifier = get_storage_service().save_result(make_png(32, 32), extension="png")
+        calls = []
+        with patch("backend.utils.http_client.create_transport", lambda: picsart_status(502, calls)), \
+             patch("backend.services.bg_rem.photoroom_service.PHOTOTOOM_API_KEY", "test-key"):
+            response = test_client.post("/download", data={"file_identifier": identifier})
+
+        assert response.status_code == 500
+        assert "PhotoRoom API error: 502" in response.json()["detail"]
+        assert provider_health()["remove_background"]["photoroom"]["consecutive_failures"] == 1
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
@@ -0,0 +1,85 @@
+import pytest
+import asyncio
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+import os, sys, pathlib
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.config.settings import MAX_FILE_SIZE, MAX_REQUEST_BODY_SIZE, MAX_UPLOAD_CHUNK_SIZE, MULTIPART_OVERHEAD
+from backend.services.storage.upload_sessions import UploadSessionManager
+
+
+# Test client setup
+test_client = TestClient(app)
+
+
+def _stream(total: int, chunk: int = 256 * 1024):
+    """Yield a body without a Content-Length so that it is sent chunked."""
+    sent = 0
+    while sent < total:
+        size = min(chunk, total - sent)
+        sent += size
+        yield b"x" * size
+
+
+class TestRequestSizeLimit:
+    """Tests for the ASGI-level request body limits."""
+
+    def test_declared_length_over_route_limit(self):
+        with patch("backend.endpoints.generation.get_service") as mock_get_service:
+            response = test_client.post(
+                "/generate",
+                content=b"x" * (MAX_FILE_SIZE + MULTIPART_OVERHEAD + 1),
+                headers={"content-type": "multipart/form-data; boundary=abc"},
+            )
+            assert response.status_code == 413
+            mock_get_service.assert_not_called()
+
+    def test_streamed_body_over_route_limit(self):
+        with patch("backend.endpoints.generation.get_service") as mock_get_service:
+            response = test_client.post(
+                "/generate",
+                content=_stream(MAX_FILE_SIZE + MULTIPART_OVERHEAD + 1),
+                headers={"content-type": "multipart/form-data; boundary=abc"},
+            )
+            assert response.status_code == 413
+            mock_get_service.assert_not_called()
+
+    def test_default_limit_applies_to_other_routes(self):
+        response = test_client.post(
+            "/download",
+            data={"file_identifier": "x" * (MAX_REQUEST_BODY_SIZE + 1)},
+        )
+        assert response.status_code == 413
+
+    def test_streamed_chunk_over_chunk_limit(self, tmp_path):
+        with patch("backend.endpoints.uploads.upload_session_manager", UploadSessionManager(str(tmp_path))):
+            upload_id = test_client.post("/uploads", data={
+                "filename": "big.png",
+                "total_size": MAX_FILE_SIZE,
+                "chunk_size": MAX_UPLOAD_CHUNK_SIZE,
+            }).json()["upload_id"]
+            response = test_client.put(
+                f"/uploads/{upload_id}/chunks/0",
+                content=_stream(MAX_UPLOAD_CHUNK_SIZE + 1024 * 1024),
+            )
+            assert response.status_code == 413
+
+    def test_body_under_limit_passes_through(self):
+        response = test_client.post("/generate", data={"model": "openai"})
+        assert response.status_code == 422  # reached FastAPI validation
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
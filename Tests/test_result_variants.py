@@ -0,0 +1,293 @@
+import pytest
+import asyncio
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from types import SimpleNamespace
+from io import BytesIO
+import os, sys, pathlib
+from PIL import Image, ImageDraw
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.services.storage.google_drive import GoogleDriveStorage
+from backend.services.storage.metadata_index import metadata_index
+from backend.services.storage.storage_factory import get_storage_service
+from backend.services.storage.variants import choose_variant, parse_variants, variant_builder
+from backend.utils import blurhash
+from backend.utils.custom_exceptions import ImagePoolBusyError
+from backend.utils.image_ops import optimize_png
+from backend.utils.metrics import RESULT_PNG_BYTES_SAVED
+from PIL.PngImagePlugin import PngInfo
+from googleapiclient.errors import HttpError
+from starlette.datastructures import UploadFile
+
+
+# Test client setup
+test_client = TestClient(app)
+
+BROWSER_ACCEPT = "image/avif,image/webp,image/apng,image/*,*/*;q=0.8"
+
+
+def generated_png(**options) -> bytes:
+    """Smooth shading plus a few shapes, compressed like a provider PNG."""
+    image = Image.linear_gradient("L").resize((320, 240)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    draw.ellipse((40, 40, 200, 200), fill=(220, 120, 40))
+    draw.rectangle((180, 60, 300, 220), fill=(30, 90, 200))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", **options)
+    return buffer.getvalue()
+
+
+def pixels(content: bytes) -> bytes:
+    return Image.open(BytesIO(content)).convert("RGBA").tobytes()
+
+
+class TestResultVariants:
+    """Tests for the background WebP/AVIF variants and /results negotiation."""
+
+    # ------------------------- FIXTURES -------------------------
+
+    @pytest.fixture
+    def saved(self):
+        """(identifier, stored bytes, variants) of a result whose variants are built (and original optimized)."""
+        storage = get_storage_service()
+        identifier = storage.save_result(generated_png(), extension="png")
+        variant_builder.wait(timeout=60)
+        return identifier, storage.get_result_content(identifier), storage.get_metadata(identifier)["variants"]
+
+    # ------------------------- BUILDING -------------------------
+
+    def test_variants_are_built_and_indexed(self, saved):
+        identifier, original, variants = saved
+        assert set(variants) == {"webp-lossless", "webp-85", "avif-60"}
+        for variant in variants.values():
+            content = get_storage_service().get_result_content(variant["identifier"])
+            assert len(content) == variant["size"] < len(original)
+            assert Image.open(BytesIO(content)).format == variant["format"]
+
+    def test_lossless_variant_is_pixel_identical(self, saved):
+        identifier, original, variants = saved
+        content = get_storage_service().get_result_content(variants["webp-lossless"]["identifier"])
+        assert Image.open(BytesIO(content)).convert("RGB").tobytes() == Image.open(BytesIO(original)).convert("RGB").tobytes()
+
+    def test_variant_spec(self):
+        assert parse_variants("webp:lossless, avif:50")[1] == {"name": "avif-50", "format": "AVIF", "quality": 50, "lossless": False}
+        assert parse_variants("") == []
+        with pytest.raises(ValueError):
+            parse_variants("jxl:80")
+        with pytest.raises(ValueError):
+            parse_variants("avif:lossless")
+
+    # ------------------------- NEGOTIATION -------------------------
+
+    def test_smallest_accepted_variant_is_served(self, saved):
+        identifier, original, variants = saved
+        response = test_client.get(f"/results/{identifier}", headers={"Accept": BROWSER_ACCEPT})
+
+        smallest = min(variants.values(), key=lambda variant: variant["size"])
+        assert response.status_code == 200
+        assert response.headers["content-type"] == smallest["mime_type"]
+        assert "Accept" in response.headers["vary"]
+        assert len(response.content) == smallest["size"]
+
+    def test_webp_only_client(self, saved):
+        identifier, _, variants = saved
+        response = test_client.get(f"/results/{identifier}", headers={"Accept": "image/webp,image/*;q=0.8"})
+        assert response.headers["content-type"] == "image/webp"
+        assert len(response.content) == min(variants["webp-lossless"]["size"], variants["webp-85"]["size"])
+
+    @pytest.mark.parametrize("accept", [None, "*/*", "image/*", "image/png", "image/avif;q=0,image/webp;q=0"])
+    def test_original_without_explicit_support(self, saved, accept):
+        identifier, original, _ = saved
+        headers = {"Accept": accept} if accept else {}
+        response = test_client.get(f"/results/{identifier}", headers=headers)
+        assert response.headers["content-type"] == "image/png"
+        assert response.content == original
+
+    def test_original_on_request(self, saved):
+        identifier, original, _ = saved
+        response = test_client.get(f"/results/{identifier}", params={"original": "true"}, headers={"Accept": BROWSER_ACCEPT})
+        assert response.content == original
+
+    def test_original_until_variants_exist(self):
+        with patch("backend.services.storage.variants.VARIANTS", []):
+            identifier = get_storage_service().save_result(generated_png(), extension="png")
+        response = test_client.get(f"/results/{identifier}", headers={"Accept": BROWSER_ACCEPT})
+        assert response.headers["content-type"] == "image/png"
+
+    def test_larger_variant_is_not_chosen(self):
+        metadata = {"size": 100, "variants": {"avif-60": {"mime_type": "image/avif", "size": 150}}}
+        assert choose_variant(metadata, "image/avif") is None
+
+    def test_missing_result(self):
+        response = test_client.get("/results/generated_missing.png")
+        assert response.status_code == 404
+
+    def test_only_results_are_served(self):
+        upload = get_storage_service().save_upload(UploadFile(BytesIO(generated_png()), filename="private.png"))
+        assert test_client.get(f"/results/{upload}").status_code == 404
+        assert test_client.get(f"/results/{upload}/thumbnails/256").status_code == 404
+        assert test_client.get("/results/never-saved.png").status_code == 404
+
+    def test_missing_drive_result_is_not_found(self):
+        def get_media(fileId):
+            raise HttpError(SimpleNamespace(status=404, reason="Not Found"), b"{}")
+
+        drive = GoogleDriveStorage.__new__(GoogleDriveStorage)
+        drive.service = SimpleNamespace(files=lambda: SimpleNamespace(get_media=get_media))
+        metadata_index.put("drive-file-id", {"format": "PNG", "width": 320, "height": 240, "kind": "result"})
+        try:
+            with patch("backend.endpoints.generation.get_storage_service", return_value=drive), \
+                 patch("backend.endpoints.generation.image_pool.run", side_effect=AssertionError("rendered")):
+                assert test_client.get("/results/drive-file-id").status_code == 404
+                assert test_client.get("/results/drive-file-id/thumbnails/256").status_code == 404
+        finally:
+            metadata_index.delete("drive-file-id")
+
+    # ------------------------- PNG OPTIMIZATION -------------------------
+
+    def test_original_is_replaced_losslessly(self):
+        original = generated_png()
+        saved_before = RESULT_PNG_BYTES_SAVED.get()
+        identifier = get_storage_service().save_result(original, extension="png")
+        variant_builder.wait(timeout=60)
+
+        stored = get_storage_service().get_result_content(identifier)
+        metadata = get_storage_service().get_metadata(identifier)
+        assert pixels(stored) == pixels(original)
+        assert metadata["size"] == len(stored)
+        assert metadata["optimization"]["method"] in ("palette", "deflate", "rle")
+        assert metadata["optimization"]["original_size"] == len(original)
+        assert metadata["optimization"]["saved_bytes"] == len(original) - len(stored) > 0
+        assert RESULT_PNG_BYTES_SAVED.get() == saved_before + len(original) - len(stored)
+
+    def test_paletted_original_is_reindexed(self):
+        image = Image.new("RGB", (320, 240), (255, 255, 255))
+        ImageDraw.Draw(image).rectangle((40, 40, 200, 200), fill=(220, 120, 40))
+        buffer = BytesIO()
+        image.save(buffer, format="PNG", compress_level=1)
+        identifier = get_storage_service().save_result(buffer.getvalue(), extension="png")
+        variant_builder.wait(timeout=60)
+
+        stored = get_storage_service().get_result_content(identifier)
+        metadata = get_storage_service().get_metadata(identifier)
+        assert metadata["optimization"]["method"] == "palette"
+        assert metadata["mode"] == Image.open(BytesIO(stored)).mode == "P"
+        assert metadata["size"] == len(stored)
+
+    def test_small_saving_keeps_the_original(self):
+        original = generated_png()
+        with patch("backend.services.storage.variants.RESULT_PNG_MIN_SAVING", 0.99):
+            identifier = get_storage_service().save_result(original, extension="png")
+            variant_builder.wait(timeout=60)
+        assert get_storage_service().get_result_content(identifier) == original
+        assert "optimization" not in get_storage_service().get_metadata(identifier)
+
+    def test_metadata_chunks_are_kept(self):
+        info = PngInfo()
+        info.add_text("Software", "provider")
+        info.add(b"caBX", b"provenance manifest")
+        content, method = optimize_png(generated_png(pnginfo=info, dpi=(72, 72)), 2.0, palette=False)
+
+        optimized = Image.open(BytesIO(content))
+        assert method in ("deflate", "rle")
+        assert optimized.info["Software"] == "provider"
+        assert round(optimized.info["dpi"][0]) == 72
+        assert b"caBX" in content and b"provenance manifest" in content
+
+    def test_rgba_palette_keeps_alpha(self):
+        image = Image.new("RGBA", (64, 64), (255, 255, 255, 0))
+        ImageDraw.Draw(image).rectangle((8, 8, 40, 40), fill=(200, 30, 30, 128))
+        buffer = BytesIO()
+        image.save(buffer, format="PNG", compress_level=1)
+        content, method = optimize_png(buffer.getvalue(), 2.0, palette=True)
+        assert method == "palette"
+        assert Image.open(BytesIO(content)).mode == "P"
+        assert pixels(content) == image.tobytes()
+
+    def test_unsafe_pngs_are_left_alone(self):
+        info = PngInfo()
+        info.add(b"bKGD", b"\x00\x00\x00\x00\x00\x00")
+        assert optimize_png(generated_png(pnginfo=info), 2.0, palette=True) is None
+        deep = BytesIO()
+        Image.new("I;16", (16, 16), 1000).save(deep, format="PNG")
+        assert optimize_png(deep.getvalue(), 2.0, palette=True) is None
+
+    def test_cpu_budget_limits_candidates(self):
+        assert optimize_png(generated_png(), 0, palette=True) is None
+
+    # ------------------------- THUMBNAILS AND PLACEHOLDER -------------------------
+
+    @pytest.mark.parametrize("size, expected", [(256, (256, 192)), (512, (320, 240))])
+    def test_thumbnails_are_served(self, saved, size, expected):
+        identifier, _, _ = saved
+        with patch("backend.endpoints.generation.image_pool.run", side_effect=AssertionError("rendered on demand")):
+            response = test_client.get(f"/results/{identifier}/thumbnails/{size}")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/webp"
+        assert Image.open(BytesIO(response.content)).size == expected
+
+    def test_thumbnail_rendered_before_build(self):
+        with patch.object(variant_builder, "submit"):
+            identifier = get_storage_service().save_result(generated_png(), extension="png")
+        response = test_client.get(f"/results/{identifier}/thumbnails/256")
+        assert response.status_code == 200
+        assert Image.open(BytesIO(response.content)).size == (256, 192)
+
+    def test_unknown_thumbnail_size(self, saved):
+        identifier, _, _ = saved
+        assert test_client.get(f"/results/{identifier}/thumbnails/100").status_code == 404
+
+    def test_placeholder_is_indexed(self, saved):
+        identifier, original, _ = saved
+        metadata = get_storage_service().get_metadata(identifier)
+        assert metadata["placeholder"] == blurhash.encode(Image.open(BytesIO(original)))
+        assert len(metadata["placeholder"]) == 4 + 2 * 4 * 3
+
+    def test_blurhash_matches_reference(self):
+        # Reference value from the upstream BlurHash encoder for the same pixels
+        image = Image.linear_gradient("L").resize((64, 48)).convert("RGB")
+        ImageDraw.Draw(image).ellipse((10, 10, 40, 40), fill=(220, 120, 40))
+        assert blurhash.encode(image) == "LwJ@LFwbK6Os00j[WAWATeShwbsS"
+
+    def test_generation_response_includes_previews(self):
+        class SavingService:
+            def generate_image(self, prompt, upload_identifier=None):
+                return get_storage_service().save_result(generated_png(), extension="png")
+
+        with patch("backend.endpoints.generation.get_service", return_value=SavingService()):
+            response = test_client.post("/generate", data={"prompt": "A sunset", "model": "gemini"})
+
+        data = response.json()
+        identifier = data["result_identifier"]
+        assert data["thumbnails"] == {"256": f"/results/{identifier}/thumbnails/256", "512": f"/results/{identifier}/thumbnails/512"}
+        assert data["placeholder"] == blurhash.encode(Image.open(BytesIO(generated_png())))
+
+    def test_placeholder_wait_is_bounded(self):
+        class SavingService:
+            def generate_image(self, prompt, upload_identifier=None):
+                return get_storage_service().save_result(generated_png(), extension="png")
+
+        with patch("backend.endpoints.generation.get_service", return_value=SavingService()), \
+             patch("backend.services.storage.variants.image_pool.submit", side_effect=ImagePoolBusyError("full")), \
+             patch("backend.services.storage.variants.PLACEHOLDER_WAIT", 0.05), \
+             patch.object(variant_builder, "submit"):
+            response = test_client.post("/generate", data={"prompt": "A sunset", "model": "gemini"})
+
+        assert response.status_code == 200
+        assert response.json()["placeholder"] is None
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
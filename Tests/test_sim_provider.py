@@ -0,0 +1,99 @@
+import pytest
+import asyncio
+import random
+from fastapi.testclient import TestClient
+from unittest.mock import MagicMock, patch
+from io import BytesIO
+import os, sys, pathlib
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from PIL import Image
+from backend.services.generation_service import service_factory
+from backend.services.generation_service.sim_service import SimulationService
+from backend.utils.simulation import LatencyDistribution, deterministic_png
+
+
+# Test client setup
+test_client = TestClient(app)
+
+
+def make_sim(error_rate: float = 0.0, **profile) -> SimulationService:
+    service = SimulationService("sim-test", {"width": 64, "height": 48, "error_rate": error_rate, **profile})
+    service.storage_service = MagicMock()
+    service.storage_service.save_result.return_value = "generated_sim.png"
+    return service
+
+
+class TestSimulationProvider:
+    """Tests for the sim provider family."""
+
+    def test_images_are_deterministic(self):
+        first = deterministic_png("sim:A sunset", 64, 48)
+        assert first == deterministic_png("sim:A sunset", 64, 48)
+        assert first != deterministic_png("sim:A forest", 64, 48)
+        assert Image.open(BytesIO(first)).size == (64, 48)
+
+    def test_generate_stores_image(self):
+        service = make_sim()
+        assert service.generate_image("A sunset") == "generated_sim.png"
+        stored = service.storage_service.save_result.call_args[0][0]
+        assert stored == deterministic_png("sim-test:A sunset", 64, 48, 0.25)
+
+    def test_latency_distributions(self):
+        rng = random.Random(1)
+        assert LatencyDistribution({"distribution": "constant", "value": 0.5}).sample(rng) == 0.5
+        spiky = LatencyDistribution({"distribution": "constant", "value": 1.0, "tail": {"probability": 1.0, "multiplier": 10}})
+        assert spiky.sample(rng) == 10.0
+        samples = [LatencyDistribution({"distribution": "uniform", "min": 1, "max": 2}).sample(rng) for _ in range(100)]
+        assert all(1 <= s <= 2 for s in samples)
+        with pytest.raises(ValueError):
+            LatencyDistribution({"distribution": "pareto"})
+
+    def test_sim_model_per_request(self):
+        with patch.dict(service_factory._instances, {"sim": make_sim()}):
+            response = test_client.post("/generate", data={"prompt": "A sunset", "model": "sim"})
+
+        assert response.status_code == 200
+        assert response.json()["result_identifier"] == "generated_sim.png"
+
+    def test_injected_errors_return_500(self):
+        with patch.dict(service_factory._instances, {"sim": make_sim(error_rate=1.0)}):
+            response = test_client.post("/generate", data={"prompt": "A sunset", "model": "sim"})
+
+        assert response.status_code == 500
+        assert "SIMULATED" in response.json()["detail"]
+
+    def test_sim_mode_routes_every_model(self):
+        with patch.object(service_factory, "SIM_MODE", True):
+            assert service_factory.resolve_model_name("gemini") == "sim-gemini"
+            assert service_factory.resolve_model_name("OpenAI") == "sim-openai"
+            assert service_factory.resolve_model_name("unknown") == "unknown"
+            assert service_factory.resolve_model_name("sim-openai") == "sim-openai"
+        assert service_factory.resolve_model_name("gemini") == "gemini"
+
+    def test_sim_mode_rejects_unknown_models(self):
+        with patch.object(service_factory, "SIM_MODE", True):
+            response = test_client.post("/generate", data={"prompt": "A sunset", "model": "gemnii"})
+        assert response.status_code == 400
+
+    def test_services_are_created_lazily(self):
+        with patch.dict(service_factory._instances, clear=True):
+            service = service_factory.get_service("sim")
+            assert isinstance(service, SimulationService)
+            assert service_factory.get_service("sim") is service
+            assert "gemini" not in service_factory._instances
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
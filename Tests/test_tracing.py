@@ -0,0 +1,112 @@
+import pytest
+import asyncio
+import json
+import time
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from types import SimpleNamespace
+import os, sys, pathlib
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.utils.metrics import track_provider
+from backend.utils.tracing import Trace, TraceFileExporter, current_trace, span, to_otlp
+
+
+# Test client setup
+test_client = TestClient(app)
+
+
+class DummyService:
+    def generate_image(self, prompt: str, image_path: str = None):
+        with track_provider("gemini", "generate_image"):
+            with span("save_result"):
+                pass
+        return "generated.png"
+
+
+class MockStorageService:
+    def get_results_uri(self, identifier: str):
+        with span("get_results_uri"):
+            return f"https://mock-storage.com/results/{identifier}"
+
+
+class TestTracing:
+    """Tests for per-stage spans and the Server-Timing header."""
+
+    def test_server_timing_header_has_stage_breakdown(self):
+        with patch("backend.endpoints.generation.get_service", return_value=DummyService()), \
+             patch("backend.endpoints.generation.get_storage_service", return_value=MockStorageService()):
+            response = test_client.post("/generate", data={"prompt": "A sunset", "model": "gemini"})
+
+        assert response.status_code == 200
+        stages = [metric.split(";")[0] for metric in response.headers["server-timing"].split(", ")]
+        assert stages == ["get_service", "gemini.generate_image", "save_result", "get_results_uri", "total"]
+
+    @pytest.mark.parametrize("request_id", ["abc123", "0" * 32, "A" * 32, "x" * 40])
+    def test_client_request_id_is_not_a_trace_id(self, request_id):
+        trace_id = Trace(trace_id=request_id).trace_id
+        assert trace_id != request_id.rjust(32, "0")[:32]
+        assert len(trace_id) == 32 and int(trace_id, 16)
+
+    def test_w3c_trace_id_is_kept(self):
+        assert Trace(trace_id="4bf92f3577b34da6a3ce929d0e0e4736").trace_id == "4bf92f3577b34da6a3ce929d0e0e4736"
+
+    def test_request_id_is_a_trace_attribute(self):
+        exported = []
+        with patch("backend.middleware.tracing_middleware.trace_exporter", SimpleNamespace(export=exported.append)):
+            test_client.get("/", headers={"x-request-id": "client-request-1"})
+        assert exported[0].attributes["request_id"] == "client-request-1"
+        assert exported[0].trace_id != "client-request-1".rjust(32, "0")
+
+    def test_span_outside_request_is_noop(self):
+        with span("anything") as record:
+            assert record is None
+
+    def test_nested_spans_and_otlp_export(self, tmp_path):
+        trace = Trace(trace_id="abc123")
+        token = current_trace.set(trace)
+        try:
+            with span("outer", provider="gemini"):
+                with span("inner"):
+                    pass
+            with pytest.raises(ValueError):
+                with span("failing"):
+                    raise ValueError("boom")
+        finally:
+            current_trace.reset(token)
+        trace.finish()
+
+        outer, inner, failing = trace.spans
+        assert inner.parent_id == outer.span_id
+        assert failing.error == "ValueError"
+
+        payload = to_otlp(trace)
+        spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        assert len(spans) == 4
+        assert all(len(s["traceId"]) == 32 for s in spans)
+        assert spans[1]["attributes"] == [{"key": "provider", "value": {"stringValue": "gemini"}}]
+        assert spans[3]["status"]["code"] == 2
+
+        exporter = TraceFileExporter(str(tmp_path / "traces.jsonl"))
+        exporter.export(trace)
+        deadline = time.time() + 5
+        while not (tmp_path / "traces.jsonl").exists() and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        line = (tmp_path / "traces.jsonl").read_text().splitlines()[0]
+        assert json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["traceId"] == trace.trace_id
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
@@ -0,0 +1,204 @@
+import pytest
+import asyncio
+import hashlib
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from io import BytesIO
+import concurrent.futures
+import os, sys, pathlib
+from PIL import Image
+
+# Ensure project root is on PYTHONPATH so that `import app` works regardless of where tests are run
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from app import app  # Root-level app.py
+from backend.services.storage.storage_factory import get_storage_service
+from backend.services.storage.upload_sessions import UploadSessionManager
+from starlette.datastructures import UploadFile
+
+
+# Test client setup
+test_client = TestClient(app)
+
+CHUNK_SIZE = 64 * 1024
+
+
+class MockStorageService:
+    """A mock storage service that keeps saved uploads in memory."""
+
+    def __init__(self):
+        self.saved = {}
+
+    def save_upload(self, file):
+        try:
+            asyncio.get_running_loop()
+            self.on_event_loop = True
+        except RuntimeError:
+            self.on_event_loop = False
+        identifier = f"upload_{len(self.saved)}_{file.filename}"
+        self.saved[identifier] = file.file.read()
+        return identifier
+
+
+class TestChunkedUploadEndpoint:
+    """Tests for the resumable /uploads protocol."""
+
+    # ------------------------- FIXTURES -------------------------
+
+    @pytest.fixture
+    def session_manager(self, tmp_path):
+        manager = UploadSessionManager(str(tmp_path))
+        with patch("backend.endpoints.uploads.upload_session_manager", manager):
+            yield manager
+
+    @pytest.fixture
+    def mock_storage_service(self):
+        storage = MockStorageService()
+        with patch("backend.endpoints.uploads.get_storage_service", return_value=storage):
+            yield storage
+
+    @pytest.fixture
+    def image_bytes(self):
+        """A PNG large enough to span several chunks."""
+        img = Image.effect_noise((256, 256), 64).convert("RGB")
+        buffer = BytesIO()
+        img.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def _create(self, content: bytes, filename: str = "big.png"):
+        return test_client.post("/uploads", data={
+            "filename": filename,
+            "total_size": len(content),
+            "content_type": "image/png",
+            "chunk_size": CHUNK_SIZE,
+        })
+
+    def _put_chunk(self, upload_id: str, index: int, content: bytes):
+        chunk = content[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE]
+        return test_client.put(f"/uploads/{upload_id}/chunks/{index}", content=chunk)
+
+    # ------------------------- SUCCESS CASES -------------------------
+
+    def test_chunks_out_of_order_and_parallel(self, session_manager, mock_storage_service, image_bytes):
+        response = self._create(image_bytes)
+        assert response.status_code == 201
+        data = response.json()
+        upload_id = data["upload_id"]
+        assert data["total_chunks"] > 1
+
+        indices = list(reversed(range(data["total_chunks"])))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(lambda i: self._put_chunk(upload_id, i, image_bytes), indices))
+        assert all(r.status_code == 200 for r in responses)
+
+        response = test_client.post(
+            f"/uploads/{upload_id}/complete",
+            data={"checksum": hashlib.sha256(image_bytes).hexdigest()},
+        )
+        assert response.status_code == 200
+        identifier = response.json()["upload_identifier"]
+        assert mock_storage_service.saved[identifier] == image_bytes
+
+        # The session is removed once finalized
+        assert test_client.get(f"/uploads/{upload_id}").status_code == 404
+
+    def test_finalize_runs_off_the_event_loop(self, session_manager, mock_storage_service, image_bytes):
+        data = self._create(image_bytes).json()
+        for index in range(data["total_chunks"]):
+            self._put_chunk(data["upload_id"], index, image_bytes)
+
+        response = test_client.post(f"/uploads/{data['upload_id']}/complete", data={"checksum": hashlib.sha256(image_bytes).hexdigest()})
+        assert response.status_code == 200
+        assert mock_storage_service.on_event_loop is False
+
+    def test_status_reports_missing_chunks_for_resume(self, session_manager, mock_storage_service, image_bytes):
+        upload_id = self._create(image_bytes).json()["upload_id"]
+        self._put_chunk(upload_id, 0, image_bytes)
+
+        response = test_client.get(f"/uploads/{upload_id}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["received_chunks"] == [0]
+        assert 1 in data["missing_chunks"]
+
+    def test_resending_a_chunk_is_idempotent(self, session_manager, mock_storage_service, image_bytes):
+        upload_id = self._create(image_bytes).json()["upload_id"]
+        assert self._put_chunk(upload_id, 0, image_bytes).status_code == 200
+        assert self._put_chunk(upload_id, 0, image_bytes).status_code == 200
+        assert test_client.get(f"/uploads/{upload_id}").json()["received_chunks"] == [0]
+
+    def test_generate_accepts_upload_identifier(self, image_bytes):
+        identifier = get_storage_service().save_upload(UploadFile(BytesIO(image_bytes), filename="big.png"))
+        with patch("backend.endpoints.generation.get_service") as mock_get_service:
+            mock_get_service.return_value.generate_image.return_value = "generated.png"
+            response = test_client.post(
+                "/generate",
+                data={"prompt": "Modify this", "model": "gemini", "upload_identifier": identifier},
+            )
+            assert response.status_code == 200
+            mock_get_service.return_value.generate_image.assert_called_once_with("Modify this", identifier)
+
+    @pytest.mark.parametrize("identifier", ["upload_0_big.png", "../results/generated.png"])
+    def test_generate_with_unknown_upload_identifier(self, identifier):
+        with patch("backend.endpoints.generation.get_service") as mock_get_service:
+            response = test_client.post(
+                "/generate",
+                data={"prompt": "Modify this", "model": "gemini", "upload_identifier": identifier},
+            )
+        assert response.status_code == 404
+        mock_get_service.return_value.generate_image.assert_not_called()
+
+    # ------------------------- ERROR HANDLING -------------------------
+
+    def test_complete_with_missing_chunks(self, session_manager, mock_storage_service, image_bytes):
+        upload_id = self._create(image_bytes).json()["upload_id"]
+        self._put_chunk(upload_id, 0, image_bytes)
+        response = test_client.post(f"/uploads/{upload_id}/complete", data={"checksum": "0" * 64})
+        assert response.status_code == 409
+
+    def test_checksum_mismatch(self, session_manager, mock_storage_service, image_bytes):
+        data = self._create(image_bytes).json()
+        for index in range(data["total_chunks"]):
+            self._put_chunk(data["upload_id"], index, image_bytes)
+        response = test_client.post(f"/uploads/{data['upload_id']}/complete", data={"checksum": "0" * 64})
+        assert response.status_code == 400
+        assert not mock_storage_service.saved
+
+    def test_chunk_with_wrong_size(self, session_manager, image_bytes):
+        upload_id = self._create(image_bytes).json()["upload_id"]
+        response = test_client.put(f"/uploads/{upload_id}/chunks/0", content=b"short")
+        assert response.status_code == 400
+
+    def test_chunk_index_out_of_range(self, session_manager, image_bytes):
+        upload_id = self._create(image_bytes).json()["upload_id"]
+        response = test_client.put(f"/uploads/{upload_id}/chunks/999", content=b"x")
+        assert response.status_code == 400
+
+    def test_unknown_session(self, session_manager):
+        assert test_client.get(f"/uploads/{'a' * 32}").status_code == 404
+        assert test_client.put("/uploads/../../etc/chunks/0", content=b"x").status_code == 404
+
+    def test_invalid_file_type(self, session_manager):
+        response = test_client.post("/uploads", data={"filename": "notes.txt", "total_size": 10})
+        assert response.status_code == 400
+
+    def test_declared_size_too_large(self, session_manager):
+        response = test_client.post("/uploads", data={"filename": "big.png", "total_size": 10 * 1024 * 1024 + 1})
+        assert response.status_code == 413
+
+    def test_abort_upload(self, session_manager, image_bytes):
+        upload_id = self._create(image_bytes).json()["upload_id"]
+        assert test_client.delete(f"/uploads/{upload_id}").status_code == 200
+        assert test_client.get(f"/uploads/{upload_id}").status_code == 404
+
+
+# ------------------------- PYTEST EVENT LOOP FIXTURE -------------------------
+
+@pytest.fixture(scope="session")
+def event_loop():
+    """Create an instance of the default event loop for the test session."""
+    loop = asyncio.get_event_loop_policy().new_event_loop()
+    yield loop
+    loop.close()
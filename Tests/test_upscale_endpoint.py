@@ -27,7 +27,7 @@ class MockPicsartUpscaleService:
         self.fail_with_not_found = fail_with_not_found
         self.fail_with_api_error = fail_with_api_error
 
-    def upscale_image(self, image_identifier: str, upscale_factor: int):
+    async def upscale_image(self, image_identifier: str, upscale_factor: int):
         if self.fail_with_not_found:
             raise FileNotFoundError(f"Image with identifier {image_identifier} not found.")
         if self.fail_with_api_error:
@@ -80,7 +80,7 @@ class TestUpscaleEndpoint:
     def test_upscale_image_success(self, upscale_factor, mock_storage_service):
         """Test successful image upscaling with valid scale factors."""
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService()
             mock_service_class.return_value = mock_service_instance
@@ -126,7 +126,7 @@ class TestUpscaleEndpoint:
     def test_empty_image_identifier(self, mock_storage_service):
         """Test empty image_identifier."""
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService(fail_with_not_found=True)
             mock_service_class.return_value = mock_service_instance
@@ -167,7 +167,7 @@ class TestUpscaleEndpoint:
     def test_null_image_identifier(self, mock_storage_service):
         """Test null/None image_identifier."""
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService(fail_with_not_found=True)
             mock_service_class.return_value = mock_service_instance
@@ -192,7 +192,7 @@ class TestUpscaleEndpoint:
     def test_image_not_found(self, mock_storage_service):
         """Test handling when image identifier is not found."""
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService(fail_with_not_found=True)
             mock_service_class.return_value = mock_service_instance
@@ -212,7 +212,7 @@ class TestUpscaleEndpoint:
     def test_picsart_api_error(self, mock_storage_service):
         """Test handling of Picsart API errors."""
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService(fail_with_api_error=True)
             mock_service_class.return_value = mock_service_instance
@@ -232,7 +232,7 @@ class TestUpscaleEndpoint:
     def test_general_service_failure(self, mock_storage_service):
         """Test general service failure handling."""
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService(should_fail=True)
             mock_service_class.return_value = mock_service_instance
@@ -250,7 +250,7 @@ class TestUpscaleEndpoint:
     def test_picsart_api_key_missing(self, mock_storage_service):
         """Test handling when Picsart API key is not configured."""
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             # Mock the service to raise ValueError for missing API key
             mock_service_class.side_effect = ValueError("Picsart API key is not configured.")
@@ -259,7 +259,8 @@ class TestUpscaleEndpoint:
                 "/upscale",
                 data={
                     "image_identifier": "test_image_123",
-                    "upscale_factor": 2
+                    "upscale_factor": 2,
+                    "provider": "picsart"
                 }
             )
             
@@ -273,7 +274,7 @@ class TestUpscaleEndpoint:
         """Test with extremely long image identifier."""
         long_identifier = "a" * 1000
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService()
             mock_service_class.return_value = mock_service_instance
@@ -307,7 +308,7 @@ class TestUpscaleEndpoint:
     def test_special_characters_in_identifier(self, special_identifier, mock_storage_service):
         """Test image identifiers with special characters."""
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService()
             mock_service_class.return_value = mock_service_instance
@@ -326,7 +327,7 @@ class TestUpscaleEndpoint:
     def test_concurrent_upscale_requests(self, mock_storage_service):
         """Test concurrent upscale requests."""
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService()
             mock_service_class.return_value = mock_service_instance
@@ -352,7 +353,7 @@ class TestUpscaleEndpoint:
     def test_response_format_validation(self, mock_storage_service):
         """Test that the response contains all required fields in correct format."""
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService()
             mock_service_class.return_value = mock_service_instance
@@ -405,7 +406,7 @@ class TestUpscaleEndpoint:
         logging.getLogger("image_gen_api").propagate = True
 
         with patch("backend.endpoints.generation.get_storage_service", return_value=mock_storage_service), \
-             patch("backend.endpoints.generation.PicsartUpscaleService") as mock_service_class:
+             patch("backend.services.post_processing.registry.PicsartUpscaleService") as mock_service_class:
             
             mock_service_instance = MockPicsartUpscaleService()
             mock_service_class.return_value = mock_service_instance
@@ -1,23 +1,58 @@
 """
 Main application entry point.
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 import os
 from backend.endpoints.generation import router as generation_router
+from backend.endpoints.uploads import router as uploads_router
+from backend.endpoints.metrics import router as metrics_router
+from backend.endpoints.admin import router as admin_router
 from backend.config.logging_config import setup_logging
 from backend.middleware.logging_middleware import LoggingMiddleware
+from backend.middleware.request_size_middleware import RequestSizeLimitMiddleware
+from backend.middleware.metrics_middleware import MetricsMiddleware
+from backend.middleware.tracing_middleware import TracingMiddleware
+from backend.middleware.profiling_middleware import ProfilingMiddleware
 from backend.utils.logger import app_logger
+from backend.utils.metrics import metrics
+from backend.utils.http_client import close_http_client
+from backend.services.storage.variants import variant_builder
+from backend.utils.image_pool import image_pool
 # from backend.routes.generation_routes import router as generation_router
 # from backend.config.settings import UPLOAD_DIR, RESULT_DIR
 
 # Setup logging first
 setup_logging()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and shutdown."""
+    # Runs after gunicorn forks, so every worker flushes its own metrics snapshot
+    metrics.start_flushing()
+    yield
+    await close_http_client()
+    variant_builder.shutdown()
+    image_pool.shutdown()
+    metrics.flush()
+
 # Create FastAPI app
-app = FastAPI(title="Image Generation API")
+app = FastAPI(title="Image Generation API", lifespan=lifespan)
+
+# Reject oversized bodies before they are parsed (innermost, so rejections are still logged)
+app.add_middleware(RequestSizeLimitMiddleware)
+
+# On-demand sampling profiler (armed through /admin/profile)
+app.add_middleware(ProfilingMiddleware)
+
+# Per-stage spans and the Server-Timing header
+app.add_middleware(TracingMiddleware)
+
+# Per-route latency histograms and counters for /metrics
+app.add_middleware(MetricsMiddleware)
 
 # Add logging middleware (should be added early)
 app.add_middleware(LoggingMiddleware)
@@ -35,6 +70,9 @@ app.add_middleware(
 app_logger.info("Image Generation API starting up...")
 
 app.include_router(router=generation_router)
+app.include_router(router=uploads_router)
+app.include_router(router=metrics_router)
+app.include_router(router=admin_router)
 # Include routers - removing the /api prefix since main.py already mounts this app at /api
 # app.include_router(generation_router, tags=["generation"])
 
@@ -1,5 +1,9 @@
+import atexit
 import logging
 import logging.config
+import logging.handlers
+import queue
+import threading
 from pathlib import Path
 import os
 from datetime import datetime
@@ -7,6 +11,19 @@ from datetime import datetime
 # Check if running on Vercel
 IS_VERCEL = os.getenv("VERCEL") == "1"
 
+# Queue (non-blocking) logging: request-path calls only enqueue records and a
+# single listener thread formats and writes them. Disabled on Vercel, where a
+# background thread may be frozen between invocations.
+LOG_QUEUE_ENABLED = os.getenv("LOG_QUEUE_ENABLED", "0" if IS_VERCEL else "1") == "1"
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_QUEUE_POLICY = os.getenv("LOG_QUEUE_POLICY", "drop")  # "drop" or "block"
+LOG_QUEUE_BLOCK_TIMEOUT = float(os.getenv("LOG_QUEUE_BLOCK_TIMEOUT", 0.5))  # seconds, for "block"
+
+# "text" or "json" (one structured JSON object per line)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Level of the application logger. Calls below it return after a single check.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG").upper()
+
 # Create logs directory only if not on Vercel
 if not IS_VERCEL:
     LOGS_DIR = Path("logs")
@@ -28,8 +45,7 @@ LOGGING_CONFIG = {
             "datefmt": "%Y-%m-%d %H:%M:%S",
         },
         "json": {
-            "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-            "datefmt": "%Y-%m-%d %H:%M:%S",
+            "()": "backend.utils.logger.JsonFormatter",
         },
     },
     "handlers": {
@@ -88,7 +104,7 @@ LOGGING_CONFIG = {
             "propagate": False,
         },
         "image_gen_api": {  # Our application logger
-            "level": "DEBUG",
+            "level": LOG_LEVEL,
             "handlers": ["console", "file", "error_file"],
             "propagate": False,
         },
@@ -125,7 +141,15 @@ def setup_logging():
         LOGGING_CONFIG['loggers']['image_gen_api']['handlers'] = ['console']
         LOGGING_CONFIG['loggers']['image_gen_api.access']['handlers'] = ['console']
 
+    if LOG_FORMAT == "json":
+        for handler in LOGGING_CONFIG['handlers'].values():
+            handler['formatter'] = 'json'
+
+    stop_queue_logging()
     logging.config.dictConfig(LOGGING_CONFIG)
+
+    if LOG_QUEUE_ENABLED:
+        start_queue_logging()
     
     # Create a custom logger for the application
     logger = logging.getLogger("image_gen_api")
@@ -136,3 +160,156 @@ def setup_logging():
 def get_logger(name: str = "image_gen_api"):
     """Get a logger instance."""
     return logging.getLogger(name)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never formats on the calling thread and applies a
+    drop/block policy when the bounded queue is full.
+
+    Every logger gets its own instance tagged with a route so that the shared
+    listener can deliver the record to that logger's original handlers.
+    """
+
+    def __init__(self, log_queue: queue.Queue, route: str, stats: "LogQueueStats",
+                 policy: str = LOG_QUEUE_POLICY, block_timeout: float = LOG_QUEUE_BLOCK_TIMEOUT):
+        super().__init__(log_queue)
+        self.route = route
+        self.stats = stats
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Formatting (including str(msg) % args) is deferred to the listener thread
+        record.log_route = self.route
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.stats.record_drop(record)
+            return
+        self.stats.record_enqueue(self.queue.qsize())
+
+
+class RoutingQueueListener(logging.handlers.QueueListener):
+    """Single writer thread that hands each record to the handlers of its route."""
+
+    def __init__(self, log_queue: queue.Queue, routes: dict, stats: "LogQueueStats"):
+        super().__init__(log_queue, respect_handler_level=True)
+        self.routes = routes
+        self.stats = stats
+        self._reported_drops = 0
+
+    def handle(self, record: logging.LogRecord) -> None:
+        dropped = self.stats.dropped
+        if dropped != self._reported_drops:
+            self._report_drops(dropped - self._reported_drops)
+            self._reported_drops = dropped
+
+        for handler in self.routes.get(getattr(record, "log_route", ""), ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _report_drops(self, count: int) -> None:
+        record = logging.LogRecord(
+            "image_gen_api", logging.WARNING, __file__, 0,
+            "LOG QUEUE FULL: DROPPED %d RECORDS", (count,), None,
+        )
+        for handler in self.routes.get("image_gen_api", ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class LogQueueStats:
+    """Counters for the logging queue. Only drops take a lock; the hot path does not."""
+
+    def __init__(self, capacity: int, policy: str):
+        self.capacity = capacity
+        self.policy = policy
+        self.enqueued = 0
+        self._dropped_lock = threading.Lock()
+        self.dropped = 0
+        self.dropped_by_level = {}
+        self.max_depth = 0
+        self.queue = None
+
+    def record_enqueue(self, depth: int) -> None:
+        self.enqueued += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def record_drop(self, record: logging.LogRecord) -> None:
+        with self._dropped_lock:
+            self.dropped += 1
+            self.dropped_by_level[record.levelname] = self.dropped_by_level.get(record.levelname, 0) + 1
+
+    def snapshot(self) -> dict:
+        return {
+            "enabled": True,
+            "policy": self.policy,
+            "capacity": self.capacity,
+            "depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "dropped_by_level": dict(self.dropped_by_level),
+        }
+
+
+_queue_listener = None
+_queue_stats = None
+
+
+def start_queue_logging(capacity: int = LOG_QUEUE_SIZE, policy: str = LOG_QUEUE_POLICY):
+    """
+    Move every configured logger behind a bounded queue. The handlers created
+    by dictConfig are detached from the loggers and owned by the listener.
+    """
+    global _queue_listener, _queue_stats
+    stop_queue_logging()
+
+    if policy not in ("drop", "block"):
+        raise ValueError(f"Unknown LOG_QUEUE_POLICY: {policy}")
+
+    log_queue = queue.Queue(maxsize=capacity)
+    stats = LogQueueStats(capacity, policy)
+    stats.queue = log_queue
+
+    routes = {}
+    for logger_name in LOGGING_CONFIG["loggers"]:
+        logger = logging.getLogger(logger_name or None)
+        if not logger.handlers:
+            continue
+        routes[logger_name] = list(logger.handlers)
+        logger.handlers = [BoundedQueueHandler(log_queue, logger_name, stats, policy=policy)]
+
+    _queue_listener = RoutingQueueListener(log_queue, routes, stats)
+    _queue_listener.start()
+    _queue_stats = stats
+    return _queue_listener
+
+
+def stop_queue_logging():
+    """Flush the queue and put the original handlers back on their loggers."""
+    global _queue_listener, _queue_stats
+    if _queue_listener is None:
+        return
+    listener, _queue_listener, _queue_stats = _queue_listener, None, None
+    listener.stop()
+    for logger_name, handlers in listener.routes.items():
+        logging.getLogger(logger_name or None).handlers = handlers
+
+
+def get_log_queue_stats() -> dict:
+    """Counters for the logging queue (enqueued, dropped, depth, ...)."""
+    if _queue_stats is None:
+        return {"enabled": False}
+    return _queue_stats.snapshot()
+
+
+atexit.register(stop_queue_logging)
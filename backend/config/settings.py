@@ -15,7 +15,82 @@ PHOTOTOOM_API_KEY = os.getenv("PHOTOTOOM_API_KEY")
 PICSART_API_KEY = os.getenv("PICSART_API_KEY")
 
 # Picsart API
-PICSART_UPSCALE_URL = "https://api.picsart.io/tools/1.0/upscale"
+PICSART_UPSCALE_URL = os.getenv("PICSART_UPSCALE_URL", "https://api.picsart.io/tools/1.0/upscale")
+
+# Process pool shared by all CPU-bound image work (decode, resize, re-encode,
+# local upscaling and background removal, result variants)
+IMAGE_POOL_WORKERS = int(os.getenv("IMAGE_POOL_WORKERS", os.getenv("LOCAL_UPSCALE_WORKERS", min(4, os.cpu_count() or 1))))
+# Tasks allowed to wait for a worker; beyond that callers get ImagePoolBusyError
+IMAGE_POOL_MAX_PENDING = int(os.getenv("IMAGE_POOL_MAX_PENDING", 64))
+# Byte arguments and results from this size on go through shared memory instead of the worker pipe
+IMAGE_POOL_SHM_THRESHOLD = int(os.getenv("IMAGE_POOL_SHM_THRESHOLD", 64 * 1024))
+
+# Local upscaler (the "local" provider of /upscale)
+LOCAL_UPSCALE_STRIP_MEGAPIXELS = float(os.getenv("LOCAL_UPSCALE_STRIP_MEGAPIXELS", 4))  # output pixels per pool task
+LOCAL_UPSCALE_MAX_OUTPUT_MEGAPIXELS = float(os.getenv("LOCAL_UPSCALE_MAX_OUTPUT_MEGAPIXELS", 64))
+
+# PhotoRoom API
+PHOTOROOM_SEGMENT_URL = os.getenv("PHOTOROOM_SEGMENT_URL", "https://sdk.photoroom.com/v1/segment")
+
+# Shared outbound HTTP client for the post-processing providers (Picsart, PhotoRoom)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", 20))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 60))  # seconds an idle connection is kept
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 90))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", 30))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", 30))  # waiting for a free connection
+# Negotiate HTTP/2 with providers that support it (needs the h2 package)
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+
+# Send providers that accept image URLs (Picsart) a public storage URL instead
+# of the image bytes, when the file is already public (files are never shared for this)
+PROVIDER_URL_PASSTHROUGH = os.getenv("PROVIDER_URL_PASSTHROUGH", "1") == "1"
+
+# Local background removal for flat backgrounds; /download only calls PhotoRoom
+# when the local engine's confidence is below the minimum
+LOCAL_BG_REMOVAL_ENABLED = os.getenv("LOCAL_BG_REMOVAL_ENABLED", "1") == "1"
+LOCAL_BG_REMOVAL_MIN_CONFIDENCE = float(os.getenv("LOCAL_BG_REMOVAL_MIN_CONFIDENCE", 0.9))
+
+# Derived result encodings built in the background after a result is saved and
+# served by /results/{identifier} to clients that accept them. Comma-separated
+# format:quality (webp or avif; webp:lossless for lossless WebP); empty disables.
+RESULT_VARIANTS = os.getenv("RESULT_VARIANTS", "webp:lossless,webp:85,avif:60")
+RESULT_VARIANT_WORKERS = int(os.getenv("RESULT_VARIANT_WORKERS", 1))
+# Builds allowed to wait; results saved beyond that are only served as stored
+RESULT_VARIANT_QUEUE = int(os.getenv("RESULT_VARIANT_QUEUE", 32))
+# Thumbnails (longest side in pixels, WebP) and a BlurHash placeholder, built
+# with the variants; empty sizes disables the thumbnails
+THUMBNAIL_SIZES = [int(size) for size in os.getenv("THUMBNAIL_SIZES", "256,512").split(",") if size.strip()]
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", 80))
+PLACEHOLDER_ENABLED = os.getenv("PLACEHOLDER_ENABLED", "1") == "1"
+# How long a result response waits for its placeholder, computed in the image
+# pool as the result is saved; past that the response carries null
+PLACEHOLDER_WAIT = float(os.getenv("PLACEHOLDER_WAIT", 1.0))  # seconds
+# Lossless re-encoding of stored PNG results, run with the variants: maximum
+# deflate and, with RESULT_PNG_PALETTE, an exact palette for images with at
+# most 256 colours. The stored file is replaced when it shrinks by at least
+# RESULT_PNG_MIN_SAVING (a fraction of its size).
+RESULT_PNG_OPTIMIZE = os.getenv("RESULT_PNG_OPTIMIZE", "1") == "1"
+RESULT_PNG_PALETTE = os.getenv("RESULT_PNG_PALETTE", "1") == "1"
+RESULT_PNG_CPU_BUDGET = float(os.getenv("RESULT_PNG_CPU_BUDGET", 2))  # CPU seconds per image
+RESULT_PNG_MIN_SAVING = float(os.getenv("RESULT_PNG_MIN_SAVING", 0.02))
+
+# Post-processing providers, in failover order: on a timeout, connection error
+# or 5xx from one provider the next is tried. /upscale uses the chain unless a
+# provider is asked for explicitly.
+UPSCALE_PROVIDERS = [p.strip() for p in os.getenv("UPSCALE_PROVIDERS", "picsart,local").split(",") if p.strip()]
+BG_REMOVAL_PROVIDERS = [p.strip() for p in os.getenv("BG_REMOVAL_PROVIDERS", "photoroom").split(",") if p.strip()]
+# Deadline for one provider attempt (seconds); a slower provider counts as failed
+PROVIDER_ATTEMPT_TIMEOUT = float(os.getenv("PROVIDER_ATTEMPT_TIMEOUT", 60))
+# Consecutive failures after which a provider is skipped for the cooldown
+PROVIDER_FAILURE_THRESHOLD = int(os.getenv("PROVIDER_FAILURE_THRESHOLD", 3))
+PROVIDER_COOLDOWN_SECONDS = float(os.getenv("PROVIDER_COOLDOWN_SECONDS", 30))
+
+# Optional provider endpoint overrides (e.g. the stub servers in benchmarks/loadtest)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
 
 # Gemini model configuration
 GEMINI_IMG_MODEL = "gemini-2.5-flash-image-preview"
@@ -24,6 +99,14 @@ GEMINI_DESC_MODEL = "gemini-2.5-flash"
 OPENAI_IMG_MODEL = "gpt-image-1"
 OPENAI_DESC_MODEL = "gpt-5"
 
+# Simulation providers (sim, sim-gemini, sim-openai) for offline load tests
+# When set, every live model name (gemini, openai) is routed to its simulated counterpart
+SIM_MODE = os.getenv("SIM_MODE", "0") == "1"
+# JSON file with profiles that override or extend the built-in ones
+SIM_CONFIG_FILE = os.getenv("SIM_CONFIG_FILE")
+# Seed for simulated latency and errors (unseeded when unset)
+SIM_SEED = os.getenv("SIM_SEED")
+
 # Check if running on Vercel
 if os.getenv("VERCEL") == "1":
     # Use the /tmp directory for uploads and results on Vercel
@@ -46,10 +129,68 @@ ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
 # Max file size (10MB)
 MAX_FILE_SIZE = 10 * 1024 * 1024
 
+# Chunked (resumable) upload configuration
+# Session state lives on disk so that any worker can accept any chunk.
+UPLOAD_SESSION_DIR = os.getenv("UPLOAD_SESSION_DIR", os.path.join(UPLOAD_DIR, "sessions"))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # 1MB default
+MIN_UPLOAD_CHUNK_SIZE = 64 * 1024
+MAX_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+UPLOAD_SESSION_TTL = int(os.getenv("UPLOAD_SESSION_TTL", 24 * 60 * 60))  # seconds
+os.makedirs(UPLOAD_SESSION_DIR, exist_ok=True)
+
+# Request body limits, enforced at the ASGI layer before the body is parsed.
+# Multipart routes get some headroom on top of the file limit for the form
+# boundaries and the other fields; the file itself is still checked exactly
+# by FileStorage.save_upload.
+MULTIPART_OVERHEAD = 64 * 1024
+MAX_REQUEST_BODY_SIZE = int(os.getenv("MAX_REQUEST_BODY_SIZE", 1024 * 1024))  # default for all other routes
+REQUEST_BODY_LIMITS = [
+    # (path regex, max body bytes)
+    (r"^/generate$", MAX_FILE_SIZE + MULTIPART_OVERHEAD),
+    (r"^/uploads/[^/]+/chunks/[^/]+$", MAX_UPLOAD_CHUNK_SIZE),
+]
+
+# Image metadata index (dimensions, format, mode, size per stored identifier)
+IMAGE_METADATA_DIR = os.getenv("IMAGE_METADATA_DIR", os.path.join(UPLOAD_DIR, "metadata"))
+
 # Storage Type
 STORAGE_TYPE = os.getenv("STORAGE_TYPE", "gcp") # gcp for Google Drive
 
 # Google Drive settings
 GOOGLE_DRIVE_APP_FOLDER_ID = os.getenv("GOOGLE_DRIVE_APP_FOLDER_ID") 
 GOOGLE_CLIENT_SECRET_FILE = os.path.join(BASE_DIR, "client_secret.json")
-GOOGLE_TOKEN_FILE = os.path.join(BASE_DIR, "token.json")
\ No newline at end of file
+GOOGLE_TOKEN_FILE = os.path.join(BASE_DIR, "token.json")
+# When set, Drive calls go to this endpoint without authentication (stub servers only)
+GOOGLE_DRIVE_API_ENDPOINT = os.getenv("GOOGLE_DRIVE_API_ENDPOINT")
+
+# Metrics
+# Directory shared by all gunicorn workers; when set, /metrics aggregates across workers.
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))  # seconds
+# Optional bearer token required to scrape /metrics
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Tracing
+# Add a Server-Timing header with the per-stage breakdown to every response
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "1") == "1"
+# When set, finished traces are appended to this file as OTLP/JSON lines
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE")
+
+# Latency sampling (rolling percentiles and slow-request capture)
+LATENCY_WINDOW_SECONDS = float(os.getenv("LATENCY_WINDOW_SECONDS", 300))
+LATENCY_WINDOW_SLICES = int(os.getenv("LATENCY_WINDOW_SLICES", 10))
+SLOW_REQUEST_THRESHOLD = float(os.getenv("SLOW_REQUEST_THRESHOLD", 10.0))  # seconds
+SLOW_REQUEST_BUFFER_SIZE = int(os.getenv("SLOW_REQUEST_BUFFER_SIZE", 200))
+
+# Token required in the X-Admin-Token header for /admin endpoints (disabled when unset)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# On-demand profiling (armed through /admin/profile or the X-Profile-Token header)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/profiles" if os.getenv("VERCEL") == "1" else os.path.join(BASE_DIR, "profiles"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))  # seconds between stack samples
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 300))  # hard cap on any profiling session
+
+# Traffic capture for offline replay (benchmarks/loadtest/replay.py)
+# Directory for the scrubbed per-worker capture files (disabled when unset)
+TRAFFIC_CAPTURE_DIR = os.getenv("TRAFFIC_CAPTURE_DIR")
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", 1.0))
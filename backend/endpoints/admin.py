@@ -0,0 +1,93 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
+from backend.config.settings import ADMIN_TOKEN, LATENCY_WINDOW_SECONDS
+from backend.services.post_processing.registry import provider_health
+from backend.utils.latency_sampler import latency_sampler
+from backend.utils.profiler import profile_controller
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is configured."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Constant-time comparison, so the token cannot be guessed from response times
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="INVALID ADMIN TOKEN")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/latency")
+async def get_latency_percentiles():
+    """Rolling p50/p95/p99 per endpoint and per stage."""
+    return JSONResponse(content={
+        "window_seconds": LATENCY_WINDOW_SECONDS,
+        "slow_request_threshold": latency_sampler.threshold,
+        **latency_sampler.percentiles(),
+    })
+
+
+@router.get("/slow-requests")
+async def get_slow_requests(limit: int = 50):
+    """Most recent requests above the latency threshold, newest first."""
+    captured = list(latency_sampler.slow_requests)[::-1][:limit]
+    return JSONResponse(content={
+        "threshold": latency_sampler.threshold,
+        "count": len(captured),
+        "requests": captured,
+    })
+
+
+@router.delete("/latency")
+async def reset_latency_percentiles():
+    """Clear the rolling windows and the slow-request buffer."""
+    latency_sampler.reset()
+    return JSONResponse(content={"success": True, "message": "Latency samples cleared"})
+
+
+@router.get("/providers")
+async def get_provider_health():
+    """Health of each post-processing provider in its failover chain."""
+    return JSONResponse(content=provider_health())
+
+
+@router.post("/profile")
+async def start_profiling(requests: Optional[int] = None, seconds: Optional[float] = None):
+    """
+    Profile the next ``requests`` requests and/or the next ``seconds`` seconds
+    on this worker (only the next request when neither is given).
+    """
+    if (requests is not None and requests < 1) or (seconds is not None and seconds <= 0):
+        raise HTTPException(status_code=400, detail="requests and seconds must be positive")
+    try:
+        session = profile_controller.start(requests=requests, seconds=seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return JSONResponse(status_code=202, content={"success": True, "message": "Profiling armed", "profile": session})
+
+
+@router.get("/profile")
+async def get_profiling_status():
+    """The running session, if any, and the profiles captured by this worker."""
+    return JSONResponse(content=profile_controller.status())
+
+
+@router.delete("/profile")
+async def stop_profiling():
+    """Stop the running session early and write its output."""
+    session = profile_controller.stop()
+    if session is None:
+        raise HTTPException(status_code=404, detail="NO PROFILING IN PROGRESS")
+    return JSONResponse(content={"success": True, "message": "Profiling stopped", "profile": session})
+
+
+@router.get("/profile/{name}")
+async def download_profile(name: str):
+    """Collapsed stacks, ready for flamegraph.pl, speedscope or inferno."""
+    path = profile_controller.get_profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="PROFILE NOT FOUND")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=name)
@@ -1,17 +1,19 @@
-import os
-import tempfile
-from contextlib import contextmanager
-from fastapi import APIRouter, File, Form, UploadFile, HTTPException
+import mimetypes
+from fastapi import APIRouter, File, Form, Header, UploadFile, HTTPException
 from typing import Optional
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from backend.utils.logger import app_logger
+from backend.utils.tracing import span, set_attribute
 from backend.utils.file_utils import allowed_file
-from backend.utils.custom_exceptions import FileTooLargeError
+from backend.utils.custom_exceptions import FileTooLargeError, ImagePoolBusyError, ImageTooLargeError
+from backend.utils.image_ops import render_thumbnail
+from backend.utils.image_pool import image_pool
 from backend.services.generation_service.service_factory import get_service
 from backend.services.storage.storage_factory import get_storage_service
-from backend.config.settings import PHOTOTOOM_API_KEY
-from backend.services.bg_rem.download_service import process_download_image
-from backend.services.upscale.upscale_service import PicsartUpscaleService
+from backend.config.settings import THUMBNAIL_SIZES, THUMBNAIL_QUALITY
+from backend.services.storage.variants import MIME_TYPES, choose_variant, result_previews
+from backend.services.bg_rem.download_service import remove_background
+from backend.services.post_processing.registry import provider_chain, run_with_failover
 
 router = APIRouter()
 
@@ -20,21 +22,28 @@ router = APIRouter()
 async def generate_image(
     prompt: str = Form(...),
     model: str = Form(...),
-    file: Optional[UploadFile] = File(None)
+    file: Optional[UploadFile] = File(None),
+    upload_identifier: Optional[str] = Form(None)
     ):
-    """Generate image endpoint."""
+    """
+    Generate image endpoint.
+
+    The reference image is either sent inline as ``file`` or referenced by the
+    ``upload_identifier`` returned from a completed chunked upload (/uploads).
+    """
     app_logger.info(f"GENERATE IMAGE ENDPOINT ACCESSED", extra={
         "prompt": prompt,
         "model": model,
         "has_file": file is not None,
-        "filename": file.filename if file else None
+        "filename": file.filename if file else None,
+        "upload_identifier": upload_identifier
     })
     
     storage_service = get_storage_service()
+    set_attribute("model", model.lower())
+    set_attribute("prompt_length", len(prompt))
 
     try:
-        file_path = None
-        upload_identifier = None
         if file and file.filename:
             app_logger.info(f"CHECKING IF FILE IS ALLOWED")
 
@@ -42,15 +51,19 @@ async def generate_image(
                 raise HTTPException(status_code=400, detail="FILE TYPE NOT ALLOWED")
             
             app_logger.info(f"SAVING FILE TO STORAGE")
+            set_attribute("upload_size", file.size)
             upload_identifier = storage_service.save_upload(file)
             app_logger.info(f"FILE SAVED SUCCESSFULLY WITH IDENTIFIER: {upload_identifier}")
+        elif upload_identifier and not storage_service.upload_exists(upload_identifier):
+            raise HTTPException(status_code=404, detail="UPLOAD NOT FOUND")
         
         if not prompt.strip():
             raise HTTPException(status_code=400, detail="PROMPT CANNOT BE EMPTY")
 
         # Get the appropriate service from the factory
         app_logger.info(f"GETTING SERVICE FROM THE FACTORY WITH MODEL NAME: {model}")
-        service = get_service(model)
+        with span("get_service"):
+            service = get_service(model)
         result_path = None
         result_filename = None
         
@@ -64,7 +77,8 @@ async def generate_image(
                 "success": True,
                 "message": "Image generated successfully",
                 "result_path": result_uri,
-                "result_identifier": result_identifier
+                "result_identifier": result_identifier,
+                **(await result_previews(result_identifier))
             })
         else:
             raise HTTPException(status_code=400, detail="SERVICE NOT FOUND")
@@ -78,18 +92,6 @@ async def generate_image(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@contextmanager
-def temporary_file(content: bytes, suffix: str = ".png"):
-    """Context manager for creating a temporary file from content."""
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-        yield temp_file_path
-    finally:
-        if os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
-
 @router.post("/download")
 async def download_image(file_identifier: str = Form(...)):
     app_logger.info(
@@ -99,36 +101,36 @@ async def download_image(file_identifier: str = Form(...)):
         },
     )
     
-    if not PHOTOTOOM_API_KEY:
-        app_logger.error("PHOTOTOOM API KEY NOT FOUND IN CONFIG")
-        raise HTTPException(status_code=500, detail="PHOTOTOOM API KEY NOT CONFIGURED")
-
     storage_service = get_storage_service()
     
     try:
         # Get the file content
         image_content = storage_service.get_result_content(file_identifier)
-        
-        # Use a temporary file for processing
-        with temporary_file(image_content) as local_input_path:
-            app_logger.info(f"DELEGATING TO THE WORKER FUNCTION FOR BG REMOVAL")
-            output_path = process_download_image(input_path=local_input_path, api_key=PHOTOTOOM_API_KEY)
-
-            # Upload the processed file back to storage
-            with open(output_path, "rb") as f:
-                image_data = f.read()
-        
-        processed_identifier = storage_service.save_result(image_data, extension='png')
+
+        # Flat backgrounds are keyed out locally; the rest is streamed from PhotoRoom straight into storage
+        app_logger.info(f"DELEGATING TO THE WORKER FUNCTION FOR BG REMOVAL")
+        removal = await remove_background(
+            image_content,
+            storage_service=storage_service,
+            filename=file_identifier if "." in file_identifier else "image.png",
+        )
+        processed_identifier = removal["identifier"]
         processed_uri = storage_service.get_results_uri(processed_identifier)
 
         return JSONResponse(content={
             "success": True,
             "message": "Background removed successfully",
             "result_path": processed_uri,
-            "result_identifier": processed_identifier
+            "result_identifier": processed_identifier,
+            "engine": removal["engine"],
+            "confidence": removal["confidence"],
+            **(await result_previews(processed_identifier))
         })
+    except TimeoutError:
+        app_logger.error(f"BACKGROUND REMOVAL PROVIDERS TIMED OUT")
+        raise HTTPException(status_code=504, detail="Background removal timed out")
     except Exception as e:
-        app_logger.error(f"FAILED TO REMOVE BACKGROUND USING PHOTOTOOM: {str(e)}")
+        app_logger.error(f"FAILED TO REMOVE BACKGROUND: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/generate/generate_image_description")
@@ -157,23 +159,42 @@ async def generate_image_description(file_identifier: str = Form(...)):
 @router.post("/upscale")
 async def upscale_image(
     image_identifier: str = Form(...),
-    upscale_factor: int = Form(...)
+    upscale_factor: int = Form(...),
+    provider: Optional[str] = Form(None)
 ):
-    """Upscale image endpoint."""
+    """
+    Upscale image endpoint.
+
+    ``provider`` pins one provider: ``picsart`` or ``local``, the in-process
+    upscaler meant for quick, cheap previews. Without it the configured
+    chain (UPSCALE_PROVIDERS) is used, failing over on timeouts and 5xx.
+    """
     app_logger.info(f"UPSCALE IMAGE ENDPOINT ACCESSED", extra={
         "image_identifier": image_identifier,
         "upscale_factor": upscale_factor,
+        "provider": provider,
     })
 
     if upscale_factor not in [2, 4]:
         app_logger.error(f"Invalid upscale factor: {upscale_factor}. Must be 2 or 4.")
         raise HTTPException(status_code=400, detail="Upscale factor must be 2 or 4.")
+    try:
+        provider_chain("upscale", provider)
+    except ValueError as e:
+        app_logger.error(f"Invalid upscale provider: {provider}")
+        raise HTTPException(status_code=400, detail=str(e))
 
     storage_service = get_storage_service()
+    set_attribute("upscale_factor", upscale_factor)
+    if provider:
+        set_attribute("upscale_provider", provider)
     
     try:
-        upscale_service = PicsartUpscaleService(storage_service)
-        new_identifier, input_res, upscaled_res = upscale_service.upscale_image(image_identifier, upscale_factor)
+        used_provider, (new_identifier, input_res, upscaled_res) = await run_with_failover(
+            "upscale",
+            lambda upscale_service: upscale_service.upscale_image(image_identifier, upscale_factor),
+            preferred=provider,
+        )
         result_uri = storage_service.get_results_uri(new_identifier)
 
         return JSONResponse(content={
@@ -182,11 +203,99 @@ async def upscale_image(
             "result_path": result_uri,
             "result_identifier": new_identifier,
             "input_resolution": input_res,
-            "upscaled_resolution": upscaled_res
+            "upscaled_resolution": upscaled_res,
+            "provider": used_provider,
+            **(await result_previews(new_identifier))
         })
     except FileNotFoundError as e:
         app_logger.error(f"Image not found for upscaling: {str(e)}")
         raise HTTPException(status_code=404, detail=str(e))
+    except ImageTooLargeError as e:
+        app_logger.error(f"Image too large for upscaling: {str(e)}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except ImagePoolBusyError as e:
+        app_logger.error(f"Image pool busy, cannot upscale: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except TimeoutError:
+        app_logger.error(f"Upscale providers timed out")
+        raise HTTPException(status_code=504, detail="Upscaling timed out")
     except Exception as e:
         app_logger.error(f"Failed to upscale image: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/images/{identifier}/metadata")
+async def get_image_metadata(identifier: str):
+    """Format, dimensions, mode and byte size of a stored image, served from the metadata index."""
+    app_logger.info(f"IMAGE METADATA ENDPOINT ACCESSED", extra={"identifier": identifier})
+    storage_service = get_storage_service()
+    try:
+        metadata = storage_service.get_metadata(identifier)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        app_logger.error(f"FAILED TO READ IMAGE METADATA: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return JSONResponse(content={
+        "success": True,
+        "message": "Image metadata retrieved successfully",
+        "metadata": metadata,
+    })
+
+
+def _result_metadata(storage_service, identifier: str) -> dict:
+    """The index entry of a stored result; anything else (uploads, unknown ids) is a 404."""
+    metadata = storage_service.get_metadata(identifier, probe=False)
+    if not metadata or metadata.get("kind") != "result":
+        raise HTTPException(status_code=404, detail=f"Result {identifier} not found.")
+    return metadata
+
+
+@router.get("/results/{identifier}")
+async def get_result(identifier: str, original: bool = False, accept: Optional[str] = Header(None)):
+    """
+    A stored result. Unless ``original`` is set, the smallest derived variant
+    (WebP/AVIF) the ``Accept`` header lists is sent instead of the stored PNG.
+    Only identifiers indexed as results are served; their variants are
+    reached through them.
+    """
+    storage_service = get_storage_service()
+    metadata = _result_metadata(storage_service, identifier)
+    variant = None if original else choose_variant(metadata, accept)
+    set_attribute("result_variant", variant["format"].lower() if variant else "original")
+    try:
+        if variant:
+            content = storage_service.get_result_content(variant["identifier"])
+            media_type = variant["mime_type"]
+        else:
+            content = storage_service.get_result_content(identifier)
+            media_type = MIME_TYPES.get(metadata.get("format")) or mimetypes.guess_type(identifier)[0] or "application/octet-stream"
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Result {identifier} not found.")
+
+    # The body depends on Accept, so shared caches must key on it
+    return Response(content=content, media_type=media_type, headers={"Vary": "Accept"})
+
+
+@router.get("/results/{identifier}/thumbnails/{size}")
+async def get_result_thumbnail(identifier: str, size: int):
+    """A WebP thumbnail of a result, ``size`` pixels on its longest side (one of THUMBNAIL_SIZES)."""
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=404, detail=f"No {size}px thumbnails; sizes are {', '.join(map(str, THUMBNAIL_SIZES))}.")
+    storage_service = get_storage_service()
+    thumbnail = (_result_metadata(storage_service, identifier).get("thumbnails") or {}).get(str(size))
+    try:
+        if thumbnail:
+            content = storage_service.get_result_content(thumbnail["identifier"])
+        else:
+            # Not built yet: render this one in the image pool; the background build stores it
+            set_attribute("thumbnail", "on_demand")
+            original = storage_service.get_result_content(identifier)
+            content = await image_pool.run(render_thumbnail, original, size, THUMBNAIL_QUALITY)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Result {identifier} not found.")
+    except ImagePoolBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return Response(content=content, media_type="image/webp")
+
@@ -0,0 +1,18 @@
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from backend.config.settings import METRICS_TOKEN
+from backend.utils.metrics import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus scrape endpoint."""
+    # Constant-time comparison, so the token cannot be guessed from response times
+    if METRICS_TOKEN and not hmac.compare_digest((authorization or "").encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="INVALID METRICS TOKEN")
+
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,120 @@
+from typing import Optional
+from fastapi import APIRouter, Form, HTTPException, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from backend.utils.logger import app_logger
+from backend.utils.file_utils import allowed_file
+from backend.utils.custom_exceptions import (
+    FileTooLargeError,
+    UploadSessionNotFoundError,
+    UploadIncompleteError,
+)
+from backend.services.storage.storage_factory import get_storage_service
+from backend.services.storage.upload_sessions import upload_session_manager
+
+router = APIRouter(prefix="/uploads")
+
+
+@router.post("")
+async def create_upload_session(
+    filename: str = Form(...),
+    total_size: int = Form(...),
+    content_type: Optional[str] = Form(None),
+    chunk_size: Optional[int] = Form(None)
+):
+    """Start a resumable upload. Chunks may then be sent in parallel and in any order."""
+    app_logger.info(f"CREATE UPLOAD SESSION ENDPOINT ACCESSED", extra={
+        "filename": filename,
+        "total_size": total_size,
+        "chunk_size": chunk_size,
+    })
+
+    if not allowed_file(filename):
+        raise HTTPException(status_code=400, detail="FILE TYPE NOT ALLOWED")
+
+    try:
+        manifest = upload_session_manager.create_session(filename, total_size, content_type, chunk_size)
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return JSONResponse(status_code=201, content={
+        "success": True,
+        "message": "Upload session created",
+        "upload_id": manifest["upload_id"],
+        "chunk_size": manifest["chunk_size"],
+        "total_chunks": manifest["total_chunks"],
+    })
+
+
+@router.put("/{upload_id}/chunks/{index}")
+async def upload_chunk(upload_id: str, index: int, request: Request):
+    """Receive one chunk as the raw request body. Re-sending a chunk replaces it."""
+    try:
+        written = await upload_session_manager.write_chunk(upload_id, index, request.stream())
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return JSONResponse(content={
+        "success": True,
+        "upload_id": upload_id,
+        "index": index,
+        "size": written,
+    })
+
+
+@router.get("/{upload_id}")
+async def get_upload_status(upload_id: str):
+    """Report which chunks have been received so that a client can resume."""
+    try:
+        status = upload_session_manager.get_status(upload_id)
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return JSONResponse(content={"success": True, **status})
+
+
+@router.post("/{upload_id}/complete")
+async def complete_upload(upload_id: str, checksum: str = Form(...)):
+    """Assemble the chunks, verify the SHA-256 checksum and store the upload."""
+    app_logger.info(f"COMPLETE UPLOAD ENDPOINT ACCESSED", extra={"upload_id": upload_id})
+
+    def finalize() -> str:
+        # Storage clients are per thread (see storage_factory), so the worker thread gets its own
+        return upload_session_manager.finalize(upload_id, checksum, get_storage_service())
+
+    try:
+        # Hashing, assembling and storing a large upload would stall every other request on the loop
+        upload_identifier = await run_in_threadpool(finalize)
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadIncompleteError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        app_logger.error(f"FAILED TO FINALIZE UPLOAD {upload_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return JSONResponse(content={
+        "success": True,
+        "message": "Upload completed successfully",
+        "upload_identifier": upload_identifier,
+    })
+
+
+@router.delete("/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Abort an upload session and discard any received chunks."""
+    try:
+        upload_session_manager.get_session(upload_id)
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    upload_session_manager.delete_session(upload_id)
+    return JSONResponse(content={"success": True, "message": "Upload session aborted"})
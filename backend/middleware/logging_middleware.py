@@ -1,53 +1,89 @@
 import time
-from typing import Callable
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from backend.utils.logger import app_logger
-import json
-
-class LoggingMiddleware(BaseHTTPMiddleware):
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
-        start_time = time.time()
-        
+import uuid
+from starlette.datastructures import URL, Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from backend.utils.logger import app_logger, request_id_var
+from backend.utils.latency_sampler import latency_sampler
+from backend.utils.traffic_capture import traffic_recorder
+
+
+def get_client_ip(scope: Scope, headers: Headers) -> str:
+    """Extract client IP address from the ASGI scope."""
+    # Check for forwarded headers first (for reverse proxies)
+    forwarded_for = headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+
+    # Check for real IP header
+    real_ip = headers.get("x-real-ip")
+    if real_ip:
+        return real_ip
+
+    # Fall back to direct client IP
+    client = scope.get("client")
+    if client:
+        return client[0]
+
+    return "unknown"
+
+
+class LoggingMiddleware:
+    """
+    Pure ASGI access-log middleware.
+
+    Unlike ``BaseHTTPMiddleware`` this does not spawn a task or a memory
+    stream per request: it only wraps ``send`` to observe the status code and
+    count body bytes as they pass through, so streaming and SSE responses are
+    forwarded untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        arrival_time = time.time()
+
         # Extract request details
-        method = request.method
-        url = str(request.url)
-        client_ip = self.get_client_ip(request)
-        user_agent = request.headers.get("user-agent", "")
-        
+        headers = Headers(scope=scope)
+        method = scope["method"]
+        url = str(URL(scope=scope))
+        client_ip = get_client_ip(scope, headers)
+        user_agent = headers.get("user-agent", "")
+
+        # Every log line emitted while handling this request carries its id
+        request_id = headers.get("x-request-id") or uuid.uuid4().hex
+        request_id_token = request_id_var.set(request_id)
+
         # Log the incoming request
         app_logger.debug(f"Incoming request: {method} {url} from {client_ip}")
-        
+
+        status_code = 0
+        response_bytes = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["x-request-id"] = request_id
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
         # Process the request
         try:
-            response = await call_next(request)
-            
-            # Calculate processing time
-            processing_time = time.time() - start_time
-            
-            # Log the request completion
-            app_logger.log_request(
-                method=method,
-                url=url,
-                client_ip=client_ip,
-                user_agent=user_agent,
-                status_code=response.status_code,
-                processing_time=processing_time
-            )
-            
-            # Log response details for debugging (only for non-successful responses)
-            if response.status_code >= 400:
-                app_logger.warning(
-                    f"Request failed: {method} {url} - Status: {response.status_code} - Time: {processing_time:.3f}s"
-                )
-            
-            return response
-            
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # Includes streaming the whole body; failed requests are timed too
+                processing_time = time.perf_counter() - start_time
         except Exception as e:
-            # Calculate processing time even for failed requests
-            processing_time = time.time() - start_time
-            
+            status_code = 500
+
             # Log the exception
             app_logger.error(
                 f"Request failed with exception: {method} {url}",
@@ -58,94 +94,120 @@ class LoggingMiddleware(BaseHTTPMiddleware):
                     "processing_time": processing_time
                 }
             )
-            
-            # Re-raise the exception to let FastAPI handle it
+
+            # Re-raise the exception to let the server handle it
             raise
-    
-    def get_client_ip(self, request: Request) -> str:
-        """Extract client IP address from request."""
-        # Check for forwarded headers first (for reverse proxies)
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        # Check for real IP header
-        real_ip = request.headers.get("x-real-ip")
-        if real_ip:
-            return real_ip
-        
-        # Fall back to direct client IP
-        if request.client:
-            return request.client.host
-        
-        return "unknown"
-
-
-class DetailedLoggingMiddleware(BaseHTTPMiddleware):
-    """Enhanced logging middleware with request/response body logging for debugging."""
-    
-    def __init__(self, app, log_bodies: bool = False, max_body_length: int = 1000):
-        super().__init__(app)
+        else:
+            # Log the request completion
+            app_logger.log_request(
+                method=method,
+                url=url,
+                client_ip=client_ip,
+                user_agent=user_agent,
+                status_code=status_code,
+                processing_time=processing_time,
+                response_bytes=response_bytes
+            )
+
+            # Log response details for debugging (only for non-successful responses)
+            if status_code >= 400:
+                app_logger.warning(
+                    f"Request failed: {method} {url} - Status: {status_code} - Time: {processing_time:.3f}s"
+                )
+        finally:
+            # Feed the rolling percentiles and the slow-request buffer, failures included
+            content_length = headers.get("content-length")
+            route = getattr(scope.get("route"), "path", "unmatched")
+            request_bytes = int(content_length) if content_length and content_length.isdigit() else None
+            trace = scope.get("state", {}).get("trace")
+            latency_sampler.record(
+                method=method,
+                route=route,
+                status_code=status_code,
+                duration=processing_time,
+                request_bytes=request_bytes,
+                response_bytes=response_bytes,
+                trace=trace,
+            )
+
+            # Scrubbed capture for offline replay (TRAFFIC_CAPTURE_DIR)
+            if traffic_recorder is not None:
+                traffic_recorder.record(arrival_time, method, route, status_code, processing_time,
+                                        request_bytes, response_bytes, trace=trace)
+
+            request_id_var.reset(request_id_token)
+
+
+class DetailedLoggingMiddleware:
+    """Enhanced pure ASGI logging middleware with request/response body logging for debugging."""
+
+    def __init__(self, app: ASGIApp, log_bodies: bool = False, max_body_length: int = 1000):
+        self.app = app
         self.log_bodies = log_bodies
         self.max_body_length = max_body_length
-    
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Process the request with detailed logging."""
-        start_time = time.time()
-        
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+
         # Extract request details
-        method = request.method
-        url = str(request.url)
-        client_ip = self.get_client_ip(request)
-        user_agent = request.headers.get("user-agent", "")
-        
+        headers = Headers(scope=scope)
+        method = scope["method"]
+        url = str(URL(scope=scope))
+        client_ip = get_client_ip(scope, headers)
+
         request_details = {
             "method": method,
             "url": url,
             "client_ip": client_ip,
-            "headers": dict(request.headers),
-            "query_params": dict(request.query_params)
+            "headers": dict(headers),
+            "query_params": scope.get("query_string", b"").decode("latin-1")
         }
-        
-        # Log request body if enabled (be careful with large files)
-        if self.log_bodies and method in ["POST", "PUT", "PATCH"]:
-            try:
-                body = await request.body()
-                if len(body) <= self.max_body_length:
-                    # Only log if it's likely to be JSON/text
-                    try:
-                        request_details["body"] = body.decode("utf-8")
-                    except UnicodeDecodeError:
-                        request_details["body"] = f"<binary data, {len(body)} bytes>"
-                else:
-                    request_details["body"] = f"<large body, {len(body)} bytes>"
-            except Exception as e:
-                app_logger.warning(f"Could not read request body: {e}")
-        
+
+        # Capture at most max_body_length bytes of the request body as it is
+        # consumed by the app (be careful with large files)
+        capture_body = self.log_bodies and method in ["POST", "PUT", "PATCH"]
+        body_preview = bytearray()
+        body_size = 0
+
+        async def receive_wrapper() -> Message:
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                body_size += len(chunk)
+                if len(body_preview) < self.max_body_length:
+                    body_preview.extend(chunk[:self.max_body_length - len(body_preview)])
+            return message
+
+        status_code = 0
+        response_bytes = 0
+        response_headers = {}
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_bytes, response_headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = dict(Headers(raw=message.get("headers", [])))
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
         # Log the incoming request with details
         app_logger.debug(f"Detailed request log", extra=request_details)
-        
+
         # Process the request
         try:
-            response = await call_next(request)
-            
-            # Calculate processing time
-            processing_time = time.time() - start_time
-            
-            # Log the response details
-            response_details = {
-                "status_code": response.status_code,
-                "processing_time": processing_time,
-                "response_headers": dict(response.headers)
-            }
-            
-            app_logger.info(f"Request completed: {method} {url}", extra=response_details)
-            
-            return response
-            
+            await self.app(scope, receive_wrapper if capture_body else receive, send_wrapper)
         except Exception as e:
-            processing_time = time.time() - start_time
-            
+            processing_time = time.perf_counter() - start_time
+            if capture_body:
+                request_details["body"] = self._describe_body(body_preview, body_size)
+
             app_logger.error(
                 f"Request failed: {method} {url}",
                 exception=e,
@@ -154,20 +216,29 @@ class DetailedLoggingMiddleware(BaseHTTPMiddleware):
                     "request_details": request_details
                 }
             )
-            
+
             raise
-    
-    def get_client_ip(self, request: Request) -> str:
-        """Extract client IP address from request."""
-        forwarded_for = request.headers.get("x-forwarded-for")
-        if forwarded_for:
-            return forwarded_for.split(",")[0].strip()
-        
-        real_ip = request.headers.get("x-real-ip")
-        if real_ip:
-            return real_ip
-        
-        if request.client:
-            return request.client.host
-        
-        return "unknown"
+
+        # Calculate processing time
+        processing_time = time.perf_counter() - start_time
+
+        # Log the response details
+        response_details = {
+            "status_code": status_code,
+            "processing_time": processing_time,
+            "response_bytes": response_bytes,
+            "response_headers": response_headers
+        }
+        if capture_body:
+            response_details["request_body"] = self._describe_body(body_preview, body_size)
+
+        app_logger.info(f"Request completed: {method} {url}", extra=response_details)
+
+    def _describe_body(self, preview: bytearray, size: int) -> str:
+        if size > self.max_body_length:
+            return f"<large body, {size} bytes>"
+        try:
+            # Only log if it's likely to be JSON/text
+            return bytes(preview).decode("utf-8")
+        except UnicodeDecodeError:
+            return f"<binary data, {size} bytes>"
@@ -0,0 +1,42 @@
+import time
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from backend.utils.metrics import HTTP_REQUESTS, HTTP_LATENCY, HTTP_IN_FLIGHT
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route request counts, latency and the
+    number of requests in flight.
+
+    Routes are labelled with their path template (``/uploads/{upload_id}``)
+    rather than the raw path, so label cardinality stays bounded. Requests
+    that match no route are labelled ``unmatched``.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # The router stores the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            HTTP_LATENCY.observe(time.perf_counter() - start_time, route=route, method=method)
+            HTTP_REQUESTS.inc(route=route, method=method, status=status_code)
@@ -0,0 +1,58 @@
+import hmac
+from typing import Optional
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from backend.config.settings import ADMIN_TOKEN
+from backend.utils.profiler import profile_controller
+
+PROFILE_HEADER = b"x-profile-token"
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that puts requests under the sampling profiler.
+
+    Requests are profiled while a session armed through ``POST /admin/profile``
+    is running, or when they carry ``X-Profile-Token: <ADMIN_TOKEN>``. With no
+    session armed and no admin token configured the only cost is one attribute
+    read per request. Profiled responses get an ``X-Profile`` header naming
+    the output file.
+    """
+
+    def __init__(self, app: ASGIApp, token: Optional[str] = ADMIN_TOKEN, controller=profile_controller):
+        self.app = app
+        self.token = token.encode() if token else None
+        self.controller = controller
+
+    def _triggered(self, scope: Scope) -> bool:
+        for key, value in scope["headers"]:
+            if key == PROFILE_HEADER:
+                # Constant-time comparison, as for the admin endpoints
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith("/admin"):
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        triggered = self.token is not None and not controller.armed and self._triggered(scope)
+        if not (controller.armed or triggered):
+            await self.app(scope, receive, send)
+            return
+
+        name = controller.begin_request(triggered=triggered)
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["x-profile"] = name
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            controller.end_request(name)
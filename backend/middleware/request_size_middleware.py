@@ -0,0 +1,108 @@
+import re
+import json
+from typing import Iterable, Optional, Tuple
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from backend.config.settings import MAX_REQUEST_BODY_SIZE, REQUEST_BODY_LIMITS
+from backend.utils.logger import app_logger
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Pure ASGI middleware that rejects oversized request bodies with 413.
+
+    A declared ``Content-Length`` above the route limit is rejected before a
+    single body byte is read. Bodies without a length (chunked transfer) are
+    counted as they stream in; once the limit is crossed the application is
+    told the client disconnected, and the response it would have produced is
+    replaced by the 413. Either way the body is never fully received or spooled.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        default_limit: int = MAX_REQUEST_BODY_SIZE,
+        route_limits: Iterable[Tuple[str, int]] = REQUEST_BODY_LIMITS,
+    ):
+        self.app = app
+        self.default_limit = default_limit
+        self.route_limits = [(re.compile(pattern), limit) for pattern, limit in route_limits]
+
+    def get_limit(self, path: str) -> int:
+        for pattern, limit in self.route_limits:
+            if pattern.match(path):
+                return limit
+        return self.default_limit
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.get_limit(scope["path"])
+
+        content_length = self._get_content_length(scope)
+        if content_length is not None and content_length > limit:
+            app_logger.warning(f"REJECTING REQUEST BODY OF {content_length} BYTES FOR {scope['path']} (LIMIT {limit})")
+            await self._send_413(send, limit)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    exceeded = True
+                    app_logger.warning(f"REQUEST BODY FOR {scope['path']} EXCEEDED {limit} BYTES WHILE STREAMING")
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            nonlocal response_started
+            if exceeded:
+                # Swallow whatever the app produced after seeing the disconnect
+                if not response_started:
+                    response_started = True
+                    await self._send_413(send, limit)
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not exceeded:
+                raise
+        if exceeded and not response_started:
+            await self._send_413(send, limit)
+
+    @staticmethod
+    def _get_content_length(scope: Scope) -> Optional[int]:
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    @staticmethod
+    async def _send_413(send: Send, limit: int) -> None:
+        body = json.dumps({"detail": f"Request body exceeds the limit of {limit} bytes."}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,52 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from backend.config.settings import SERVER_TIMING_ENABLED
+from backend.utils.logger import get_request_id
+from backend.utils.tracing import Trace, current_trace, trace_exporter
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI middleware that opens a trace for every request, so that
+    ``span()`` calls in the router, services and storage backends are
+    collected, and reports the per-stage breakdown in a ``Server-Timing``
+    response header. Finished traces go to the OTLP/JSON file exporter when
+    ``TRACE_EXPORT_FILE`` is set.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = get_request_id()
+        trace = Trace(trace_id=request_id, name=f"{scope['method']} {scope['path']}")
+        trace.attributes["request_id"] = request_id
+        trace.attributes["http.method"] = scope["method"]
+        trace.attributes["http.target"] = scope["path"]
+        token = current_trace.set(trace)
+        # Expose the trace to outer middleware (and request.state)
+        scope.setdefault("state", {})["trace"] = trace
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                trace.attributes["http.status_code"] = message["status"]
+                if self.server_timing:
+                    MutableHeaders(scope=message).append("server-timing", trace.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            trace.finish()
+            route = scope.get("route")
+            if route is not None:
+                trace.attributes["http.route"] = route.path
+                trace.name = f"{scope['method']} {route.path}"
+            current_trace.reset(token)
+            if trace_exporter is not None:
+                trace_exporter.export(trace)
@@ -1,72 +1,42 @@
-import os
-import uuid
-from pathlib import Path
-import mimetypes
+from backend.config.settings import LOCAL_BG_REMOVAL_ENABLED, LOCAL_BG_REMOVAL_MIN_CONFIDENCE
+from backend.services.bg_rem.local_bg_removal import remove_flat_background
+from backend.services.post_processing.registry import run_with_failover
+from backend.services.storage.base import FileStorage
+from backend.utils.custom_exceptions import ImagePoolBusyError
+from backend.utils.image_pool import image_pool
 from backend.utils.logger import app_logger
-import http.client
-
-
-def process_download_image(input_path: str, api_key: str) -> str:
-    filename_stem = Path(input_path).stem
-    unique_suffix = uuid.uuid4().hex[:8]
-    output_path = os.path.join(
-        os.path.dirname(input_path),
-        f"{filename_stem}_NO_BG_{unique_suffix}.png"
+from backend.utils.metrics import track_provider
+from backend.utils.tracing import set_attribute
+
+
+async def remove_background(image_content: bytes, storage_service: FileStorage, filename: str = "image.png") -> dict:
+    """
+    Remove the background of an image and store the cutout.
+
+    Images on a flat background are keyed out locally; everything else, or
+    anything the local engine is not confident about (or cannot take on while
+    the image pool is full), goes to the background removal providers
+    (PhotoRoom) with failover. Returns the stored ``identifier``, the
+    ``engine`` that was used (local or the provider name) and the local
+    engine's ``confidence`` (None when it is disabled).
+    """
+    confidence = None
+    if LOCAL_BG_REMOVAL_ENABLED:
+        cutout = None
+        try:
+            with track_provider("local", "remove_background"):
+                confidence, cutout = await image_pool.run(remove_flat_background, image_content, LOCAL_BG_REMOVAL_MIN_CONFIDENCE)
+            app_logger.info(f"LOCAL BACKGROUND REMOVAL CONFIDENCE: {confidence}")
+        except ImagePoolBusyError:
+            app_logger.warning("IMAGE POOL BUSY; SENDING BACKGROUND REMOVAL TO THE PROVIDERS")
+        if cutout is not None:
+            set_attribute("bg_removal_engine", "local")
+            identifier = storage_service.save_result(cutout, extension='png')
+            return {"identifier": identifier, "engine": "local", "confidence": confidence}
+
+    engine, identifier = await run_with_failover(
+        "remove_background",
+        lambda provider: provider.remove_background(image_content, filename=filename),
     )
-    app_logger.info("INSIDE PROCESS DOWNLOAD IMAGE FUNCTION")
-    try:
-        boundary = '----------{}'.format(uuid.uuid4().hex)
-
-        content_type, _ = mimetypes.guess_type(input_path)
-        if content_type is None:
-            content_type = 'application/octet-stream'
-
-        app_logger.info("READING IMAGE FILE FOR PHOTOTOOM API")
-        # Prepare the POST data
-        app_logger.info("PREPARING READING IMAGE FILE")
-        with open(input_path, 'rb') as f:
-            image_data = f.read()
-        filename = os.path.basename(input_path)
-
-        body = (
-            f"--{boundary}\r\n"
-            f"Content-Disposition: form-data; name=\"image_file\"; filename=\"{filename}\"\r\n"
-            f"Content-Type: {content_type}\r\n\r\n"
-        ).encode('utf-8') + image_data + f"\r\n--{boundary}--\r\n".encode('utf-8')
-
-        app_logger.info(
-            f"CALLING PHOTOTOOM API FOR BACKGROUND REMOVAL WITH FILE PATH: {input_path}"
-        )
-        # Set up the HTTP connection and headers
-        conn = http.client.HTTPSConnection('sdk.photoroom.com')
-
-        headers = {
-            'Content-Type': f'multipart/form-data; boundary={boundary}',
-            'x-api-key': api_key,
-        }
-
-        # Make the POST request
-        conn.request('POST', '/v1/segment', body=body, headers=headers)
-        response = conn.getresponse()
-
-        # Handle the response
-        if response.status == 200:
-            response_data = response.read()
-            with open(output_path, 'wb') as out_f:
-                out_f.write(response_data)
-            app_logger.info("PHOTOTOOM BACKGROUND REMOVAL SUCCESSFUL")
-            app_logger.info(f"IMAGE SAVED TO: {output_path}")
-        else:
-            error_body = response.read()
-            error_msg = f"PhotoRoom API error: {response.status} - {response.reason}"
-            app_logger.error(error_msg)
-            app_logger.error(f"RESPONSE: {error_body}")
-            raise Exception(error_msg)
-
-        # Close the connection
-        conn.close()
-        return output_path
-
-    except Exception as e:
-        app_logger.error(f"FAILED TO REMOVE BACKGROUND USING PHOTOTOOM: {str(e)}")
-        raise
\ No newline at end of file
+    set_attribute("bg_removal_engine", engine)
+    return {"identifier": identifier, "engine": engine, "confidence": confidence}
@@ -0,0 +1,146 @@
+"""
+Background removal for images on a flat (uniform or near-uniform) background.
+
+Generated product shots, stickers and logos usually sit on a plain colour,
+which can be keyed out locally in a fraction of the time of a PhotoRoom
+call. The engine estimates how sure it is; callers fall back to PhotoRoom
+when the confidence is low (textured or gradient backgrounds, subjects
+touching every edge, soft shadows, ...).
+"""
+from io import BytesIO
+from typing import Optional, Tuple
+import numpy as np
+from PIL import Image
+
+# Colour distance (Euclidean, 0-255 RGB) below which a pixel is pure background
+# and above which it is pure foreground; the matte ramps in between.
+BACKGROUND_TOLERANCE = 10.0
+FOREGROUND_DISTANCE = 40.0
+
+# Largest side of the downscaled copy used for the background analysis
+ANALYSIS_SIZE = 256
+
+# Rows of the full-resolution image processed at once while building the matte
+MATTE_ROWS = 512
+
+PNG_COMPRESS_LEVEL = 1
+
+
+def _distance(pixels: np.ndarray, color: np.ndarray) -> np.ndarray:
+    # One channel at a time, so the temporaries are a single float plane each
+    total = np.zeros(pixels.shape[:-1], dtype=np.float32)
+    for channel in range(3):
+        diff = pixels[..., channel].astype(np.float32) - np.float32(color[channel])
+        total += diff * diff
+    return np.sqrt(total, out=total)
+
+
+def _border(pixels: np.ndarray, band: int) -> np.ndarray:
+    return np.concatenate([
+        pixels[:band].reshape(-1, 3), pixels[-band:].reshape(-1, 3),
+        pixels[band:-band, :band].reshape(-1, 3), pixels[band:-band, -band:].reshape(-1, 3),
+    ])
+
+
+def _dilate(mask: np.ndarray) -> np.ndarray:
+    grown = mask.copy()
+    grown[1:] |= mask[:-1]
+    grown[:-1] |= mask[1:]
+    grown[:, 1:] |= mask[:, :-1]
+    grown[:, :-1] |= mask[:, 1:]
+    return grown
+
+
+def _connected_background(candidates: np.ndarray) -> np.ndarray:
+    """Background-coloured pixels reachable from the image border (flood fill by repeated dilation)."""
+    reached = np.zeros_like(candidates)
+    for edge in (np.s_[0, :], np.s_[-1, :], np.s_[:, 0], np.s_[:, -1]):
+        reached[edge] = candidates[edge]
+    while True:
+        grown = _dilate(reached) & candidates
+        if np.array_equal(grown, reached):
+            return reached
+        reached = grown
+
+
+def analyze_background(image: Image.Image) -> Tuple[float, np.ndarray, np.ndarray]:
+    """
+    Estimate the background colour and how confidently it can be keyed out.
+
+    Works on a copy of at most ``ANALYSIS_SIZE`` pixels per side. Returns the
+    confidence (0-1), the background colour and the low-resolution mask of
+    background pixels connected to the border. Enclosed regions of the
+    background colour (say a white product on white) are left out of that
+    mask, so they stay opaque.
+    """
+    scale = min(ANALYSIS_SIZE / max(image.size), 1.0)
+    # Resized straight to the small size; a full-size copy would double the decoded image in memory
+    small = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.Resampling.BOX)
+    pixels = np.asarray(small)
+    band = max(1, round(min(pixels.shape[:2]) * 0.02))
+
+    border = _border(pixels, band)
+    background = np.median(border, axis=0)
+    uniformity = float((_distance(border, background) <= BACKGROUND_TOLERANCE).mean())
+
+    distance = _distance(pixels, background)
+    connected = _connected_background(distance <= (BACKGROUND_TOLERANCE + FOREGROUND_DISTANCE) / 2)
+    coverage = float(connected.mean())
+
+    # Crisp edges have one or two in-between pixels per edge pixel; shadows,
+    # glows and gradients have many more.
+    edge = connected & _dilate(~connected)
+    ambiguous = (distance > BACKGROUND_TOLERANCE) & (distance < 3 * FOREGROUND_DISTANCE) & _dilate(_dilate(connected))
+    softness = float(ambiguous.sum()) / max(int(edge.sum()), 1)
+
+    uniformity_score = np.clip((uniformity - 0.90) / 0.09, 0.0, 1.0)
+    softness_score = np.clip((6.0 - softness) / 4.0, 0.0, 1.0)
+    # Nothing to remove, or nothing left after removing it
+    coverage_score = 1.0 if 0.05 <= coverage <= 0.95 else 0.0
+    confidence = round(float(uniformity_score * softness_score * coverage_score), 3)
+    return confidence, background, connected
+
+
+def build_matte(image: Image.Image, background: np.ndarray, connected: np.ndarray) -> Image.Image:
+    """
+    RGBA cutout: alpha ramps with the distance from the background colour,
+    and the background colour is unmixed from semi-transparent edge pixels
+    so they do not keep a halo of it.
+    """
+    pixels = np.asarray(image)
+    height, width = pixels.shape[:2]
+    # Grow the low-resolution mask by a pixel so its blocky edge falls inside the subject
+    keyed = np.asarray(Image.fromarray(_dilate(connected)).resize((width, height), Image.Resampling.NEAREST))
+    output = np.empty((height, width, 4), dtype=np.uint8)
+    bg = background.astype(np.float32)
+
+    for top in range(0, height, MATTE_ROWS):
+        rows = np.s_[top:top + MATTE_ROWS]
+        chunk = pixels[rows].astype(np.float32)
+        alpha = np.clip((_distance(pixels[rows], background) - BACKGROUND_TOLERANCE) / (FOREGROUND_DISTANCE - BACKGROUND_TOLERANCE), 0.0, 1.0)
+        alpha[~keyed[rows]] = 1.0
+
+        # colour = alpha * foreground + (1 - alpha) * background, solved for the foreground
+        safe_alpha = np.maximum(alpha, 1e-3)[..., None]
+        foreground = np.clip(bg + (chunk - bg) / safe_alpha, 0, 255)
+        output[rows, :, :3] = np.where(alpha[..., None] > 0, foreground, chunk).astype(np.uint8)
+        output[rows, :, 3] = np.round(alpha * 255).astype(np.uint8)
+
+    return Image.fromarray(output, "RGBA")
+
+
+def remove_flat_background(image_content: bytes, min_confidence: float) -> Tuple[float, Optional[bytes]]:
+    """
+    (confidence, RGBA PNG cutout). The cutout is only made when the confidence
+    reaches ``min_confidence``; otherwise it is None.
+    """
+    image = Image.open(BytesIO(image_content))
+    # convert() copies even when the mode already matches
+    image = image.convert("RGB") if image.mode != "RGB" else image
+    confidence, background, connected = analyze_background(image)
+    if confidence < min_confidence:
+        return confidence, None
+
+    buffer = BytesIO()
+    build_matte(image, background, connected).save(buffer, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return confidence, buffer.getvalue()
@@ -0,0 +1,73 @@
+import mimetypes
+from typing import BinaryIO, Union
+from backend.config.settings import PHOTOTOOM_API_KEY, PHOTOROOM_SEGMENT_URL
+from backend.services.storage.base import FileStorage
+from backend.utils.custom_exceptions import ProviderHTTPError
+from backend.utils.http_client import get_http_client
+from backend.utils.logger import app_logger
+from backend.utils.metrics import track_provider
+
+
+class PhotoRoomService:
+    """The PhotoRoom background removal provider."""
+
+    def __init__(self, storage_service: FileStorage):
+        self.storage_service = storage_service
+        if not PHOTOTOOM_API_KEY:
+            app_logger.error("PHOTOTOOM API KEY NOT FOUND IN CONFIG")
+            raise ValueError("PHOTOTOOM API KEY NOT CONFIGURED")
+        self.api_key = PHOTOTOOM_API_KEY
+
+    async def remove_background(self, image_content: bytes, filename: str = "image.png") -> str:
+        return await process_download_image(image_content, api_key=self.api_key, storage_service=self.storage_service, filename=filename)
+
+
+async def process_download_image(
+    image: Union[bytes, BinaryIO],
+    api_key: str,
+    storage_service: FileStorage,
+    filename: str = "image.png",
+) -> str:
+    """
+    Remove the background of ``image`` with PhotoRoom and store the cutout.
+
+    Nothing touches the local disk: the multipart request is streamed from
+    the given bytes (or file object), and the response body is streamed
+    straight into ``storage_service.save_result_stream``. Returns the
+    identifier of the stored result.
+    """
+    app_logger.info("INSIDE PROCESS DOWNLOAD IMAGE FUNCTION")
+    try:
+        content_type, _ = mimetypes.guess_type(filename)
+        if content_type is None:
+            content_type = 'application/octet-stream'
+
+        app_logger.info(
+            f"CALLING PHOTOTOOM API FOR BACKGROUND REMOVAL WITH FILE: {filename}"
+        )
+        headers = {
+            'x-api-key': api_key,
+        }
+        # httpx encodes multipart as a stream of parts, so the image is not copied into a body buffer
+        files = {'image_file': (filename, image, content_type)}
+
+        # Make the POST request over the shared keep-alive client
+        with track_provider("photoroom", "remove_background"):
+            async with get_http_client().stream("POST", PHOTOROOM_SEGMENT_URL, headers=headers, files=files) as response:
+                # Handle the response
+                if response.status_code != 200:
+                    error_body = await response.aread()
+                    error_msg = f"PhotoRoom API error: {response.status_code} - {response.reason_phrase}"
+                    app_logger.error(error_msg)
+                    app_logger.error(f"RESPONSE: {error_body}")
+                    raise ProviderHTTPError(error_msg, response.status_code)
+
+                result_identifier = await storage_service.save_result_stream(response.aiter_bytes(), extension='png')
+
+        app_logger.info("PHOTOTOOM BACKGROUND REMOVAL SUCCESSFUL")
+        app_logger.info(f"IMAGE SAVED WITH IDENTIFIER: {result_identifier}")
+        return result_identifier
+
+    except Exception as e:
+        app_logger.error(f"FAILED TO REMOVE BACKGROUND USING PHOTOTOOM: {str(e)}")
+        raise
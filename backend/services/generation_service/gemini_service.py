@@ -1,41 +1,62 @@
 from google import genai
 from google.genai import types
-from PIL import Image
-from io import BytesIO
 import os
 import uuid
 from pathlib import Path
-import io
 
-from backend.config.settings import GEMINI_API_KEY, GEMINI_DESC_MODEL,GEMINI_IMG_MODEL
+from backend.config.settings import GEMINI_API_KEY, GEMINI_BASE_URL, GEMINI_DESC_MODEL,GEMINI_IMG_MODEL
 from backend.services.generation_service.base_service import BaseImageGenerationService
+from backend.utils.image_ops import to_png
+from backend.utils.image_pool import image_pool
+from backend.utils.image_probe import image_metadata
 from backend.utils.logger import app_logger
+from backend.utils.metrics import track_provider
+from backend.utils.tracing import span
 from backend.services.storage.storage_factory import get_storage_service
+from backend.services.storage.variants import MIME_TYPES
+
+# Image types Gemini takes as they are; anything else is converted to PNG first
+GEMINI_IMAGE_TYPES = {"image/png", "image/jpeg", "image/webp"}
 
 class GeminiService(BaseImageGenerationService):    
     def __init__(self):
         app_logger.info(f"INITIALIZING GEMINI SERVICE")
-        self.client = genai.Client(api_key=GEMINI_API_KEY)
+        http_options = types.HttpOptions(base_url=GEMINI_BASE_URL) if GEMINI_BASE_URL else None
+        self.client = genai.Client(api_key=GEMINI_API_KEY, http_options=http_options)
         self.img_model = GEMINI_IMG_MODEL
         self.desc_model = GEMINI_DESC_MODEL
         self.storage_service = get_storage_service()
-    
+
+    def _image_part(self, image_bytes: bytes) -> types.Part:
+        """
+        The image as a request part. Passing a PIL image would make the SDK
+        decode and re-encode it in this process; the stored bytes are sent as
+        they are instead, and only formats Gemini does not read are converted
+        (in the image pool).
+        """
+        mime_type = MIME_TYPES.get(image_metadata(image_bytes)["format"])
+        if mime_type not in GEMINI_IMAGE_TYPES:
+            image_bytes = image_pool.run_sync(to_png, image_bytes, 1)
+            mime_type = "image/png"
+        return types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
+
     def generate_image(self, prompt, upload_identifier=None):
         try:
             contents = [prompt]
             if upload_identifier:
                 app_logger.info(f"RECIEVED IMAGE IDENTIFIER")
                 image_bytes = self.storage_service.get_upload_content(upload_identifier)
-                image = Image.open(io.BytesIO(image_bytes))
-                contents.append(image)
+                with span("open_reference"):
+                    contents.append(self._image_part(image_bytes))
             else:
                 app_logger.info(f"NO IMAGE PATH PROVIDED. GOING FORWARD WITH PROMPT ONLY")
             
             app_logger.info(f"CALLING GEMINI CLIENT")
-            response = self.client.models.generate_content(
-                model=self.img_model,
-                contents=contents
-            )
+            with track_provider("gemini", "generate_image"):
+                response = self.client.models.generate_content(
+                    model=self.img_model,
+                    contents=contents
+                )
             
             # Save the generated image
             app_logger.info(f"SAVING THE GENERATED IMAGE")
@@ -59,23 +80,23 @@ class GeminiService(BaseImageGenerationService):
             if result_identifier:
                 print(f"[INFO]---RECIEVED IMAGE IDENTIFIER---")
                 image_bytes = self.storage_service.get_result_content(result_identifier)
-                image = Image.open(io.BytesIO(image_bytes))
-                contents.append(image)
+                contents.append(self._image_part(image_bytes))
             else:
                 app_logger.error(f"NO IMAGE IDENTIFIER PROVIDED")
                 raise ValueError("IMAGE IDENTIFIER IS REQUIRED!")
             
             app_logger.info(f"CALLING GEMINI CLIENT")
-            response = self.client.models.generate_content(
-                model=self.desc_model,
-                config=types.GenerateContentConfig(
-                    system_instruction="""
-                    You are an expert translator that converts images into detailed JSON descriptions for image generation models. Make sure to identify patterns, text, objects, colors explicitly with all other tiny details. 
-                    # OUTPUT FORMAT: YOU Should return a JSON object only.
-                    """
-                ),
-                contents=contents
-            )
+            with track_provider("gemini", "describe_image"):
+                response = self.client.models.generate_content(
+                    model=self.desc_model,
+                    config=types.GenerateContentConfig(
+                        system_instruction="""
+                        You are an expert translator that converts images into detailed JSON descriptions for image generation models. Make sure to identify patterns, text, objects, colors explicitly with all other tiny details. 
+                        # OUTPUT FORMAT: YOU Should return a JSON object only.
+                        """
+                    ),
+                    contents=contents
+                )
             
             app_logger.info(f"RESPONSE RECIEVED FROM GEMINI CLIENT")
             description = response.text
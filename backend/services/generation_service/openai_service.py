@@ -8,13 +8,14 @@ import os
 import uuid
 from pathlib import Path
 from backend.utils.logger import app_logger
-from backend.config.settings import OPENAI_API_KEY, OPENAI_IMG_MODEL, OPENAI_DESC_MODEL
+from backend.utils.metrics import track_provider
+from backend.config.settings import OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_IMG_MODEL, OPENAI_DESC_MODEL
 from backend.services.storage.storage_factory import get_storage_service
 
 class OpenAIService(BaseImageGenerationService):    
     def __init__(self):
         app_logger.info(f"INITIALIZING OPENAI SERVICE")
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
         self.img_model = OPENAI_IMG_MODEL
         self.desc_model = OPENAI_DESC_MODEL
         self.storage_service = get_storage_service()
@@ -26,21 +27,23 @@ class OpenAIService(BaseImageGenerationService):
             result = None
             if image_path and self.storage_service.file_exists(image_path):
                 app_logger.info(f"RECIEVED IMAGE PATH")
-                result = self.client.images.edit(
-                    model=self.img_model,
-                    image=[open(image_path, "rb")],
-                    prompt=prompt,
-                    input_fidelity="high",
-                    quality="high"
-                )
+                with track_provider("openai", "edit_image"):
+                    result = self.client.images.edit(
+                        model=self.img_model,
+                        image=[open(image_path, "rb")],
+                        prompt=prompt,
+                        input_fidelity="high",
+                        quality="high"
+                    )
             else:
                 app_logger.info(f"NO IMAGE PATH PROVIDED. ATTEMPTING GENERATION WITH PROMPT ONLY")
                 
-                result = self.client.images.generate(
-                    model=self.img_model,
-                    prompt=prompt,
-                    quality="high"
-                )
+                with track_provider("openai", "generate_image"):
+                    result = self.client.images.generate(
+                        model=self.img_model,
+                        prompt=prompt,
+                        quality="high"
+                    )
             
             app_logger.info(f"SAVING THE GENERATED IMAGE")
             result_identifier = None
@@ -1,19 +1,54 @@
+import threading
 from .base_service import BaseImageGenerationService
 from .gemini_service import GeminiService
 from .openai_service import OpenAIService
+from .sim_service import SimulationService, load_sim_profiles
+from backend.config.settings import SIM_MODE
 from backend.utils.logger import app_logger
 
-# A registry of available services
+# A registry of available services. Services are built on first use, so the
+# live provider clients are only created when a real model is requested.
 SERVICES = {
-    "gemini": GeminiService(),
-    "openai": OpenAIService(),
+    "gemini": GeminiService,
+    "openai": OpenAIService,
 }
 
+# Live models, the only ones SIM_MODE reroutes
+LIVE_MODELS = frozenset(SERVICES)
+
+# Simulation providers (sim, sim-gemini, sim-openai, plus any configured profile)
+SIM_PROFILES = load_sim_profiles()
+for _name, _profile in SIM_PROFILES.items():
+    SERVICES[_name] = lambda name=_name, profile=_profile: SimulationService(name, profile)
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def resolve_model_name(model_name: str) -> str:
+    """
+    With SIM_MODE on, route a live model to its sim-* counterpart (or plain
+    sim). Unknown names are left alone, so a typo is still rejected.
+    """
+    model_name = model_name.lower()
+    if SIM_MODE and model_name in LIVE_MODELS:
+        return f"sim-{model_name}" if f"sim-{model_name}" in SERVICES else "sim"
+    return model_name
+
+
 def get_service(model_name: str= 'gemini') -> BaseImageGenerationService:
 
     app_logger.info(f"RECEIVED MODEL NAME IN GET SERVICE: {model_name}")
-    service = SERVICES.get(model_name.lower())
-    if not service:
+    model_name = resolve_model_name(model_name)
+    factory = SERVICES.get(model_name)
+    if not factory:
         raise ValueError(f"Unsupported model: {model_name}")
+
+    service = _instances.get(model_name)
+    if service is None:
+        with _instances_lock:
+            service = _instances.get(model_name)
+            if service is None:
+                service = _instances[model_name] = factory()
     app_logger.info(f"RETURNING FACTORY OBJECT")
     return service
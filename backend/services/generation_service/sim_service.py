@@ -0,0 +1,95 @@
+import json
+import time
+import random
+import threading
+from backend.config.settings import SIM_CONFIG_FILE, SIM_SEED
+from backend.services.generation_service.base_service import BaseImageGenerationService
+from backend.services.storage.storage_factory import get_storage_service
+from backend.utils.custom_exceptions import SimulatedProviderError
+from backend.utils.logger import app_logger
+from backend.utils.metrics import track_provider
+from backend.utils.simulation import LatencyDistribution, deterministic_png
+
+# Built-in profiles, roughly matching what the real providers do in production.
+# Each can be overridden (or new sim-* profiles added) through SIM_CONFIG_FILE.
+DEFAULT_SIM_PROFILES = {
+    "sim": {
+        "latency": {"distribution": "constant", "value": 0.0},
+        "width": 512, "height": 512, "noise": 0.25,
+        "error_rate": 0.0,
+    },
+    "sim-gemini": {
+        "latency": {"distribution": "lognormal", "median": 8.0, "sigma": 0.35, "tail": {"probability": 0.02, "multiplier": 3}},
+        "describe_latency": {"distribution": "lognormal", "median": 4.0, "sigma": 0.3},
+        "width": 1024, "height": 1024, "noise": 0.25,
+        "error_rate": 0.01,
+    },
+    "sim-openai": {
+        "latency": {"distribution": "lognormal", "median": 25.0, "sigma": 0.3, "tail": {"probability": 0.02, "multiplier": 2}},
+        "width": 1024, "height": 1024, "noise": 0.25,
+        "error_rate": 0.01,
+    },
+}
+
+
+def load_sim_profiles() -> dict:
+    profiles = {name: dict(profile) for name, profile in DEFAULT_SIM_PROFILES.items()}
+    if SIM_CONFIG_FILE:
+        with open(SIM_CONFIG_FILE) as f:
+            for name, overrides in json.load(f).items():
+                profiles.setdefault(name, dict(DEFAULT_SIM_PROFILES["sim"])).update(overrides)
+    return profiles
+
+
+class SimulationService(BaseImageGenerationService):
+    """
+    Offline stand-in for a generation provider.
+
+    Blocks for a latency drawn from the profile's distribution (the real
+    clients are synchronous too), fails with the profile's error rate, and
+    otherwise stores a deterministic image for the prompt through the normal
+    storage path, so load tests exercise everything except the network call.
+    """
+
+    def __init__(self, name: str, profile: dict):
+        app_logger.info(f"INITIALIZING SIMULATION SERVICE", extra={"profile": name})
+        self.name = name
+        self.width = profile.get("width", 512)
+        self.height = profile.get("height", 512)
+        self.noise = profile.get("noise", 0.25)
+        self.error_rate = profile.get("error_rate", 0.0)
+        self.latency = LatencyDistribution(profile.get("latency"))
+        self.describe_latency = LatencyDistribution(profile.get("describe_latency", profile.get("latency")))
+        self.storage_service = get_storage_service()
+        self._rng = random.Random(f"{SIM_SEED}:{name}" if SIM_SEED is not None else None)
+        self._rng_lock = threading.Lock()
+
+    def _simulate_call(self, latency: LatencyDistribution) -> None:
+        with self._rng_lock:
+            delay = latency.sample(self._rng)
+            failed = self._rng.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            raise SimulatedProviderError(f"SIMULATED {self.name.upper()} FAILURE")
+
+    def generate_image(self, prompt, upload_identifier=None):
+        if upload_identifier:
+            # Read the reference like the real services do
+            self.storage_service.get_upload_content(upload_identifier)
+
+        with track_provider(self.name, "generate_image"):
+            self._simulate_call(self.latency)
+
+        image_data = deterministic_png(f"{self.name}:{prompt}", self.width, self.height, self.noise)
+        result_identifier = self.storage_service.save_result(image_data, extension='png')
+        app_logger.info(f"IMAGE SAVED SUCCESSFULLY WITH IDENTIFIER: {result_identifier}")
+        return result_identifier
+
+    def generate_image_description(self, result_identifier=None):
+        if not result_identifier:
+            raise ValueError("IMAGE IDENTIFIER IS REQUIRED!")
+        self.storage_service.get_result_content(result_identifier)
+
+        with track_provider(self.name, "describe_image"):
+            self._simulate_call(self.describe_latency)
+        return json.dumps({"description": f"Simulated description from {self.name}", "identifier": result_identifier})
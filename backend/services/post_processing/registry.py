@@ -0,0 +1,198 @@
+import asyncio
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+import httpx
+from backend.config.settings import (
+    UPSCALE_PROVIDERS,
+    BG_REMOVAL_PROVIDERS,
+    PROVIDER_ATTEMPT_TIMEOUT,
+    PROVIDER_FAILURE_THRESHOLD,
+    PROVIDER_COOLDOWN_SECONDS,
+)
+from backend.services.bg_rem.photoroom_service import PhotoRoomService
+from backend.services.storage.storage_factory import get_storage_service
+from backend.services.upscale.local_upscale_service import LocalUpscaleService
+from backend.services.upscale.upscale_service import PicsartUpscaleService
+from backend.utils.custom_exceptions import ImagePoolBusyError, ProviderHTTPError
+from backend.utils.logger import app_logger
+from backend.utils.metrics import PROVIDER_FAILOVERS, PROVIDER_HEALTHY
+
+T = TypeVar("T")
+
+# Post-processing operation -> provider name -> factory. Like the generation
+# services, providers are built once on first use and then shared; they all
+# go through the pooled HTTP client.
+POST_PROCESSORS = {
+    "upscale": {
+        "picsart": lambda: PicsartUpscaleService(get_storage_service()),
+        "local": lambda: LocalUpscaleService(get_storage_service()),
+    },
+    "remove_background": {
+        "photoroom": lambda: PhotoRoomService(get_storage_service()),
+    },
+}
+
+# Failover order per operation
+PROVIDER_ORDER = {
+    "upscale": UPSCALE_PROVIDERS,
+    "remove_background": BG_REMOVAL_PROVIDERS,
+}
+
+
+class ProviderHealth:
+    """
+    Consecutive-failure count of one provider. After ``PROVIDER_FAILURE_THRESHOLD``
+    failures in a row it is taken out of rotation for ``PROVIDER_COOLDOWN_SECONDS``;
+    the first call after the cooldown decides whether it stays out.
+    """
+
+    def __init__(self, operation: str, name: str):
+        self.operation = operation
+        self.name = name
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        PROVIDER_HEALTHY.set(1, operation=self.operation, provider=self.name)
+
+    def record_failure(self, error: BaseException) -> None:
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.consecutive_failures >= PROVIDER_FAILURE_THRESHOLD:
+            self.unhealthy_until = time.monotonic() + PROVIDER_COOLDOWN_SECONDS
+            PROVIDER_HEALTHY.set(0, operation=self.operation, provider=self.name)
+            app_logger.warning(f"PROVIDER {self.operation}:{self.name} OUT OF ROTATION FOR {PROVIDER_COOLDOWN_SECONDS:g}S AFTER {self.consecutive_failures} FAILURES")
+
+    def to_dict(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_in_seconds": round(max(self.unhealthy_until - time.monotonic(), 0.0), 1),
+            "last_error": self.last_error,
+        }
+
+
+_instances = {}
+_health = {}
+_lock = threading.Lock()
+
+
+def _validate(operation: str, name: str) -> None:
+    if operation not in POST_PROCESSORS:
+        raise ValueError(f"Unsupported post-processing operation: {operation}")
+    if name not in POST_PROCESSORS[operation]:
+        raise ValueError(f"Unsupported {operation} provider: {name}")
+
+
+def get_post_processor(operation: str, name: str):
+    """The shared provider instance, built on first use. Construction errors (missing keys) are not cached."""
+    _validate(operation, name)
+    key = (operation, name)
+    provider = _instances.get(key)
+    if provider is None:
+        with _lock:
+            provider = _instances.get(key)
+            if provider is None:
+                provider = _instances[key] = POST_PROCESSORS[operation][name]()
+                app_logger.info(f"BUILT {operation} PROVIDER: {name}")
+    return provider
+
+
+def get_provider_health(operation: str, name: str) -> ProviderHealth:
+    key = (operation, name)
+    health = _health.get(key)
+    if health is None:
+        with _lock:
+            health = _health.setdefault(key, ProviderHealth(operation, name))
+    return health
+
+
+def provider_chain(operation: str, preferred: Optional[str] = None) -> List[str]:
+    """
+    Providers to try, in order. A ``preferred`` provider is the only one tried.
+    Providers cooling down go to the back of the chain rather than being dropped,
+    so a request is never refused without at least one attempt.
+    """
+    if preferred:
+        _validate(operation, preferred)
+        return [preferred]
+    names = PROVIDER_ORDER[operation]
+    for name in names:
+        _validate(operation, name)
+    return sorted(names, key=lambda name: not get_provider_health(operation, name).healthy)
+
+
+def is_failover_error(error: BaseException) -> bool:
+    """
+    Timeouts, connection errors, 5xx responses and a full image pool (local
+    providers); anything else is the caller's problem, not the provider's.
+    """
+    if isinstance(error, (asyncio.TimeoutError, httpx.TransportError, ImagePoolBusyError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    if isinstance(error, ProviderHTTPError):
+        return error.status_code >= 500
+    return False
+
+
+async def run_with_failover(
+    operation: str,
+    call: Callable[[object], Awaitable[T]],
+    preferred: Optional[str] = None,
+) -> Tuple[str, T]:
+    """
+    ``await call(provider)`` on each provider in turn until one succeeds.
+    Returns ``(provider name, result)``. Only failover errors (see
+    ``is_failover_error``) move on to the next provider; the last one is
+    re-raised when every provider failed. A provider that cannot be built
+    (a missing API key) counts as a failed attempt and is skipped.
+    """
+    chain = provider_chain(operation, preferred)
+    for position, name in enumerate(chain):
+        health = get_provider_health(operation, name)
+        try:
+            provider = get_post_processor(operation, name)
+        except Exception as e:
+            health.record_failure(e)
+            if position == len(chain) - 1:
+                raise
+            PROVIDER_FAILOVERS.inc(operation=operation, provider=name)
+            app_logger.warning(f"{operation} PROVIDER {name} UNAVAILABLE ({type(e).__name__}: {e}), FAILING OVER TO {chain[position + 1]}")
+            continue
+        try:
+            result = await asyncio.wait_for(call(provider), timeout=PROVIDER_ATTEMPT_TIMEOUT)
+        except Exception as e:
+            if not is_failover_error(e):
+                raise
+            health.record_failure(e)
+            if position == len(chain) - 1:
+                raise
+            PROVIDER_FAILOVERS.inc(operation=operation, provider=name)
+            app_logger.warning(f"{operation} PROVIDER {name} FAILED ({type(e).__name__}: {e}), FAILING OVER TO {chain[position + 1]}")
+            continue
+        health.record_success()
+        return name, result
+
+
+def provider_health() -> dict:
+    """operation -> provider -> health, for every provider in a failover chain."""
+    return {
+        operation: {name: get_provider_health(operation, name).to_dict() for name in names}
+        for operation, names in PROVIDER_ORDER.items()
+    }
+
+
+def reset_post_processors() -> None:
+    """Drop the built providers and their health (tests, settings reloads)."""
+    with _lock:
+        _instances.clear()
+        _health.clear()
@@ -1,9 +1,17 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterable, Optional
 from fastapi import UploadFile
 from backend.config.settings import MAX_FILE_SIZE
+from backend.services.storage.metadata_index import metadata_index
+from backend.services.storage.variants import start_placeholder, variant_builder
 from backend.utils.custom_exceptions import FileTooLargeError
+from backend.utils.image_probe import PROBE_LIMIT, DimensionProbe, image_metadata, probe_metadata
+from backend.utils.metrics import track_storage
 
 class FileStorage(ABC):
+    # Backend label used in metrics
+    name = "base"
+
     def save_upload(self, file: UploadFile) -> str:
         # Check file size
         file.file.seek(0, 2)
@@ -12,7 +20,100 @@ class FileStorage(ABC):
         if file_size > MAX_FILE_SIZE:
             raise FileTooLargeError(f"File size {file_size} exceeds the limit of {MAX_FILE_SIZE} bytes.")
         
-        return self._save_upload(file)
+        head = file.file.read(PROBE_LIMIT)
+        file.file.seek(0)
+
+        with track_storage(self.name, "save_upload"):
+            identifier = self._save_upload(file)
+        self._index_metadata(identifier, probe_metadata(head), file_size, "upload")
+        return identifier
+
+    def save_result(self, image_data: bytes, extension: str = "png") -> str:
+        """Save the generated image and return its identifier."""
+        with track_storage(self.name, "save_result"):
+            identifier = self._save_result(image_data, extension)
+        self._index_metadata(identifier, probe_metadata(image_data), len(image_data), "result")
+        start_placeholder(identifier, image_data)
+        variant_builder.submit(type(self), identifier, image_data)
+        return identifier
+
+    async def save_result_stream(self, chunks: AsyncIterable[bytes], extension: str = "png") -> str:
+        """Save an image arriving in chunks (e.g. a provider response body) and return its identifier."""
+        probe = DimensionProbe()
+        with track_storage(self.name, "save_result"):
+            identifier = await self._save_result_stream(probe.watch(chunks), extension)
+        self._index_metadata(identifier, probe.metadata, probe.size, "result")
+        # The body was not kept, so the builder reads the result back (and provides the placeholder)
+        start_placeholder(identifier)
+        variant_builder.submit(type(self), identifier)
+        return identifier
+
+    def save_variant(self, image_data: bytes, extension: str) -> str:
+        """Store a derived encoding of a result (see variants); unlike save_result it is neither indexed nor re-encoded."""
+        with track_storage(self.name, "save_variant"):
+            return self._save_result(image_data, extension)
+
+    def replace_result(self, identifier: str, image_data: bytes) -> None:
+        """Overwrite a stored result under the same identifier (lossless re-encodes, see variants); not re-indexed."""
+        with track_storage(self.name, "replace_result"):
+            self._replace_result(identifier, image_data)
+
+    def get_metadata(self, identifier: str, probe: bool = True) -> Optional[dict]:
+        """
+        Format, width, height, mode and byte size of a stored image, from the
+        metadata index. Images saved before the index existed are read and
+        probed once, then indexed; with ``probe=False`` a miss returns None.
+        """
+        metadata = metadata_index.get(identifier)
+        if metadata is None and probe:
+            try:
+                content = self.get_result_content(identifier)
+            except FileNotFoundError:
+                try:
+                    content = self.get_upload_content(identifier)
+                except FileNotFoundError:
+                    raise FileNotFoundError(f"Image with identifier {identifier} not found.")
+            metadata = image_metadata(content)
+            metadata_index.put(identifier, metadata)
+        return metadata
+
+    def _index_metadata(self, identifier: str, metadata: Optional[dict], size: int, kind: str) -> None:
+        # Only images whose header could be parsed are indexed. ``kind`` (upload
+        # or result) decides what /results may serve.
+        if metadata is not None:
+            metadata_index.put(identifier, {**metadata, "size": size, "kind": kind})
+
+    def upload_exists(self, identifier: str) -> bool:
+        """Whether ``identifier`` names a stored upload, without reading it."""
+        with track_storage(self.name, "upload_exists"):
+            return self._upload_exists(identifier)
+
+    def get_upload_content(self, identifier: str) -> bytes:
+        """Retrieve the content of an uploaded file."""
+        with track_storage(self.name, "get_upload_content"):
+            content = self._get_upload_content(identifier)
+        if content is None:
+            # Backends that report a failed read as None (Drive)
+            raise FileNotFoundError(f"Upload {identifier} not found.")
+        return content
+
+    def get_result_content(self, identifier: str) -> bytes:
+        """Retrieve the content of a result file."""
+        with track_storage(self.name, "get_result_content"):
+            content = self._get_result_content(identifier)
+        if content is None:
+            raise FileNotFoundError(f"Result {identifier} not found.")
+        return content
+
+    def get_results_uri(self, identifier: str) -> str:
+        """Get the URI for a result file."""
+        with track_storage(self.name, "get_results_uri"):
+            return self._get_results_uri(identifier)
+
+    def get_fetchable_url(self, identifier: str) -> Optional[str]:
+        """A URL external providers can download the file from, or None if the backend has none."""
+        with track_storage(self.name, "get_fetchable_url"):
+            return self._get_fetchable_url(identifier)
 
     @abstractmethod
     def _save_upload(self, file: UploadFile) -> str:
@@ -20,21 +121,39 @@ class FileStorage(ABC):
         pass
 
     @abstractmethod
-    def save_result(self, image_data: bytes, extension: str = "png") -> str:
-        """Save the generated image and return its identifier."""
+    def _save_result(self, image_data: bytes, extension: str = "png") -> str:
+        """Platform-specific implementation for saving a generated image."""
         pass
 
     @abstractmethod
-    def get_upload_content(self, identifier: str) -> bytes:
-        """Retrieve the content of an uploaded file."""
+    def _replace_result(self, identifier: str, image_data: bytes) -> None:
+        """Platform-specific implementation for overwriting a result file."""
         pass
 
+    async def _save_result_stream(self, chunks: AsyncIterable[bytes], extension: str = "png") -> str:
+        """Collects the chunks and saves them in one go; backends that can write incrementally override this."""
+        return self._save_result(b"".join([chunk async for chunk in chunks]), extension)
+
+    def _get_fetchable_url(self, identifier: str) -> Optional[str]:
+        """Files are only reachable through this API by default."""
+        return None
+
     @abstractmethod
-    def get_result_content(self, identifier: str) -> bytes:
-        """Retrieve the content of a result file."""
+    def _upload_exists(self, identifier: str) -> bool:
+        """Platform-specific implementation for checking an upload exists."""
         pass
 
     @abstractmethod
-    def get_results_uri(self, identifier: str) -> str:
-        """Get the URI for a result file."""
-        pass
\ No newline at end of file
+    def _get_upload_content(self, identifier: str) -> bytes:
+        """Platform-specific implementation for reading an uploaded file."""
+        pass
+
+    @abstractmethod
+    def _get_result_content(self, identifier: str) -> bytes:
+        """Platform-specific implementation for reading a result file."""
+        pass
+
+    @abstractmethod
+    def _get_results_uri(self, identifier: str) -> str:
+        """Platform-specific implementation for building a result URI."""
+        pass
@@ -1,5 +1,6 @@
 import os
 import uuid
+from typing import Optional
 from fastapi import UploadFile
 from backend.services.storage.base import FileStorage
 from backend.utils.logger import app_logger
@@ -8,12 +9,17 @@ from backend.utils.google_drive_utils import (
     get_drive_service,
     get_or_create_folder,
     upload_file_content,
+    update_file_content,
     download_file,
     make_file_public,
+    get_public_link,
+    file_exists,
     download_file_content
 )
 
 class GoogleDriveStorage(FileStorage):
+    name = "gcp"
+
     def __init__(self):
         if not GOOGLE_DRIVE_APP_FOLDER_ID:
             raise ValueError("GOOGLE_DRIVE_APP_FOLDER_ID is not set in your .env file.")
@@ -35,7 +41,7 @@ class GoogleDriveStorage(FileStorage):
         )
         return file_id
 
-    def save_result(self, image_data: bytes, extension: str = 'png') -> str:
+    def _save_result(self, image_data: bytes, extension: str = 'png') -> str:
         filename = f"generated_{uuid.uuid4().hex}.{extension}"
         file_id = upload_file_content(
             self.service,
@@ -46,11 +52,22 @@ class GoogleDriveStorage(FileStorage):
         )
         return file_id
 
-    def get_results_uri(self, identifier: str) -> str:
+    def _replace_result(self, identifier: str, image_data: bytes) -> None:
+        update_file_content(self.service, identifier, image_data)
+
+    def _get_results_uri(self, identifier: str) -> str:
         return make_file_public(self.service, identifier)
 
-    def get_upload_content(self, identifier: str) -> bytes:
+    def _get_fetchable_url(self, identifier: str) -> Optional[str]:
+        # Only files that are already public (results served through /results);
+        # sharing a file just so a provider can fetch it would expose uploads
+        return get_public_link(self.service, identifier)
+
+    def _upload_exists(self, identifier: str) -> bool:
+        return file_exists(self.service, identifier)
+
+    def _get_upload_content(self, identifier: str) -> bytes:
         return download_file_content(self.service, identifier)
 
-    def get_result_content(self, identifier: str) -> bytes:
+    def _get_result_content(self, identifier: str) -> bytes:
         return download_file_content(self.service, identifier)
@@ -1,20 +1,17 @@
 import os
 import uuid
+import shutil
+from typing import AsyncIterable
 from fastapi import UploadFile
 from backend.services.storage.base import FileStorage
-from backend.config.settings import UPLOAD_DIR, RESULT_DIR, MAX_FILE_SIZE
+from backend.config.settings import UPLOAD_DIR, RESULT_DIR
 from backend.utils.file_utils import allowed_file
 
 class LocalStorage(FileStorage):
+    name = "local"
+
     def _save_upload(self, file: UploadFile) -> str:
-        # Check file size
-        file.file.seek(0, os.SEEK_END)
-        file_size = file.file.tell()
-        file.file.seek(0)
-        
-        if file_size > MAX_FILE_SIZE:
-            raise ValueError(f"File size exceeds the maximum allowed size of {MAX_FILE_SIZE / (1024 * 1024)}MB")
-        
+        # File size is already enforced by FileStorage.save_upload
         # Generate a unique filename
         original_filename = file.filename
         extension = original_filename.rsplit('.', 1)[1].lower() if '.' in original_filename else ''
@@ -23,32 +20,60 @@ class LocalStorage(FileStorage):
         # Save the file
         file_path = os.path.join(UPLOAD_DIR, identifier)
         with open(file_path, "wb") as buffer:
-            buffer.write(file.file.read())
+            shutil.copyfileobj(file.file, buffer)
         
         return identifier
 
-    def save_result(self, image_data: bytes, extension: str = 'png') -> str:
+    def _save_result(self, image_data: bytes, extension: str = 'png') -> str:
         filename = f"generated_{uuid.uuid4().hex}.{extension}"
         file_path = os.path.join(RESULT_DIR, filename)
         with open(file_path, "wb") as f:
             f.write(image_data)
         return filename
 
+    async def _save_result_stream(self, chunks: AsyncIterable[bytes], extension: str = 'png') -> str:
+        filename = f"generated_{uuid.uuid4().hex}.{extension}"
+        file_path = os.path.join(RESULT_DIR, filename)
+        try:
+            with open(file_path, "wb") as f:
+                async for chunk in chunks:
+                    f.write(chunk)
+        except BaseException:
+            # Don't leave a truncated result behind
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        return filename
+
+    def _replace_result(self, identifier: str, image_data: bytes) -> None:
+        file_path = self._get_result_path(identifier)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Result {identifier} not found.")
+        # Written aside and renamed over the original, so readers never see a partial file
+        temp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(image_data)
+        os.replace(temp_path, file_path)
+
     def _get_upload_path(self, identifier: str) -> str:
         return os.path.join(UPLOAD_DIR, identifier)
 
     def _get_result_path(self, identifier: str) -> str:
         return os.path.join(RESULT_DIR, identifier)
 
-    def get_results_uri(self, identifier: str) -> str:
+    def _get_results_uri(self, identifier: str) -> str:
         return f"/results/{identifier}"
 
-    def get_upload_content(self, identifier: str) -> bytes:
+    def _upload_exists(self, identifier: str) -> bool:
+        # A bare file name; anything with a path in it would look outside UPLOAD_DIR
+        return os.path.basename(identifier) == identifier and os.path.isfile(self._get_upload_path(identifier))
+
+    def _get_upload_content(self, identifier: str) -> bytes:
         path = self._get_upload_path(identifier)
         with open(path, "rb") as f:
             return f.read()
 
-    def get_result_content(self, identifier: str) -> bytes:
+    def _get_result_content(self, identifier: str) -> bytes:
         path = self._get_result_path(identifier)
         with open(path, "rb") as f:
             return f.read()
\ No newline at end of file
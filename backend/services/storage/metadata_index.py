@@ -0,0 +1,59 @@
+import os
+import json
+import uuid
+import hashlib
+from typing import Optional
+from backend.config.settings import IMAGE_METADATA_DIR
+from backend.utils.logger import app_logger
+
+
+class MetadataIndex:
+    """
+    Image metadata (format, width, height, mode, size) keyed by storage identifier.
+
+    Entries are written when an object is saved, so endpoints can report a
+    resolution or size without fetching and decoding the image. Each entry is
+    a small JSON file written atomically, which lets every worker read what
+    any other worker saved. The index is a cache: a missing entry only means
+    the image has to be probed once.
+    """
+
+    def __init__(self, base_dir: str = IMAGE_METADATA_DIR):
+        self.base_dir = base_dir
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def _path(self, identifier: str) -> str:
+        # Identifiers are backend-specific (file names, Drive ids), so hash them into safe names
+        return os.path.join(self.base_dir, hashlib.sha1(identifier.encode("utf-8")).hexdigest() + ".json")
+
+    def get(self, identifier: str) -> Optional[dict]:
+        try:
+            with open(self._path(identifier), "rb") as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            app_logger.warning(f"UNREADABLE METADATA INDEX ENTRY FOR {identifier}: {e}")
+            return None
+
+    def put(self, identifier: str, metadata: dict) -> None:
+        """Record ``metadata`` for ``identifier``; failures are logged, never raised."""
+        path = self._path(identifier)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(json.dumps({"identifier": identifier, **metadata}).encode("utf-8"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            app_logger.warning(f"FAILED TO INDEX METADATA FOR {identifier}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def delete(self, identifier: str) -> None:
+        try:
+            os.remove(self._path(identifier))
+        except FileNotFoundError:
+            pass
+
+
+metadata_index = MetadataIndex()
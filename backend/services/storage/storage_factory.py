@@ -13,13 +13,11 @@ def get_storage_service():
     Factory function to get the appropriate storage service.
     Ensures that each thread gets its own service instance.
     """
-    app_logger.info(f"GETTING STORAGE SERVICE FOR TYPE: {STORAGE_TYPE}")
-    
     # Check if a service instance already exists for this thread
     storage_service = getattr(_thread_local, 'storage_service', None)
     
     if storage_service is None:
-        app_logger.info(f"CREATING NEW STORAGE SERVICE INSTANCE FOR THREAD: {threading.current_thread().name}")
+        app_logger.info(f"CREATING NEW {STORAGE_TYPE} STORAGE SERVICE INSTANCE FOR THREAD: {threading.current_thread().name}")
         if STORAGE_TYPE == "local":
             storage_service = LocalStorage()
         elif STORAGE_TYPE == "gcp":
@@ -30,7 +28,7 @@ def get_storage_service():
         # Save the instance in thread-local storage
         _thread_local.storage_service = storage_service
     else:
-        app_logger.info(f"REUSING STORAGE SERVICE INSTANCE FOR THREAD: {threading.current_thread().name}")
-        
-    app_logger.info(f"RETURNING STORAGE SERVICE OBJECT")
+        # Hot path: called several times per request
+        app_logger.debug("REUSING STORAGE SERVICE INSTANCE", extra={"storage_type": STORAGE_TYPE}, sample_every=100)
+
     return storage_service
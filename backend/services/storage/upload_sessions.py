@@ -0,0 +1,245 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import hashlib
+from typing import AsyncIterator, Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from fastapi import UploadFile
+from backend.config.settings import (
+    UPLOAD_SESSION_DIR,
+    UPLOAD_CHUNK_SIZE,
+    MIN_UPLOAD_CHUNK_SIZE,
+    MAX_UPLOAD_CHUNK_SIZE,
+    UPLOAD_SESSION_TTL,
+    MAX_FILE_SIZE,
+)
+from backend.services.storage.base import FileStorage
+from backend.utils.custom_exceptions import (
+    FileTooLargeError,
+    UploadSessionNotFoundError,
+    UploadIncompleteError,
+    ChecksumMismatchError,
+)
+from backend.utils.logger import app_logger
+
+_SESSION_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_MANIFEST = "session.json"
+_COPY_BUFFER = 1024 * 1024
+
+
+class UploadSessionManager:
+    """
+    Disk-backed state for resumable, chunked uploads.
+
+    Each session is a directory holding an immutable ``session.json`` manifest
+    and one file per received chunk. Chunks are written to a temporary name and
+    atomically renamed into place, so the set of received chunks is simply the
+    set of chunk files on disk. No shared mutable manifest is ever rewritten,
+    which lets any worker accept any chunk, in any order and in parallel.
+    """
+
+    def __init__(self, base_dir: str = UPLOAD_SESSION_DIR):
+        self.base_dir = base_dir
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    # ------------------------- SESSION LIFECYCLE -------------------------
+
+    def create_session(self, filename: str, total_size: int, content_type: Optional[str] = None, chunk_size: Optional[int] = None) -> dict:
+        """Create a new upload session and return its manifest."""
+        if total_size <= 0:
+            raise ValueError("total_size must be a positive number of bytes.")
+        if total_size > MAX_FILE_SIZE:
+            raise FileTooLargeError(f"File size {total_size} exceeds the limit of {MAX_FILE_SIZE} bytes.")
+
+        chunk_size = chunk_size or UPLOAD_CHUNK_SIZE
+        if not MIN_UPLOAD_CHUNK_SIZE <= chunk_size <= MAX_UPLOAD_CHUNK_SIZE:
+            raise ValueError(
+                f"chunk_size must be between {MIN_UPLOAD_CHUNK_SIZE} and {MAX_UPLOAD_CHUNK_SIZE} bytes."
+            )
+
+        self.cleanup_expired_sessions()
+
+        upload_id = uuid.uuid4().hex
+        manifest = {
+            "upload_id": upload_id,
+            "filename": os.path.basename(filename),
+            "content_type": content_type or "application/octet-stream",
+            "total_size": total_size,
+            "chunk_size": chunk_size,
+            "total_chunks": -(-total_size // chunk_size),
+            "created_at": time.time(),
+        }
+
+        session_dir = self._session_dir(upload_id)
+        os.makedirs(session_dir)
+        self._atomic_write(os.path.join(session_dir, _MANIFEST), json.dumps(manifest).encode("utf-8"))
+        app_logger.info(f"CREATED UPLOAD SESSION {upload_id}", extra={
+            "total_size": total_size,
+            "chunk_size": chunk_size,
+            "total_chunks": manifest["total_chunks"],
+        })
+        return manifest
+
+    def get_session(self, upload_id: str) -> dict:
+        """Load a session manifest, raising if it is unknown or expired."""
+        path = os.path.join(self._session_dir(upload_id), _MANIFEST)
+        try:
+            with open(path, "rb") as f:
+                manifest = json.loads(f.read())
+        except FileNotFoundError:
+            raise UploadSessionNotFoundError(f"Upload session {upload_id} not found.")
+
+        if time.time() - manifest["created_at"] > UPLOAD_SESSION_TTL:
+            self.delete_session(upload_id)
+            raise UploadSessionNotFoundError(f"Upload session {upload_id} has expired.")
+        return manifest
+
+    def get_status(self, upload_id: str) -> dict:
+        """Return the manifest together with the received and missing chunk indices."""
+        manifest = self.get_session(upload_id)
+        received = self._received_chunks(upload_id, manifest)
+        missing = [i for i in range(manifest["total_chunks"]) if i not in received]
+        return {**manifest, "received_chunks": sorted(received), "missing_chunks": missing}
+
+    def delete_session(self, upload_id: str) -> None:
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+
+    def cleanup_expired_sessions(self) -> int:
+        """Remove sessions older than the configured TTL. Returns the number removed."""
+        removed = 0
+        now = time.time()
+        for entry in os.scandir(self.base_dir):
+            if not entry.is_dir() or not _SESSION_ID_RE.match(entry.name):
+                continue
+            try:
+                if now - entry.stat().st_mtime > UPLOAD_SESSION_TTL:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            app_logger.info(f"REMOVED {removed} EXPIRED UPLOAD SESSIONS")
+        return removed
+
+    # ------------------------- CHUNKS -------------------------
+
+    def expected_chunk_size(self, manifest: dict, index: int) -> int:
+        if not 0 <= index < manifest["total_chunks"]:
+            raise ValueError(f"Chunk index {index} is out of range (0..{manifest['total_chunks'] - 1}).")
+        if index == manifest["total_chunks"] - 1:
+            return manifest["total_size"] - index * manifest["chunk_size"]
+        return manifest["chunk_size"]
+
+    async def write_chunk(self, upload_id: str, index: int, stream: AsyncIterator[bytes]) -> int:
+        """
+        Stream one chunk to disk. Re-sending a chunk simply replaces it, which
+        makes retries after a dropped connection idempotent. The body is
+        written in ``_COPY_BUFFER`` batches on a worker thread, so disk writes
+        never block the event loop.
+        """
+        manifest = self.get_session(upload_id)
+        expected = self.expected_chunk_size(manifest, index)
+
+        final_path = self._chunk_path(upload_id, index)
+        tmp_path = f"{final_path}.{uuid.uuid4().hex}.part"
+        written = 0
+        try:
+            f = await run_in_threadpool(open, tmp_path, "wb")
+            try:
+                pending, pending_size = [], 0
+                async for data in stream:
+                    written += len(data)
+                    if written > expected:
+                        raise ValueError(f"Chunk {index} exceeds its expected size of {expected} bytes.")
+                    pending.append(data)
+                    pending_size += len(data)
+                    if pending_size >= _COPY_BUFFER:
+                        await run_in_threadpool(f.writelines, pending)
+                        pending, pending_size = [], 0
+                if pending:
+                    await run_in_threadpool(f.writelines, pending)
+            finally:
+                await run_in_threadpool(f.close)
+            if written != expected:
+                raise ValueError(f"Chunk {index} has {written} bytes, expected {expected}.")
+            await run_in_threadpool(os.replace, tmp_path, final_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return written
+
+    # ------------------------- FINALIZE -------------------------
+
+    def finalize(self, upload_id: str, checksum: str, storage_service: FileStorage) -> str:
+        """
+        Assemble the chunks, verify the SHA-256 checksum and hand the result to
+        the storage backend. Returns the upload identifier usable in /generate.
+        Blocking (reads, hashes and uploads the whole file): call it from a
+        worker thread.
+        """
+        manifest = self.get_session(upload_id)
+        received = self._received_chunks(upload_id, manifest)
+        if len(received) != manifest["total_chunks"]:
+            missing = [i for i in range(manifest["total_chunks"]) if i not in received]
+            raise UploadIncompleteError(f"Upload {upload_id} is missing chunks: {missing}")
+
+        assembled_path = os.path.join(self._session_dir(upload_id), f"assembled.{uuid.uuid4().hex}")
+        digest = hashlib.sha256()
+        with open(assembled_path, "wb") as out:
+            for index in range(manifest["total_chunks"]):
+                with open(self._chunk_path(upload_id, index), "rb") as chunk:
+                    while True:
+                        data = chunk.read(_COPY_BUFFER)
+                        if not data:
+                            break
+                        digest.update(data)
+                        out.write(data)
+
+        if digest.hexdigest() != checksum.strip().lower():
+            os.remove(assembled_path)
+            raise ChecksumMismatchError(f"Checksum mismatch for upload {upload_id}.")
+
+        with open(assembled_path, "rb") as f:
+            upload = UploadFile(
+                file=f,
+                size=manifest["total_size"],
+                filename=manifest["filename"],
+                headers=Headers({"content-type": manifest["content_type"]}),
+            )
+            upload_identifier = storage_service.save_upload(upload)
+
+        self.delete_session(upload_id)
+        app_logger.info(f"UPLOAD SESSION {upload_id} FINALIZED WITH IDENTIFIER: {upload_identifier}")
+        return upload_identifier
+
+    # ------------------------- HELPERS -------------------------
+
+    def _session_dir(self, upload_id: str) -> str:
+        if not _SESSION_ID_RE.match(upload_id or ""):
+            raise UploadSessionNotFoundError(f"Upload session {upload_id} not found.")
+        return os.path.join(self.base_dir, upload_id)
+
+    def _chunk_path(self, upload_id: str, index: int) -> str:
+        return os.path.join(self._session_dir(upload_id), f"chunk_{index:06d}")
+
+    def _received_chunks(self, upload_id: str, manifest: dict) -> set:
+        received = set()
+        for index in range(manifest["total_chunks"]):
+            if os.path.exists(self._chunk_path(upload_id, index)):
+                received.add(index)
+        return received
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+upload_session_manager = UploadSessionManager()
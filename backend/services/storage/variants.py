@@ -0,0 +1,347 @@
+"""
+Derived versions of stored results: thumbnails, a BlurHash placeholder and
+other encodings (lossless WebP, lossy WebP/AVIF).
+
+Results are stored as full-size PNG, which is rarely what a client should be
+sent. After a result is saved, its variants are built in the background and
+stored as results of their own; the original's metadata index entry records
+them under ``thumbnails``, ``placeholder`` and ``variants``. The placeholder
+is also started in the image pool as the result is saved, so the save's
+response can carry it (see ``result_previews``). The same job
+re-encodes a PNG original losslessly and stores the smaller file in its
+place, recorded under ``optimization``.
+``GET /results/{identifier}`` picks the smallest encoding the client accepts
+and ``GET /results/{identifier}/thumbnails/{size}`` serves the thumbnails.
+"""
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from PIL import features
+from backend.config.settings import (
+    RESULT_VARIANTS,
+    RESULT_PNG_OPTIMIZE,
+    RESULT_PNG_PALETTE,
+    RESULT_PNG_CPU_BUDGET,
+    RESULT_PNG_MIN_SAVING,
+    RESULT_VARIANT_WORKERS,
+    RESULT_VARIANT_QUEUE,
+    THUMBNAIL_SIZES,
+    THUMBNAIL_QUALITY,
+    PLACEHOLDER_ENABLED,
+    PLACEHOLDER_WAIT,
+)
+from backend.services.storage.metadata_index import metadata_index
+from backend.utils.custom_exceptions import ImagePoolBusyError
+from backend.utils.image_ops import optimize_png, render_placeholder, render_previews, render_variants
+from backend.utils.image_pool import image_pool
+from backend.utils.image_probe import image_metadata
+from backend.utils.logger import app_logger
+from backend.utils.metrics import RESULT_PNG_OPTIMIZATIONS, RESULT_PNG_BYTES_SAVED
+from backend.utils.tracing import span
+
+# Placeholders still awaited by a result response, oldest first; responses
+# that never come for them (internal saves) are dropped past this many
+PENDING_PLACEHOLDER_LIMIT = 256
+
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "GIF": "image/gif", "WEBP": "image/webp", "AVIF": "image/avif"}
+
+
+def parse_variants(spec: str) -> List[dict]:
+    """
+    ``"webp:lossless,webp:85,avif:60"`` -> variant descriptions (name, format,
+    quality). Formats this Pillow build cannot encode are left out.
+    """
+    variants = []
+    for item in filter(None, (part.strip().lower() for part in spec.split(","))):
+        format, _, quality = item.partition(":")
+        format = format.upper()
+        if format not in ("WEBP", "AVIF"):
+            raise ValueError(f"Unsupported result variant format: {format}")
+        if not features.check(format.lower()):
+            app_logger.warning(f"PILLOW CANNOT ENCODE {format}; SKIPPING RESULT VARIANT {item}")
+            continue
+        lossless = quality == "lossless"
+        if lossless and format != "WEBP":
+            raise ValueError(f"Lossless result variants are only supported for WebP, not {format}")
+        variants.append({
+            "name": f"{format.lower()}-{quality or 'default'}",
+            "format": format,
+            "quality": None if lossless or not quality else int(quality),
+            "lossless": lossless,
+        })
+    return variants
+
+
+VARIANTS = parse_variants(RESULT_VARIANTS)
+
+
+def optimize_original(storage_service, identifier: str, image_data: bytes, metadata: dict) -> Tuple[bytes, dict]:
+    """
+    Replace a stored PNG with a pixel-identical re-encode (see
+    image_ops.optimize_png) if that saves at least RESULT_PNG_MIN_SAVING.
+    Returns the stored bytes and the updated index entry, re-probed from the
+    new bytes and recording the ``optimization`` method, original size and
+    bytes saved.
+    """
+    optimized = image_pool.run_sync(optimize_png, image_data, RESULT_PNG_CPU_BUDGET, RESULT_PNG_PALETTE)
+    if optimized is None or len(optimized[0]) > len(image_data) * (1 - RESULT_PNG_MIN_SAVING):
+        RESULT_PNG_OPTIMIZATIONS.inc(outcome="unchanged", method=optimized[1] if optimized else "none")
+        return image_data, metadata
+    content, method = optimized
+    saved = len(image_data) - len(content)
+    storage_service.replace_result(identifier, content)
+    # A palette re-encode changes the mode, so the entry is re-probed from the new bytes
+    metadata = {**metadata, **image_metadata(content), "optimization": {"method": method, "original_size": len(image_data), "saved_bytes": saved}}
+    metadata_index.put(identifier, metadata)
+    RESULT_PNG_OPTIMIZATIONS.inc(outcome="replaced", method=method)
+    RESULT_PNG_BYTES_SAVED.inc(saved)
+    app_logger.info(f"OPTIMIZED RESULT {identifier} WITH {method.upper()}: {len(image_data)} -> {len(content)} BYTES")
+    return content, metadata
+
+
+def build_variants(storage_service, identifier: str, image_data: Optional[bytes] = None) -> dict:
+    """
+    Build and store the thumbnails, placeholder and encodings of ``identifier``
+    and record them in its index entry. The thumbnails and placeholder are
+    cheap and recorded first; then a PNG original is optimized, and encodings
+    that are not smaller than the (optimized) original are dropped. Returns
+    the updated index entry.
+    """
+    metadata = metadata_index.get(identifier)
+    if metadata is None:
+        # Unparseable header: not an image we can re-encode
+        return {}
+    if image_data is None:
+        image_data = storage_service.get_result_content(identifier)
+
+    with span("build_thumbnails"):
+        known = _known_placeholder(identifier)
+        rendered, placeholder = image_pool.run_sync(render_previews, image_data, THUMBNAIL_SIZES, THUMBNAIL_QUALITY, PLACEHOLDER_ENABLED and known is None)
+        placeholder = known or placeholder
+        _resolve_placeholder(identifier, placeholder)
+        thumbnails = {}
+        for size, content in rendered.items():
+            thumbnails[str(size)] = {
+                "identifier": storage_service.save_variant(content, extension="webp"),
+                "mime_type": "image/webp",
+                "size": len(content),
+            }
+    metadata = {**metadata, "thumbnails": thumbnails, "placeholder": placeholder}
+    metadata_index.put(identifier, metadata)
+
+    if RESULT_PNG_OPTIMIZE and metadata.get("format") == "PNG":
+        with span("optimize_png"):
+            image_data, metadata = optimize_original(storage_service, identifier, image_data, metadata)
+
+    with span("build_variants"):
+        wanted = [variant for variant in VARIANTS if variant["format"] != metadata.get("format")]
+        encoded = image_pool.run_sync(render_variants, image_data, wanted) if wanted else {}
+        variants = {}
+        for variant in wanted:
+            content = encoded[variant["name"]]
+            if len(content) >= len(image_data):
+                app_logger.debug(f"RESULT VARIANT {variant['name']} OF {identifier} IS NOT SMALLER; DROPPED")
+                continue
+            variants[variant["name"]] = {
+                "identifier": storage_service.save_variant(content, extension=variant["format"].lower()),
+                "format": variant["format"],
+                "mime_type": MIME_TYPES[variant["format"]],
+                "size": len(content),
+            }
+    metadata = {**metadata, "variants": variants}
+    metadata_index.put(identifier, metadata)
+
+    sizes = ", ".join(f"{name}={variant['size']}" for name, variant in {**variants, **thumbnails}.items())
+    app_logger.info(f"BUILT {len(thumbnails)} THUMBNAILS AND {len(variants)} RESULT VARIANTS FOR {identifier} (ORIGINAL {len(image_data)}): {sizes}")
+    return metadata
+
+
+def thumbnail_uri(identifier: str, size: int) -> str:
+    return f"/results/{identifier}/thumbnails/{size}"
+
+
+_pending_placeholders: "OrderedDict[str, Future]" = OrderedDict()
+_placeholder_lock = threading.Lock()
+
+
+def start_placeholder(identifier: str, image_data: Optional[bytes] = None) -> None:
+    """
+    Start computing the placeholder of a just-saved result, in the image pool
+    when its bytes are at hand. Otherwise (a streamed save), or when the pool
+    is busy, the background build provides it.
+    """
+    if not PLACEHOLDER_ENABLED:
+        return
+    future = Future()
+    future.set_running_or_notify_cancel()
+    with _placeholder_lock:
+        _pending_placeholders[identifier] = future
+        while len(_pending_placeholders) > PENDING_PLACEHOLDER_LIMIT:
+            _pending_placeholders.popitem(last=False)
+    if image_data is None:
+        return
+    try:
+        task = image_pool.submit(render_placeholder, image_data)
+    except ImagePoolBusyError:
+        return
+    task.add_done_callback(lambda task: _settle(future, None if task.exception() else task.result()))
+
+
+def _settle(future: Future, placeholder: Optional[str]) -> None:
+    # The first of the pool task and the background build wins
+    if placeholder is None:
+        return
+    try:
+        future.set_result(placeholder)
+    except InvalidStateError:
+        pass
+
+
+def _known_placeholder(identifier: str) -> Optional[str]:
+    with _placeholder_lock:
+        future = _pending_placeholders.get(identifier)
+    return future.result() if future is not None and future.done() else None
+
+
+def _resolve_placeholder(identifier: str, placeholder: Optional[str]) -> None:
+    """Hand ``placeholder`` to a response that may be waiting for it."""
+    with _placeholder_lock:
+        future = _pending_placeholders.get(identifier)
+    if future is not None:
+        _settle(future, placeholder)
+
+
+async def result_previews(identifier: str) -> dict:
+    """
+    Thumbnail URIs and placeholder for a result response. The URIs work at
+    once (a thumbnail that is not built yet is rendered on request). The
+    placeholder is awaited for up to ``PLACEHOLDER_WAIT`` seconds when it is
+    still being computed, and is None past that; it is also on
+    /images/{identifier}/metadata once the background build has run.
+    """
+    metadata = metadata_index.get(identifier) or {}
+    placeholder = metadata.get("placeholder")
+    with _placeholder_lock:
+        future = _pending_placeholders.get(identifier)
+    if future is not None:
+        try:
+            if placeholder is None:
+                placeholder = await asyncio.wait_for(asyncio.wrap_future(future), timeout=PLACEHOLDER_WAIT)
+        except asyncio.TimeoutError:
+            app_logger.debug(f"PLACEHOLDER OF {identifier} NOT READY AFTER {PLACEHOLDER_WAIT:g}S")
+        finally:
+            with _placeholder_lock:
+                _pending_placeholders.pop(identifier, None)
+    return {
+        "thumbnails": {str(size): thumbnail_uri(identifier, size) for size in THUMBNAIL_SIZES},
+        "placeholder": placeholder,
+    }
+
+
+class VariantBuilder:
+    """
+    Runs ``build_variants`` off the request path on a small thread pool; the
+    threads only store results, the encoding itself runs in the image process
+    pool. At most ``RESULT_VARIANT_QUEUE`` builds wait at a time; beyond that
+    new results are served as stored.
+    """
+
+    def __init__(self, workers: int = RESULT_VARIANT_WORKERS, max_pending: int = RESULT_VARIANT_QUEUE):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread_local = threading.local()
+
+    def _storage(self, storage_class):
+        # Storage clients are not shared between threads (see storage_factory), so each worker builds its own
+        instances = getattr(self._thread_local, "instances", None)
+        if instances is None:
+            instances = self._thread_local.instances = {}
+        if storage_class not in instances:
+            instances[storage_class] = storage_class()
+        return instances[storage_class]
+
+    def submit(self, storage_class, identifier: str, image_data: Optional[bytes] = None) -> Optional[Future]:
+        """Queue the variants of ``identifier``, stored through a ``storage_class`` instance of the worker thread."""
+        if not (VARIANTS or THUMBNAIL_SIZES or PLACEHOLDER_ENABLED or RESULT_PNG_OPTIMIZE):
+            return None
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                app_logger.warning(f"RESULT VARIANT QUEUE FULL; SKIPPING VARIANTS FOR {identifier}")
+                return None
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="result-variants")
+            future = self._executor.submit(self._run, storage_class, identifier, image_data)
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _run(self, storage_class, identifier: str, image_data: Optional[bytes]) -> dict:
+        try:
+            return build_variants(self._storage(storage_class), identifier, image_data)
+        except ImagePoolBusyError:
+            app_logger.warning(f"IMAGE POOL BUSY; SKIPPING RESULT VARIANTS FOR {identifier}")
+            return {}
+        except Exception as e:
+            # The original is still served; a failed variant is only a missed saving
+            app_logger.error(f"FAILED TO BUILD RESULT VARIANTS FOR {identifier}: {e}")
+            return {}
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until the builds submitted so far are done (tests, benchmarks)."""
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.result(timeout=timeout)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def parse_accept(header: Optional[str]) -> List[tuple]:
+    accept = []
+    for part in (header or "").split(","):
+        media_range, *params = [piece.strip() for piece in part.split(";")]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accept.append((media_range.lower(), q))
+    return accept
+
+
+def choose_variant(metadata: Optional[dict], accept_header: Optional[str]) -> Optional[dict]:
+    """
+    The smallest stored variant whose type the client lists explicitly with
+    q > 0, or None for the original. Wildcards alone (``*/*``, ``image/*``)
+    do not count: clients that never mention WebP or AVIF may not decode them.
+    """
+    variants = (metadata or {}).get("variants") or {}
+    accepted = {media_range for media_range, q in parse_accept(accept_header) if q > 0}
+    candidates = [variant for variant in variants.values() if variant["mime_type"] in accepted]
+    if not candidates:
+        return None
+    smallest = min(candidates, key=lambda v: v["size"])
+    if metadata.get("size") is not None and smallest["size"] >= metadata["size"]:
+        return None
+    return smallest
+
+
+variant_builder = VariantBuilder()
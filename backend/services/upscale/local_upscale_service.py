@@ -0,0 +1,91 @@
+import asyncio
+from PIL import Image
+from backend.config.settings import (
+    LOCAL_UPSCALE_STRIP_MEGAPIXELS,
+    LOCAL_UPSCALE_MAX_OUTPUT_MEGAPIXELS,
+)
+from backend.services.storage.base import FileStorage
+from backend.utils.custom_exceptions import ImageTooLargeError
+from backend.utils.image_ops import decode_pixels, encode_shared_png
+from backend.utils.image_pool import image_pool, shared_segment
+from backend.utils.logger import app_logger
+from backend.utils.metrics import track_provider
+from backend.utils.resample import plan_strips, strip_margin, upscale_strip_into
+from backend.utils.tracing import span
+
+# Results are written with fast compression; size is not the point of a preview
+PNG_COMPRESS_LEVEL = 1
+
+
+class LocalUpscaleService:
+    """
+    In-process alternative to Picsart: Lanczos resampling plus an unsharp mask.
+
+    The image is cut into horizontal strips (with a few rows of overlap so
+    the seams are invisible) that are upscaled in parallel in the image
+    process pool, as are the decode and the encode. Workers write their
+    strips straight into one shared memory output buffer, which is encoded
+    from there, so the app process only holds the decoded input and the
+    source rows of the ``2 x IMAGE_POOL_WORKERS`` strips in flight; the
+    output size is capped by ``LOCAL_UPSCALE_MAX_OUTPUT_MEGAPIXELS``.
+    """
+
+    accepts_image_url = False
+
+    def __init__(self, storage_service: FileStorage):
+        self.storage_service = storage_service
+
+    async def upscale_image(self, image_identifier: str, upscale_factor: int) -> tuple[str, str, str]:
+        app_logger.info(f"Starting local image upscaling for identifier: {image_identifier} with factor: {upscale_factor}")
+        try:
+            image_content = self.storage_service.get_result_content(image_identifier)
+        except FileNotFoundError:
+            try:
+                image_content = self.storage_service.get_upload_content(image_identifier)
+            except FileNotFoundError:
+                raise FileNotFoundError(f"Image with identifier {image_identifier} not found.")
+
+        with span("decode"):
+            mode, size, pixels = await image_pool.run(decode_pixels, image_content)
+        del image_content
+        width, height = size
+        output_size = (width * upscale_factor, height * upscale_factor)
+        if output_size[0] * output_size[1] > LOCAL_UPSCALE_MAX_OUTPUT_MEGAPIXELS * 1_000_000:
+            raise ImageTooLargeError(
+                f"Upscaled image would be {output_size[0]}x{output_size[1]}, over the "
+                f"{LOCAL_UPSCALE_MAX_OUTPUT_MEGAPIXELS:g} megapixel limit of the local upscaler."
+            )
+
+        with shared_segment(output_size[0] * output_size[1] * Image.getmodebands(mode)) as output:
+            with track_provider("local", "upscale"):
+                await self._upscale(mode, size, pixels, upscale_factor, output.name)
+            del pixels
+
+            with span("encode"):
+                upscaled_content = await image_pool.run(encode_shared_png, mode, output_size, output.name, PNG_COMPRESS_LEVEL)
+        new_identifier = self.storage_service.save_result(upscaled_content, extension="png")
+        app_logger.info(f"Upscaled image saved with new identifier: {new_identifier}")
+
+        return new_identifier, f"{width}x{height}", f"{output_size[0]}x{output_size[1]}"
+
+    async def _upscale(self, mode: str, size: tuple[int, int], pixels: bytes, factor: int, output: str) -> None:
+        """Upscale raw ``pixels`` into the shared memory segment named ``output``."""
+        width, height = size
+        stride = width * Image.getmodebands(mode)
+        margin = strip_margin(factor)
+        # Strips sized by output pixels, so a strip costs about the same whatever the width
+        rows = max(int(LOCAL_UPSCALE_STRIP_MEGAPIXELS * 1_000_000 / (width * factor * factor)), margin)
+        in_flight = asyncio.Semaphore(2 * image_pool.workers)
+
+        async def run_strip(top: int, bottom: int) -> None:
+            async with in_flight:
+                first, last = max(top - margin, 0), min(bottom + margin, height)
+                # Output rows are ``factor`` times as many and ``factor`` times as wide
+                await image_pool.run(
+                    upscale_strip_into, output, top * factor * stride * factor, mode, (width, last - first),
+                    pixels[first * stride:last * stride], factor, top - first, last - bottom
+                )
+
+        strips = plan_strips(height, rows)
+        app_logger.info(f"UPSCALING {width}x{height} BY {factor} IN {len(strips)} STRIPS")
+        await asyncio.gather(*(run_strip(top, bottom) for top, bottom in strips))
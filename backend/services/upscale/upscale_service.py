@@ -1,9 +1,10 @@
-import requests
-from PIL import Image
-from io import BytesIO
-from backend.config.settings import PICSART_API_KEY, PICSART_UPSCALE_URL
+from backend.config.settings import PICSART_API_KEY, PICSART_UPSCALE_URL, PROVIDER_URL_PASSTHROUGH
 from backend.services.storage.base import FileStorage
+from backend.utils.http_client import get_http_client
+from backend.utils.image_probe import image_metadata
 from backend.utils.logger import app_logger
+from backend.utils.metrics import track_provider
+from backend.utils.tracing import span
 
 class PicsartUpscaleService:
     def __init__(self, storage_service: FileStorage):
@@ -13,9 +14,10 @@ class PicsartUpscaleService:
         self.api_key = PICSART_API_KEY
         self.upscale_url = PICSART_UPSCALE_URL
 
-    def upscale_image(self, image_identifier: str, upscale_factor: int) -> tuple[str, str, str]:
-        app_logger.info(f"Starting image upscaling for identifier: {image_identifier} with factor: {upscale_factor}")
+    # Picsart can fetch the source itself when given an image_url
+    accepts_image_url = True
 
+    def _get_source_content(self, image_identifier: str) -> bytes:
         try:
             try:
                 image_content = self.storage_service.get_result_content(image_identifier)
@@ -28,11 +30,28 @@ class PicsartUpscaleService:
         except FileNotFoundError:
             app_logger.error(f"Image not found for identifier: {image_identifier}")
             raise FileNotFoundError(f"Image with identifier {image_identifier} not found.")
-        
-        # Get input image resolution
-        input_image = Image.open(BytesIO(image_content))
-        input_resolution = f"{input_image.width}x{input_image.height}"
-        app_logger.info(f"Input image resolution: {input_resolution}")
+        return image_content
+
+    async def upscale_image(self, image_identifier: str, upscale_factor: int) -> tuple[str, str, str]:
+        app_logger.info(f"Starting image upscaling for identifier: {image_identifier} with factor: {upscale_factor}")
+
+        # Pass-through: let Picsart download the source from storage instead of
+        # downloading and re-uploading it here. Falls back to bytes when the
+        # backend has no public URL for it.
+        image_url = None
+        if PROVIDER_URL_PASSTHROUGH and self.accepts_image_url:
+            image_url = self.storage_service.get_fetchable_url(image_identifier)
+
+        # Input resolution from the metadata index (recorded when the image was saved)
+        input_metadata = self.storage_service.get_metadata(image_identifier, probe=False)
+
+        if image_url:
+            app_logger.info(f"Passing image URL to Picsart for identifier: {image_identifier}")
+        else:
+            image_content = self._get_source_content(image_identifier)
+            if input_metadata is None:
+                with span("probe_input"):
+                    input_metadata = image_metadata(image_content)
 
         headers = {
             "accept": "application/json",
@@ -42,29 +61,40 @@ class PicsartUpscaleService:
             "upscale_factor": str(upscale_factor),
             "format": "PNG",
         }
-        files = {"image": image_content}
+        if image_url:
+            # A filename-less part keeps the request multipart/form-data
+            files = {"image_url": (None, image_url)}
+        else:
+            files = {"image": ("image", image_content)}
+        client = get_http_client()
 
         app_logger.info(f"Sending request to Picsart API for upscaling.")
-        response = requests.post(self.upscale_url, headers=headers, data=data, files=files, timeout=90)
-        response.raise_for_status()
+        with track_provider("picsart", "upscale"):
+            response = await client.post(self.upscale_url, headers=headers, data=data, files=files)
+            response.raise_for_status()
         
         resp_json = response.json()
         result_url = resp_json["data"]["url"]
         app_logger.info(f"Successfully received upscaled image URL from Picsart API.")
 
-        app_logger.info(f"Downloading upscaled image from: {result_url}")
-        r = requests.get(result_url, timeout=90)
-        r.raise_for_status()
-        upscaled_image_content = r.content
-        app_logger.info(f"Upscaled image downloaded successfully.")
+        # Stream the result straight into storage; its metadata is indexed from
+        # the header bytes on the way, so memory does not grow with the output size
+        app_logger.info(f"Streaming upscaled image from: {result_url} to storage")
+        with track_provider("picsart", "download_result"):
+            async with client.stream("GET", result_url) as r:
+                r.raise_for_status()
+                new_identifier = await self.storage_service.save_result_stream(r.aiter_bytes(), extension="png")
+        app_logger.info(f"Upscaled image saved with new identifier: {new_identifier}")
 
-        # Get upscaled image resolution
-        upscaled_image = Image.open(BytesIO(upscaled_image_content))
-        upscaled_resolution = f"{upscaled_image.width}x{upscaled_image.height}"
+        with span("probe_output"):
+            upscaled_metadata = self.storage_service.get_metadata(new_identifier)
+        upscaled_resolution = f"{upscaled_metadata['width']}x{upscaled_metadata['height']}"
         app_logger.info(f"Upscaled image resolution: {upscaled_resolution}")
 
-        app_logger.info(f"Saving upscaled image to storage.")
-        new_identifier = self.storage_service.save_result(upscaled_image_content, extension="png")
-        app_logger.info(f"Upscaled image saved with new identifier: {new_identifier}")
+        if input_metadata is None:
+            # The source never passed through here; Picsart scales by exactly the factor
+            input_metadata = {"width": upscaled_metadata["width"] // upscale_factor, "height": upscaled_metadata["height"] // upscale_factor}
+        input_resolution = f"{input_metadata['width']}x{input_metadata['height']}"
+        app_logger.info(f"Input image resolution: {input_resolution}")
 
         return new_identifier, input_resolution, upscaled_resolution
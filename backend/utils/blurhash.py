@@ -0,0 +1,73 @@
+"""
+BlurHash encoder (https://blurha.sh): a ~30 character string a client decodes
+into a blurred preview of an image while the real thing loads.
+
+The image is reduced to a few cosine components in linear RGB; the string
+holds their quantised values in base 83. Only the colour layout survives, so
+the input can (and should) be a small thumbnail.
+"""
+import numpy as np
+from PIL import Image
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+# Largest side the image is reduced to before the components are computed;
+# more pixels do not change the result
+ENCODE_SIZE = 64
+
+
+def _base83(value: int, length: int) -> str:
+    return "".join(_BASE83[(value // 83 ** (length - i - 1)) % 83] for i in range(length))
+
+
+def _srgb_to_linear(values: np.ndarray) -> np.ndarray:
+    values = values / 255.0
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value: float) -> int:
+    value = min(max(value, 0.0), 1.0)
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(value: float, exponent: float) -> float:
+    return float(np.sign(value) * abs(value) ** exponent)
+
+
+def encode(image: Image.Image, x_components: int = 4, y_components: int = 3) -> str:
+    """BlurHash of ``image``; transparent areas are flattened onto white."""
+    if not (1 <= x_components <= 9 and 1 <= y_components <= 9):
+        raise ValueError("BlurHash components must be between 1 and 9")
+    if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+        flattened = Image.new("RGB", image.size, (255, 255, 255))
+        flattened.paste(image.convert("RGBA"), mask=image.convert("RGBA").getchannel("A"))
+        image = flattened
+    scale = min(ENCODE_SIZE / max(image.size), 1.0)
+    small = image.convert("RGB").resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.Resampling.BOX)
+
+    linear = _srgb_to_linear(np.asarray(small, dtype=np.float64))
+    height, width = linear.shape[:2]
+    xs = np.arange(width) / width
+    ys = np.arange(height) / height
+    factors = []
+    for j in range(y_components):
+        for i in range(x_components):
+            basis = np.cos(np.pi * j * ys)[:, None] * np.cos(np.pi * i * xs)[None, :]
+            normalisation = 1.0 if i == 0 and j == 0 else 2.0
+            factors.append(normalisation * (basis[..., None] * linear).sum(axis=(0, 1)) / (width * height))
+
+    dc, ac = factors[0], factors[1:]
+    blurhash = _base83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        quantised_max = int(max(0, min(82, np.floor(max(np.abs(ac).max(), 0.0) * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+    else:
+        quantised_max, max_value = 0, 1.0
+    blurhash += _base83(quantised_max, 1)
+    blurhash += _base83((_linear_to_srgb(dc[0]) << 16) + (_linear_to_srgb(dc[1]) << 8) + _linear_to_srgb(dc[2]), 4)
+    for factor in ac:
+        r, g, b = (int(max(0, min(18, np.floor(_sign_pow(value / max_value, 0.5) * 9 + 9.5)))) for value in factor)
+        blurhash += _base83(r * 19 * 19 + g * 19 + b, 2)
+    return blurhash
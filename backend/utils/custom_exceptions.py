@@ -1,3 +1,41 @@
 class FileTooLargeError(ValueError):
     """Custom exception for files that exceed the size limit."""
     pass
+
+
+class UploadSessionNotFoundError(FileNotFoundError):
+    """Raised when a chunked upload session does not exist or has expired."""
+    pass
+
+
+class UploadIncompleteError(ValueError):
+    """Raised when a chunked upload is finalized before all chunks arrived."""
+    pass
+
+
+class ChecksumMismatchError(ValueError):
+    """Raised when an assembled upload does not match the client checksum."""
+    pass
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image is too large for a local processing step."""
+    pass
+
+
+class SimulatedProviderError(Exception):
+    """Failure injected by a simulation provider (see SimulationService)."""
+    pass
+
+
+class ProviderHTTPError(Exception):
+    """Non-success HTTP response from an external provider; ``status_code`` says which."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ImagePoolBusyError(Exception):
+    """Raised when the image process pool already has its maximum of tasks waiting."""
+    pass
@@ -3,12 +3,14 @@ import io
 import json
 
 import google.auth
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload, MediaIoBaseUpload
-from backend.config.settings import GOOGLE_CLIENT_SECRET_FILE, GOOGLE_TOKEN_FILE
+from backend.config.settings import GOOGLE_CLIENT_SECRET_FILE, GOOGLE_TOKEN_FILE, GOOGLE_DRIVE_API_ENDPOINT
 from googleapiclient.errors import HttpError
 from backend.utils.logger import app_logger
 
@@ -21,6 +23,14 @@ def get_drive_service():
     Uses Workload Identity Federation if available (for Vercel),
     otherwise falls back to the local OAuth 2.0 flow.
     """
+    # Stub Drive server (load tests): no authentication. The root URL is replaced
+    # in the discovery document because client_options.api_endpoint would keep
+    # https for media uploads.
+    if GOOGLE_DRIVE_API_ENDPOINT:
+        discovery = json.loads(get_static_doc("drive", "v3"))
+        discovery["rootUrl"] = GOOGLE_DRIVE_API_ENDPOINT
+        return build_from_document(discovery, credentials=AnonymousCredentials())
+
     # Vercel (production) authentication using Workload Identity Federation
     if os.getenv("VERCEL") == "1":
         # Vercel provides the OIDC token in this environment variable
@@ -124,6 +134,13 @@ def upload_file_content(service, content, filename, folder_id, mimetype='image/p
     
     return file.get("id")
 
+def update_file_content(service, file_id, content, mimetype='image/png'):
+    """
+    Replaces the content of an existing file in Google Drive, keeping its ID.
+    """
+    media = MediaIoBaseUpload(io.BytesIO(content), mimetype=mimetype, resumable=True)
+    service.files().update(fileId=file_id, media_body=media).execute()
+
 def download_file(service, file_id, destination_path):
     """
     Downloads a file from Google Drive.
@@ -147,12 +164,37 @@ def download_file_content(service, file_id: str) -> bytes:
         done = False
         while done is False:
             status, done = downloader.next_chunk()
-            app_logger.info(f"Download {int(status.progress() * 100)}%.")
+            app_logger.debug("DRIVE DOWNLOAD PROGRESS", extra={"file_id": file_id, "progress": status.progress()}, max_per_second=1)
         return file_content.getvalue()
     except HttpError as error:
         app_logger.error(f"An error occurred: {error}")
         return None
 
+def file_exists(service, file_id: str) -> bool:
+    """Whether a file exists and is not in the trash; only its metadata is fetched."""
+    try:
+        file = service.files().get(fileId=file_id, fields='id, trashed').execute()
+    except HttpError as error:
+        if error.resp.status == 404:
+            return False
+        raise
+    return not file.get('trashed', False)
+
+def get_public_link(service, file_id: str):
+    """
+    The download link of a file that anyone can already read, or None if it
+    is not public. Never changes the file's permissions. A missing or
+    unreadable file raises FileNotFoundError.
+    """
+    try:
+        file = service.files().get(fileId=file_id, fields='webContentLink, permissions(type, role)').execute()
+    except HttpError as error:
+        app_logger.error(f"An error occurred: {error}")
+        raise FileNotFoundError(f"File {file_id} not found in Google Drive.") from error
+    if any(permission.get('type') == 'anyone' for permission in file.get('permissions', [])):
+        return file.get('webContentLink')
+    return None
+
 def make_file_public(service, file_id: str) -> str:
     """Makes a file public and returns its web view link."""
     try:
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import httpx
+from backend.config.settings import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_CONNECTIONS_PER_HOST,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_WRITE_TIMEOUT,
+    HTTP_POOL_TIMEOUT,
+    HTTP2_ENABLED,
+)
+from backend.utils.logger import app_logger
+
+try:
+    import h2  # noqa: F401  (httpx only negotiates HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that frees its host slot once the body is read or closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release:
+                release()
+
+
+class _HostLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Caps the requests in flight per host on top of the pool-wide limits, so one
+    slow provider cannot take every connection of the shared pool. A slot is
+    held until the response body has been read (or the response closed).
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_per_host: int):
+        self._transport = transport
+        self._max_per_host = max_per_host
+        self._semaphores = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = (request.url.scheme, request.url.host, request.url.port)
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = self._semaphores[key] = asyncio.Semaphore(self._max_per_host)
+
+        pool_timeout = request.extensions.get("timeout", {}).get("pool")
+        try:
+            await asyncio.wait_for(semaphore.acquire(), pool_timeout)
+        except asyncio.TimeoutError:
+            raise httpx.PoolTimeout(f"No free connection to {request.url.host} within {pool_timeout}s", request=request)
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            semaphore.release()
+            raise
+        response.stream = _ReleasingStream(response.stream, semaphore.release)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def create_transport() -> httpx.AsyncBaseTransport:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    transport = httpx.AsyncHTTPTransport(limits=limits, http2=HTTP2_ENABLED and HTTP2_AVAILABLE)
+    return _HostLimitedTransport(transport, HTTP_MAX_CONNECTIONS_PER_HOST)
+
+
+# One client per event loop: pooled connections belong to the loop that opened
+# them. A worker runs a single loop, so in production this is one client per process.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The shared keep-alive client for outbound provider calls (Picsart, PhotoRoom)."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        with _clients_lock:
+            # Forget clients of loops that are gone (e.g. one loop per TestClient request)
+            for stale in [other for other in _clients if other.is_closed()]:
+                del _clients[stale]
+            client = _clients[loop] = httpx.AsyncClient(
+                transport=create_transport(),
+                timeout=httpx.Timeout(
+                    connect=HTTP_CONNECT_TIMEOUT,
+                    read=HTTP_READ_TIMEOUT,
+                    write=HTTP_WRITE_TIMEOUT,
+                    pool=HTTP_POOL_TIMEOUT,
+                ),
+            )
+        app_logger.info(f"SHARED HTTP CLIENT CREATED", extra={"http2": HTTP2_ENABLED and HTTP2_AVAILABLE})
+    return client
+
+
+async def close_http_client() -> None:
+    """Close the current loop's client and its pooled connections (app shutdown)."""
+    with _clients_lock:
+        client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,233 @@
+"""
+CPU-bound image operations, run in the image process pool (see image_pool).
+
+Everything here takes and returns plain bytes, numbers and strings so it can
+cross the process boundary, and imports nothing beyond Pillow and NumPy so
+the pool workers start quickly.
+"""
+import struct
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from PIL.PngImagePlugin import PngInfo
+from backend.utils import blurhash
+
+# Modes kept as they are when decoding; anything else is converted first
+NATIVE_MODES = ("L", "LA", "RGB", "RGBA")
+
+# WebP's "method" and AVIF's "speed" trade encode time for size; these are the
+# middle of both ranges, about a second for a typical 1-2 megapixel result
+WEBP_METHOD = 4
+AVIF_SPEED = 6
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# zlib strategy for run-length matches only (Pillow's compress_type); fast, and
+# on photographic content often as small as the default strategy
+Z_RLE = 3
+
+# PNG chunks written again from the decoded image: pixels, palette,
+# transparency, ICC profile, EXIF and resolution
+_REBUILT_CHUNKS = {b"IHDR", b"PLTE", b"IDAT", b"IEND", b"tRNS", b"iCCP", b"eXIf", b"pHYs"}
+# Public ancillary chunks Pillow writes back verbatim from a PngInfo (private ones always are)
+_COPIED_CHUNKS = {b"cHRM", b"cICP", b"gAMA", b"sBIT", b"sRGB", b"tIME", b"iTXt", b"tEXt", b"zTXt", b"sPLT"}
+# Chunks whose contents depend on the colour type, so the image cannot become paletted
+_COLOR_TYPE_CHUNKS = {b"sBIT", b"sPLT"}
+
+
+def decode(image_data: bytes, modes: Tuple[str, ...] = NATIVE_MODES) -> Image.Image:
+    image = Image.open(BytesIO(image_data))
+    if image.mode not in modes:
+        return image.convert("RGBA" if "A" in image.mode.upper() or "transparency" in image.info else "RGB")
+    image.load()
+    return image
+
+
+def decode_pixels(image_data: bytes) -> Tuple[str, Tuple[int, int], bytes]:
+    """(mode, size, raw pixels) of an encoded image, in one of ``NATIVE_MODES``."""
+    image = decode(image_data)
+    return image.mode, image.size, image.tobytes()
+
+
+def encode_png(mode: str, size: Tuple[int, int], pixels: bytes, compress_level: int) -> bytes:
+    buffer = BytesIO()
+    Image.frombuffer(mode, size, pixels, "raw", mode, 0, 1).save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+@contextmanager
+def attached(name: str) -> Iterator[memoryview]:
+    """The buffer of an existing shared memory segment; views of it must be released before exit."""
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        yield segment.buf
+    finally:
+        segment.close()
+
+
+def encode_shared_png(mode: str, size: Tuple[int, int], name: str, compress_level: int) -> bytes:
+    """``encode_png`` of raw pixels held in the shared memory segment ``name``."""
+    with attached(name) as buffer:
+        image = Image.frombuffer(mode, size, buffer, "raw", mode, 0, 1)
+        try:
+            output = BytesIO()
+            image.save(output, format="PNG", compress_level=compress_level)
+        finally:
+            # Releases the image's view of the segment
+            del image
+    return output.getvalue()
+
+
+def to_png(image_data: bytes, compress_level: int) -> bytes:
+    image = decode(image_data)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def encode_thumbnail(image: Image.Image, size: int, quality: int) -> bytes:
+    """WebP of ``image`` scaled down (never up) to ``size`` pixels on its longest side."""
+    scale = min(size / max(image.size), 1.0)
+    thumbnail = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    buffer = BytesIO()
+    thumbnail.save(buffer, format="WEBP", quality=quality, method=WEBP_METHOD)
+    return buffer.getvalue()
+
+
+def encode_variant(image: Image.Image, variant: dict) -> bytes:
+    buffer = BytesIO()
+    options = {}
+    if variant["format"] == "WEBP":
+        options["method"] = WEBP_METHOD
+        if variant["lossless"]:
+            options["lossless"] = True
+    else:
+        options["speed"] = AVIF_SPEED
+    if variant["quality"] is not None:
+        options["quality"] = variant["quality"]
+    image.save(buffer, format=variant["format"], **options)
+    return buffer.getvalue()
+
+
+def render_thumbnail(image_data: bytes, size: int, quality: int) -> bytes:
+    return encode_thumbnail(decode(image_data, ("RGB", "RGBA")), size, quality)
+
+
+def render_placeholder(image_data: bytes) -> str:
+    """The BlurHash placeholder of an encoded image."""
+    return blurhash.encode(decode(image_data, ("RGB", "RGBA")))
+
+
+def render_previews(image_data: bytes, sizes: List[int], quality: int, placeholder: bool) -> Tuple[Dict[int, bytes], Optional[str]]:
+    """The thumbnails (size -> WebP) and the BlurHash placeholder of an encoded image."""
+    image = decode(image_data, ("RGB", "RGBA"))
+    thumbnails = {size: encode_thumbnail(image, size, quality) for size in sizes}
+    return thumbnails, blurhash.encode(image) if placeholder else None
+
+
+def render_variants(image_data: bytes, variants: List[dict]) -> Dict[str, bytes]:
+    """Variant name -> encoded bytes for each variant description (see variants.parse_variants)."""
+    image = decode(image_data, ("RGB", "RGBA"))
+    return {variant["name"]: encode_variant(image, variant) for variant in variants}
+
+
+def png_chunks(data: bytes) -> List[Tuple[bytes, bytes, bool]]:
+    """(type, data, after IDAT) of every chunk of a PNG file."""
+    chunks, position, seen_idat = [], len(PNG_SIGNATURE), False
+    while position + 8 <= len(data):
+        length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+        seen_idat = seen_idat or chunk_type == b"IDAT"
+        chunks.append((chunk_type, data[position + 8:position + 8 + length], seen_idat and chunk_type != b"IDAT"))
+        position += length + 12
+        if chunk_type == b"IEND":
+            break
+    return chunks
+
+
+def _exact_palette(image: Image.Image) -> Optional[Image.Image]:
+    """``image`` (RGB or RGBA) as a P image with the same pixels, if it has at most 256 colours."""
+    colors = image.getcolors(256)
+    if colors is None:
+        return None
+    pixels = np.asarray(image).astype(np.uint32)
+    palette = np.array([color for _, color in colors], dtype=np.uint32)
+    # One integer per colour, so every pixel can be looked up in the sorted palette
+    shifts = np.array([24, 16, 8, 0][-pixels.shape[-1]:], dtype=np.uint32)
+    keys = (pixels << shifts).sum(axis=-1, dtype=np.uint32)
+    palette_keys = (palette << shifts).sum(axis=-1, dtype=np.uint32)
+    order = np.argsort(palette_keys)
+    indices = order[np.searchsorted(palette_keys[order], keys)].astype(np.uint8)
+
+    paletted = Image.fromarray(indices, "P")
+    paletted.putpalette(palette[:, :3].astype(np.uint8).tobytes(), "RGB")
+    if image.mode == "RGBA":
+        paletted.info["transparency"] = palette[:, 3].astype(np.uint8).tobytes()
+    return paletted
+
+
+def optimize_png(image_data: bytes, cpu_budget: float, palette: bool) -> Optional[Tuple[bytes, str]]:
+    """
+    A smaller, pixel-identical encoding of a PNG: maximum deflate with
+    Pillow's adaptive row filters, a run-length deflate strategy, and an
+    exact palette when the image has at most 256 colours (``palette``).
+    Metadata chunks are carried over; PNGs with chunks that would not survive
+    (animation, background colour, ...) and 16-bit PNGs are left alone.
+
+    Candidates are tried while ``cpu_budget`` CPU seconds last; one is only
+    started if the previous one (at first the decode) would still fit, so
+    the budget is overrun by at most one candidate's misestimate. Returns
+    (bytes, method) of the smallest candidate, or None if none is smaller.
+    """
+    start = time.process_time()
+    if not image_data.startswith(PNG_SIGNATURE):
+        return None
+    chunks = png_chunks(image_data)
+    chunk_types = {chunk_type for chunk_type, _, _ in chunks}
+    if not chunks or chunks[0][0] != b"IHDR" or chunks[0][1][8:9] == b"\x10":
+        # 16 bits per channel would come back from Pillow as 8
+        return None
+    private = {chunk_type for chunk_type in chunk_types if chunk_type[1:2].islower()}
+    if chunk_types - _REBUILT_CHUNKS - _COPIED_CHUNKS - private:
+        return None
+
+    image = Image.open(BytesIO(image_data))
+    image.load()
+    if b"pHYs" in chunk_types and "dpi" not in image.info:
+        # Only resolutions in dots per metre are read back into something Pillow writes
+        return None
+    pnginfo = PngInfo()
+    for chunk_type, data, after_idat in chunks:
+        if chunk_type in _COPIED_CHUNKS or chunk_type in private:
+            pnginfo.add(chunk_type, data, after_idat=after_idat)
+    options = {"pnginfo": pnginfo, "icc_profile": image.info.get("icc_profile"), "exif": image.info.get("exif"), "dpi": image.info.get("dpi")}
+
+    def encode(target: Image.Image, **extra) -> bytes:
+        buffer = BytesIO()
+        target.save(buffer, format="PNG", **options, **extra)
+        return buffer.getvalue()
+
+    def encode_paletted() -> Optional[bytes]:
+        paletted = _exact_palette(image)
+        return encode(paletted, compress_level=9) if paletted is not None else None
+
+    candidates = []
+    if palette and image.mode in ("RGB", "RGBA") and "transparency" not in image.info and not chunk_types & _COLOR_TYPE_CHUNKS:
+        candidates.append(("palette", encode_paletted))
+    candidates.append(("deflate", lambda: encode(image, compress_level=9)))
+    candidates.append(("rle", lambda: encode(image, compress_level=9, compress_type=Z_RLE)))
+
+    best, method = image_data, None
+    last_cost = time.process_time() - start
+    for name, candidate in candidates:
+        if time.process_time() - start + last_cost > cpu_budget:
+            break
+        started = time.process_time()
+        content = candidate()
+        last_cost = time.process_time() - started
+        if content and len(content) < len(best):
+            best, method = content, name
+    return (best, method) if method else None
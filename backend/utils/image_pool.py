@@ -0,0 +1,229 @@
+"""
+Process pool shared by all CPU-bound image work: decoding, resizing,
+re-encoding, local upscaling and background removal.
+
+Pillow and NumPy release the GIL for parts of their work, but not for all of
+it (mode conversions, PNG filtering, Python-level loops), so on threads image
+work still competes with the event loop. Everything heavy is submitted here
+instead, to ``IMAGE_POOL_WORKERS`` worker processes. The pool is bounded: once
+``IMAGE_POOL_MAX_PENDING`` tasks are waiting for a worker, submissions raise
+``ImagePoolBusyError`` and the caller sheds the work (falls back to a
+provider, answers 503, skips an optional step).
+
+Byte arguments and results of ``IMAGE_POOL_SHM_THRESHOLD`` or more are passed
+through ``multiprocessing.shared_memory`` rather than pickled through the
+worker pipe. Segments are always unlinked by the app process once the task is
+done, whether or not anyone is still waiting for its result.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Callable, Iterator, List
+from backend.config.settings import IMAGE_POOL_WORKERS, IMAGE_POOL_MAX_PENDING, IMAGE_POOL_SHM_THRESHOLD
+from backend.utils.custom_exceptions import ImagePoolBusyError
+from backend.utils.logger import app_logger
+from backend.utils.metrics import (
+    metrics,
+    IMAGE_POOL_TASKS,
+    IMAGE_POOL_TASK_LATENCY,
+    IMAGE_POOL_QUEUE_WAIT,
+    IMAGE_POOL_QUEUE_DEPTH,
+    IMAGE_POOL_BUSY_WORKERS,
+    IMAGE_POOL_UTILIZATION,
+)
+
+
+class SharedBuffer:
+    """Bytes stored in a shared memory segment; pickles as the segment name and size."""
+
+    __slots__ = ("name", "size")
+
+    def __init__(self, name: str, size: int):
+        self.name = name
+        self.size = size
+
+
+def _share(value, threshold: int, segments: List[shared_memory.SharedMemory]):
+    """``value`` with large bytes (also inside tuples, lists and dict values) moved to shared memory."""
+    if isinstance(value, (bytes, bytearray, memoryview)) and len(value) >= threshold:
+        segment = shared_memory.SharedMemory(create=True, size=len(value))
+        segments.append(segment)
+        segment.buf[:len(value)] = value
+        return SharedBuffer(segment.name, len(value))
+    if isinstance(value, (tuple, list)):
+        return type(value)(_share(item, threshold, segments) for item in value)
+    if isinstance(value, dict):
+        return {key: _share(item, threshold, segments) for key, item in value.items()}
+    return value
+
+
+def _unshare(value, unlink: bool):
+    """Inverse of ``_share``; ``unlink`` frees the segments once they are copied out."""
+    if isinstance(value, SharedBuffer):
+        segment = shared_memory.SharedMemory(name=value.name)
+        try:
+            return bytes(segment.buf[:value.size])
+        finally:
+            segment.close()
+            if unlink:
+                segment.unlink()
+    if isinstance(value, (tuple, list)):
+        return type(value)(_unshare(item, unlink) for item in value)
+    if isinstance(value, dict):
+        return {key: _unshare(item, unlink) for key, item in value.items()}
+    return value
+
+
+@contextmanager
+def shared_segment(size: int) -> Iterator[shared_memory.SharedMemory]:
+    """
+    A zero-filled shared memory segment of ``size`` bytes for tasks to write
+    into, by name (see ``image_ops.attached``); unlinked on exit.
+    """
+    segment = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        yield segment
+    finally:
+        segment.close()
+        segment.unlink()
+
+
+def _execute(function: Callable, args: tuple, threshold: int):
+    """Worker side of a task: returns (result, wall clock start, run time)."""
+    started = time.time()
+    result = function(*_unshare(args, unlink=False))
+    segments = []
+    try:
+        result = _share(result, threshold, segments)
+    except BaseException:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+        raise
+    for segment in segments:
+        # The app process copies the result out and unlinks the segment
+        segment.close()
+    return result, started, time.time() - started
+
+
+class ImagePool:
+    """
+    Bounded process pool for image operations. ``submit`` returns a
+    ``concurrent.futures.Future``; ``run`` awaits the result from async code
+    and ``run_sync`` blocks for it on a worker thread. Functions and their
+    arguments must be picklable (module-level functions, plain data).
+    """
+
+    def __init__(self, workers: int = IMAGE_POOL_WORKERS, max_pending: int = IMAGE_POOL_MAX_PENDING, shm_threshold: int = IMAGE_POOL_SHM_THRESHOLD):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.shm_threshold = shm_threshold
+        self._executor = None
+        self._lock = threading.Lock()
+        self._tasks = 0
+        # Busy worker-seconds, integrated whenever the task count changes, for the utilization gauge
+        self._busy_seconds = 0.0
+        self._changed_at = time.monotonic()
+        self._sampled = (self._changed_at, 0.0)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the app process runs threads (metrics flusher, log queue, variant builder)
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            app_logger.info(f"STARTED IMAGE POOL WITH {self.workers} WORKERS")
+        return self._executor
+
+    def _count(self, delta: int) -> None:
+        # Called with the lock held. Workers take tasks in order as they free up,
+        # so the first ``workers`` tasks are running and the rest are queued.
+        now = time.monotonic()
+        self._busy_seconds += min(self._tasks, self.workers) * (now - self._changed_at)
+        self._changed_at = now
+        self._tasks += delta
+        IMAGE_POOL_BUSY_WORKERS.set(min(self._tasks, self.workers))
+        IMAGE_POOL_QUEUE_DEPTH.set(max(self._tasks - self.workers, 0))
+
+    @property
+    def queue_depth(self) -> int:
+        return max(self._tasks - self.workers, 0)
+
+    def submit(self, function: Callable, *args, operation: str = None) -> Future:
+        """Run ``function(*args)`` in a worker; raises ImagePoolBusyError when the queue is full."""
+        operation = operation or function.__name__
+        with self._lock:
+            if self._tasks - self.workers >= self.max_pending:
+                IMAGE_POOL_TASKS.inc(operation=operation, outcome="rejected")
+                raise ImagePoolBusyError(f"Image processing is at capacity ({self._tasks} tasks running or waiting)")
+            executor = self._get_executor()
+            self._count(1)
+
+        segments = []
+        try:
+            task = executor.submit(_execute, function, _share(args, self.shm_threshold, segments), self.shm_threshold)
+        except BaseException:
+            self._release(segments)
+            raise
+        # Resolved from the task's callback, so the cleanup below happens even if nobody waits for the result
+        future = Future()
+        future.set_running_or_notify_cancel()
+        submitted = time.time()
+        task.add_done_callback(lambda task: self._complete(task, future, operation, submitted, segments))
+        return future
+
+    def _release(self, segments: List[shared_memory.SharedMemory]) -> None:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+        with self._lock:
+            self._count(-1)
+
+    def _complete(self, task: Future, future: Future, operation: str, submitted: float, segments: List[shared_memory.SharedMemory]) -> None:
+        self._release(segments)
+        try:
+            result, started, duration = task.result()
+            IMAGE_POOL_QUEUE_WAIT.observe(max(started - submitted, 0.0), operation=operation)
+            IMAGE_POOL_TASK_LATENCY.observe(duration, operation=operation)
+            result = _unshare(result, unlink=True)
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                # A worker died (killed for memory, crashed in a codec); start a fresh pool on the next task
+                app_logger.error(f"IMAGE POOL BROKEN DURING {operation}; RESTARTING ON NEXT TASK")
+                with self._lock:
+                    if self._executor is not None and self._executor._broken:
+                        self._executor = None
+            IMAGE_POOL_TASKS.inc(operation=operation, outcome="error")
+            future.set_exception(e)
+            return
+        IMAGE_POOL_TASKS.inc(operation=operation, outcome="success")
+        future.set_result(result)
+
+    async def run(self, function: Callable, *args, operation: str = None):
+        return await asyncio.wrap_future(self.submit(function, *args, operation=operation))
+
+    def run_sync(self, function: Callable, *args, operation: str = None):
+        return self.submit(function, *args, operation=operation).result()
+
+    def collect(self) -> None:
+        """Metrics collector: utilization since the previous scrape."""
+        with self._lock:
+            self._count(0)
+            now, busy = self._changed_at, self._busy_seconds
+            then, busy_then = self._sampled
+            self._sampled = (now, busy)
+        if now > then:
+            IMAGE_POOL_UTILIZATION.set((busy - busy_then) / (self.workers * (now - then)))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+image_pool = ImagePool()
+metrics.add_collector(image_pool.collect)
@@ -0,0 +1,137 @@
+import struct
+from io import BytesIO
+from typing import AsyncIterable, AsyncIterator, Optional, Tuple
+from PIL import Image
+
+# Bytes kept while looking for the dimensions. PNG, GIF and WebP carry them in
+# the first few dozen bytes; JPEG only after its APPn segments (EXIF, ICC), which
+# are capped at 64 KB each.
+PROBE_LIMIT = 256 * 1024
+
+# JPEG start-of-frame markers (baseline, progressive, lossless, ...); C4, C8 and CC are not frames
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Modes are reported the way PIL would open the image
+_PNG_MODES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+_JPEG_MODES = {1: "L", 3: "RGB", 4: "CMYK"}
+
+
+def _png_metadata(head: bytes) -> Optional[dict]:
+    if len(head) < 26 or head[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", head[16:24])
+    bit_depth, color_type = head[24], head[25]
+    mode = "I;16" if color_type == 0 and bit_depth == 16 else _PNG_MODES.get(color_type, "RGB")
+    return {"format": "PNG", "width": width, "height": height, "mode": mode}
+
+
+def _jpeg_metadata(head: bytes) -> Optional[dict]:
+    offset = 2
+    while offset + 4 <= len(head):
+        if head[offset] != 0xFF:
+            return None
+        marker = head[offset + 1]
+        if marker == 0xFF:  # fill byte
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # markers without a length
+            offset += 2
+            continue
+        length = struct.unpack(">H", head[offset + 2:offset + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 10 > len(head):
+                return None
+            height, width = struct.unpack(">HH", head[offset + 5:offset + 9])
+            return {"format": "JPEG", "width": width, "height": height, "mode": _JPEG_MODES.get(head[offset + 9], "RGB")}
+        offset += 2 + length
+    return None
+
+
+def _webp_metadata(head: bytes) -> Optional[dict]:
+    chunk = head[12:16]
+    if chunk == b"VP8 " and len(head) >= 30:
+        width, height = struct.unpack("<HH", head[26:30])
+        width, height, alpha = width & 0x3FFF, height & 0x3FFF, False
+    elif chunk == b"VP8L" and len(head) >= 25:
+        bits = struct.unpack("<I", head[21:25])[0]
+        width, height, alpha = (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, bool(bits >> 28 & 1)
+    elif chunk == b"VP8X" and len(head) >= 30:
+        width, height = int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+        alpha = bool(head[20] & 0x10)
+    else:
+        return None
+    return {"format": "WEBP", "width": width, "height": height, "mode": "RGBA" if alpha else "RGB"}
+
+
+def probe_metadata(head: bytes) -> Optional[dict]:
+    """
+    Format, width, height and mode read from the first bytes of a PNG, JPEG,
+    GIF or WebP file, without decoding it. None if the header is incomplete
+    or the format unknown.
+    """
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return _png_metadata(head)
+    if head.startswith(b"\xff\xd8"):
+        return _jpeg_metadata(head)
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        if len(head) < 10:
+            return None
+        width, height = struct.unpack("<HH", head[6:10])
+        return {"format": "GIF", "width": width, "height": height, "mode": "P"}
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return _webp_metadata(head)
+    return None
+
+
+def probe_dimensions(head: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from the header bytes, see ``probe_metadata``."""
+    metadata = probe_metadata(head)
+    return (metadata["width"], metadata["height"]) if metadata else None
+
+
+def image_metadata(data: bytes) -> dict:
+    """Metadata of a complete image, including its byte size; falls back to PIL (header only) for other formats."""
+    # The parsers only look at the header, so the whole buffer is passed without copying it
+    metadata = probe_metadata(data)
+    if metadata is None:
+        image = Image.open(BytesIO(data))
+        metadata = {"format": image.format, "width": image.width, "height": image.height, "mode": image.mode}
+    return {**metadata, "size": len(data)}
+
+
+def image_dimensions(data: bytes) -> Tuple[int, int]:
+    """Dimensions of a complete image, see ``image_metadata``."""
+    metadata = image_metadata(data)
+    return metadata["width"], metadata["height"]
+
+
+class DimensionProbe:
+    """
+    Picks up the image metadata from a byte stream as it passes through, so
+    a download can be handed to storage chunk by chunk while still reporting
+    the resolution. At most ``PROBE_LIMIT`` bytes are buffered.
+    """
+
+    def __init__(self):
+        self.metadata: Optional[dict] = None
+        self.size = 0
+        self._head = b""
+
+    @property
+    def dimensions(self) -> Optional[Tuple[int, int]]:
+        return (self.metadata["width"], self.metadata["height"]) if self.metadata else None
+
+    def feed(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.metadata is not None or len(self._head) >= PROBE_LIMIT:
+            return
+        self._head += chunk[:PROBE_LIMIT - len(self._head)]
+        self.metadata = probe_metadata(self._head)
+        if self.metadata is not None:
+            self._head = b""
+
+    async def watch(self, chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+        """Pass ``chunks`` through unchanged, feeding each one to the probe."""
+        async for chunk in chunks:
+            self.feed(chunk)
+            yield chunk
@@ -0,0 +1,179 @@
+import math
+import time
+import threading
+from collections import deque
+from typing import Dict, Optional
+from backend.config.settings import (
+    LATENCY_WINDOW_SECONDS,
+    LATENCY_WINDOW_SLICES,
+    SLOW_REQUEST_THRESHOLD,
+    SLOW_REQUEST_BUFFER_SIZE,
+)
+from backend.utils.logger import request_id_var
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed streaming quantile sketch (DDSketch style).
+
+    Values are counted in buckets whose bounds grow geometrically by
+    ``gamma = (1 + alpha) / (1 - alpha)``, so every quantile is reported
+    within ``alpha`` relative error while memory stays at a few hundred
+    integers regardless of how many values were observed. Sketches merge
+    by adding bucket counts, which is what makes rolling windows cheap.
+    """
+
+    __slots__ = ("alpha", "_log_gamma", "buckets", "count", "total", "min_value", "max_value")
+
+    def __init__(self, alpha: float = 0.01):
+        self.alpha = alpha
+        self._log_gamma = math.log((1 + alpha) / (1 - alpha))
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min_value = math.inf
+        self.max_value = 0.0
+
+    def add(self, value: float) -> None:
+        value = max(value, 1e-6)
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min_value = min(self.min_value, value)
+        self.max_value = max(self.max_value, value)
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Bucket midpoint in log space keeps the relative error within alpha
+                value = 2 * math.exp(index * self._log_gamma) / (1 + math.exp(self._log_gamma))
+                return min(max(value, self.min_value), self.max_value)
+        return self.max_value
+
+
+class RollingQuantiles:
+    """Quantiles over the last ``window`` seconds, kept as a ring of per-slice sketches."""
+
+    def __init__(self, window: float = LATENCY_WINDOW_SECONDS, slices: int = LATENCY_WINDOW_SLICES):
+        self.slice_seconds = window / slices
+        self._slices = [(None, QuantileSketch()) for _ in range(slices)]
+
+    def _slot(self, now: float) -> int:
+        return int(now // self.slice_seconds)
+
+    def add(self, value: float, now: Optional[float] = None) -> None:
+        slot = self._slot(time.monotonic() if now is None else now)
+        position = slot % len(self._slices)
+        current_slot, sketch = self._slices[position]
+        if current_slot != slot:
+            sketch = QuantileSketch()
+            self._slices[position] = (slot, sketch)
+        sketch.add(value)
+
+    def snapshot(self, now: Optional[float] = None) -> QuantileSketch:
+        oldest = self._slot(time.monotonic() if now is None else now) - len(self._slices) + 1
+        merged = QuantileSketch()
+        for slot, sketch in self._slices:
+            if slot is not None and slot >= oldest:
+                merged.merge(sketch)
+        return merged
+
+    def summary(self, now: Optional[float] = None) -> dict:
+        sketch = self.snapshot(now)
+        summary = {"count": sketch.count}
+        for q in QUANTILES:
+            value = sketch.quantile(q)
+            summary[f"p{int(q * 100)}"] = round(value, 4) if value is not None else None
+        return summary
+
+
+class LatencySampler:
+    """
+    Rolling p50/p95/p99 per endpoint and per stage, plus a bounded ring
+    buffer with the full breakdown of every request slower than the
+    configured threshold.
+    """
+
+    def __init__(self, threshold: float = SLOW_REQUEST_THRESHOLD, buffer_size: int = SLOW_REQUEST_BUFFER_SIZE):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, RollingQuantiles] = {}
+        self._stages: Dict[str, Dict[str, RollingQuantiles]] = {}
+        self.slow_requests = deque(maxlen=buffer_size)
+
+    def record(self, method: str, route: str, status_code: int, duration: float,
+               request_bytes: Optional[int] = None, response_bytes: Optional[int] = None, trace=None) -> None:
+        endpoint = f"{method} {route}"
+        stages = trace.stage_durations() if trace is not None else {}
+
+        with self._lock:
+            rolling = self._endpoints.get(endpoint)
+            if rolling is None:
+                rolling = self._endpoints[endpoint] = RollingQuantiles()
+            rolling.add(duration)
+
+            endpoint_stages = self._stages.setdefault(endpoint, {})
+            for stage, seconds in stages.items():
+                stage_rolling = endpoint_stages.get(stage)
+                if stage_rolling is None:
+                    stage_rolling = endpoint_stages[stage] = RollingQuantiles()
+                stage_rolling.add(seconds)
+
+        if duration < self.threshold:
+            return
+
+        providers = []
+        if trace is not None:
+            providers = sorted({s.attributes["provider"] for s in trace.spans if "provider" in s.attributes})
+        self.slow_requests.append({
+            "timestamp": time.time(),
+            "request_id": request_id_var.get(),
+            "trace_id": trace.trace_id if trace is not None else None,
+            "endpoint": endpoint,
+            "status_code": status_code,
+            "duration": round(duration, 4),
+            "request_bytes": request_bytes,
+            "response_bytes": response_bytes,
+            "providers": providers,
+            "attributes": dict(trace.attributes) if trace is not None else {},
+            "stages": [
+                {"name": s.name, "duration": round(s.duration, 4) if s.duration is not None else None,
+                 "error": s.error, **s.attributes}
+                for s in (trace.spans if trace is not None else [])
+            ],
+        })
+
+    def percentiles(self) -> dict:
+        with self._lock:
+            return {
+                "endpoints": {name: rolling.summary() for name, rolling in self._endpoints.items()},
+                "stages": {
+                    endpoint: {stage: rolling.summary() for stage, rolling in stages.items()}
+                    for endpoint, stages in self._stages.items()
+                },
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+            self._stages.clear()
+            self.slow_requests.clear()
+
+
+latency_sampler = LatencySampler()
@@ -1,66 +1,207 @@
 import logging
+import sys
+import time
+import threading
+from contextvars import ContextVar
 from typing import Optional
 import traceback
 import json
 from datetime import datetime
 
+# Request id of the request being handled, set by LoggingMiddleware
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+def get_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+class LazyMessage:
+    """
+    Log message whose final text (``message | Exception: ... | Extra: {...}``)
+    is only built when a handler actually formats the record. With queue
+    logging that happens on the listener thread, off the request path.
+    """
+
+    __slots__ = ("message", "extra", "exception")
+
+    def __init__(self, message: str, extra: Optional[dict] = None, exception: Optional[BaseException] = None):
+        self.message = message
+        self.extra = extra
+        self.exception = exception
+
+    def __str__(self) -> str:
+        message = self.message
+        if self.exception is not None:
+            tb = "".join(traceback.format_exception(type(self.exception), self.exception, self.exception.__traceback__))
+            message = f"{message} | Exception: {str(self.exception)} | Traceback: {tb}"
+        if self.extra:
+            message = f"{message} | Extra: {json.dumps(self.extra, default=str)}"
+        return message
+
+
+# Top-level fields of a JSON log line; extra fields with these names are nested under "extra"
+RESERVED_FIELDS = frozenset({"timestamp", "level", "logger", "message", "request_id", "exception", "extra"})
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line with the structured ``extra`` fields inlined,
+    except those named like a reserved field (see ``RESERVED_FIELDS``).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        msg = record.msg
+        if isinstance(msg, LazyMessage):
+            message = msg.message
+            exception = msg.exception
+        else:
+            message = record.getMessage()
+            exception = None
+
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": message,
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            payload["request_id"] = request_id
+        structured = getattr(record, "structured", None)
+        if structured:
+            collisions = {}
+            for key, value in structured.items():
+                if key in RESERVED_FIELDS:
+                    collisions[key] = value
+                else:
+                    payload[key] = value
+            if collisions:
+                payload["extra"] = collisions
+        if exception is not None:
+            payload["exception"] = "".join(traceback.format_exception(type(exception), exception, exception.__traceback__))
+        elif record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class CallSiteLimiter:
+    """Per-call-site sampling and rate limiting for log calls in hot loops."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # call site -> [calls, window_start, emitted_in_window, suppressed]
+        self._sites = {}
+
+    def allow(self, site: tuple, sample_every: Optional[int], max_per_second: Optional[float]) -> tuple:
+        """Return ``(emit, suppressed_since_last_emit)`` for one call at ``site``."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._sites.get(site)
+            if state is None:
+                state = self._sites[site] = [0, now, 0, 0]
+            state[0] += 1
+
+            emit = True
+            if sample_every and (state[0] - 1) % sample_every:
+                emit = False
+            if emit and max_per_second:
+                if now - state[1] >= 1.0:
+                    state[1], state[2] = now, 0
+                if state[2] >= max_per_second:
+                    emit = False
+
+            if not emit:
+                state[3] += 1
+                return False, 0
+            state[2] += 1
+            suppressed, state[3] = state[3], 0
+            return True, suppressed
+
+
 class AppLogger:
-    
+
     def __init__(self, name: str = "image_gen_api"):
         self.logger = logging.getLogger(name)
         self.access_logger = logging.getLogger(f"{name}.access")
-    
-    def info(self, message: str, extra: Optional[dict] = None):
+        self._limiter = CallSiteLimiter()
+
+    def _log(self, level: int, message: str, extra: Optional[dict], exception: Optional[BaseException] = None,
+             sample_every: Optional[int] = None, max_per_second: Optional[float] = None):
+        # Level guard first: a disabled call costs one check and nothing else
+        if not self.logger.isEnabledFor(level):
+            return
+
+        if sample_every or max_per_second:
+            caller = sys._getframe(2)
+            emit, suppressed = self._limiter.allow((caller.f_code.co_filename, caller.f_lineno), sample_every, max_per_second)
+            if not emit:
+                return
+            if suppressed:
+                extra = {**(extra or {}), "suppressed": suppressed}
+
+        self.logger.log(
+            level,
+            LazyMessage(message, extra, exception),
+            extra={"structured": extra, "request_id": request_id_var.get()},
+            stacklevel=3,
+        )
+
+    def info(self, message: str, extra: Optional[dict] = None, sample_every: Optional[int] = None, max_per_second: Optional[float] = None):
         """Log info message."""
-        if extra:
-            message = f"{message} | Extra: {json.dumps(extra)}"
-        self.logger.info(message)
-    
-    def debug(self, message: str, extra: Optional[dict] = None):
+        self._log(logging.INFO, message, extra, sample_every=sample_every, max_per_second=max_per_second)
+
+    def debug(self, message: str, extra: Optional[dict] = None, sample_every: Optional[int] = None, max_per_second: Optional[float] = None):
         """Log debug message."""
-        if extra:
-            message = f"{message} | Extra: {json.dumps(extra)}"
-        self.logger.debug(message)
-    
-    def warning(self, message: str, extra: Optional[dict] = None):
+        self._log(logging.DEBUG, message, extra, sample_every=sample_every, max_per_second=max_per_second)
+
+    def warning(self, message: str, extra: Optional[dict] = None, sample_every: Optional[int] = None, max_per_second: Optional[float] = None):
         """Log warning message."""
-        if extra:
-            message = f"{message} | Extra: {json.dumps(extra)}"
-        self.logger.warning(message)
-    
+        self._log(logging.WARNING, message, extra, sample_every=sample_every, max_per_second=max_per_second)
+
     def error(self, message: str, exception: Optional[Exception] = None, extra: Optional[dict] = None):
         """Log error message with optional exception details."""
-        if exception:
-            message = f"{message} | Exception: {str(exception)} | Traceback: {traceback.format_exc()}"
-        if extra:
-            message = f"{message} | Extra: {json.dumps(extra)}"
-        self.logger.error(message)
-    
+        self._log(logging.ERROR, message, extra, exception)
+
     def critical(self, message: str, exception: Optional[Exception] = None, extra: Optional[dict] = None):
         """Log critical message with optional exception details."""
-        if exception:
-            message = f"{message} | Exception: {str(exception)} | Traceback: {traceback.format_exc()}"
-        if extra:
-            message = f"{message} | Extra: {json.dumps(extra)}"
-        self.logger.critical(message)
-    
-    def log_request(self, method: str, url: str, client_ip: str, user_agent: str = "", status_code: int = 0, processing_time: float = 0.0):
+        self._log(logging.CRITICAL, message, extra, exception)
+
+    def log_request(self, method: str, url: str, client_ip: str, user_agent: str = "", status_code: int = 0, processing_time: float = 0.0, response_bytes: Optional[int] = None):
         """Log HTTP request details."""
-        message = f"{method} {url} - IP: {client_ip} - Status: {status_code} - Time: {processing_time:.3f}s"
-        if user_agent:
-            message += f" - User-Agent: {user_agent}"
-        self.access_logger.info(message)
-    
+        if not self.access_logger.isEnabledFor(logging.INFO):
+            return
+        fields = {
+            "method": method,
+            "url": url,
+            "client_ip": client_ip,
+            "user_agent": user_agent,
+            "status_code": status_code,
+            "processing_time": processing_time,
+            "response_bytes": response_bytes,
+        }
+        self.access_logger.info(
+            "%s %s - IP: %s - Status: %s - Time: %.3fs%s%s",
+            method, url, client_ip, status_code, processing_time,
+            f" - Bytes: {response_bytes}" if response_bytes is not None else "",
+            f" - User-Agent: {user_agent}" if user_agent else "",
+            extra={"structured": fields, "request_id": request_id_var.get()},
+        )
+
     def log_service_call(self, service_name: str, method_name: str, parameters: dict, success: bool, execution_time: float = 0.0, error: Optional[str] = None):
         """Log service method calls for debugging."""
+        level = logging.INFO if success else logging.ERROR
+        if not self.logger.isEnabledFor(level):
+            return
+
         status = "SUCCESS" if success else "FAILURE"
         message = f"Service: {service_name}.{method_name} - Status: {status} - Time: {execution_time:.3f}s"
-        
+
         if parameters:
             # Sanitize sensitive data
             safe_params = {k: v if k not in ['password', 'token', 'key'] else '***' for k, v in parameters.items()}
             message += f" - Params: {json.dumps(safe_params)}"
-        
+
         if error:
             message += f" - Error: {error}"
             self.error(message)
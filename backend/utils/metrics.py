@@ -0,0 +1,332 @@
+import os
+import json
+import time
+import glob
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+from backend.config.settings import METRICS_MULTIPROC_DIR, METRICS_FLUSH_INTERVAL
+from backend.config.logging_config import get_log_queue_stats
+from backend.utils.logger import app_logger
+from backend.utils.tracing import span
+
+# Latency buckets in seconds. Provider calls routinely take 10-30s, so the
+# upper buckets matter as much as the lower ones.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class _Metric:
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, object] = {}
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def get(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, +Inf last, then sum
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def get(self, **labels) -> Optional[list]:
+        return self._values.get(_label_key(labels))
+
+
+class MetricsRegistry:
+    """
+    In-process metric store with Prometheus text exposition.
+
+    When ``METRICS_MULTIPROC_DIR`` is set (e.g. under gunicorn) every worker
+    periodically writes a snapshot of its values to that directory, and a
+    scrape on any worker merges the snapshots of all workers. Counters and
+    histograms of exited workers keep counting towards the totals; gauges only
+    include live workers.
+    """
+
+    def __init__(self, multiprocess_dir: Optional[str] = METRICS_MULTIPROC_DIR, flush_interval: float = METRICS_FLUSH_INTERVAL):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors = []
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_interval = flush_interval
+        self._flush_thread = None
+        self._flush_pid = None
+
+    # ------------------------- DEFINITIONS -------------------------
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets))
+
+    def add_collector(self, collector) -> None:
+        """Register a callable run before every scrape, e.g. to refresh gauges from other subsystems."""
+        self._collectors.append(collector)
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            return self._metrics[metric.name]
+        self._metrics[metric.name] = metric
+        return metric
+
+    # ------------------------- SNAPSHOTS -------------------------
+
+    def snapshot(self) -> dict:
+        """JSON-serializable copy of all values in this process."""
+        data = {}
+        for name, metric in self._metrics.items():
+            with metric._lock:
+                data[name] = [[list(map(list, key)), value if not isinstance(value, list) else list(value)]
+                              for key, value in metric._values.items()]
+        return data
+
+    def _run_collectors(self) -> None:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                app_logger.warning(f"METRICS COLLECTOR FAILED: {str(e)}")
+
+    def _collect(self) -> Dict[str, Dict[LabelKey, object]]:
+        if not self.multiprocess_dir:
+            self._run_collectors()
+            return {name: dict(metric._values) for name, metric in self._metrics.items()}
+
+        self.flush()
+        merged: Dict[str, Dict[LabelKey, object]] = {name: {} for name in self._metrics}
+        for path in glob.glob(os.path.join(self.multiprocess_dir, "metrics_*.json")):
+            pid = int(os.path.basename(path)[8:-5])
+            try:
+                with open(path, "rb") as f:
+                    snapshot = json.loads(f.read())
+            except (OSError, ValueError):
+                continue
+            alive = _pid_alive(pid)
+            for name, values in snapshot.items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.metric_type == "gauge" and not alive):
+                    continue
+                target = merged[name]
+                for key, value in values:
+                    key = tuple(tuple(item) for item in key)
+                    if isinstance(value, list):
+                        existing = target.get(key)
+                        target[key] = value if existing is None else [a + b for a, b in zip(existing, value)]
+                    else:
+                        target[key] = target.get(key, 0.0) + value
+        return merged
+
+    def flush(self) -> None:
+        """Write this process's snapshot for other workers to merge."""
+        if not self.multiprocess_dir:
+            return
+        self._run_collectors()
+        path = os.path.join(self.multiprocess_dir, f"metrics_{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def start_flushing(self) -> None:
+        """Start (once per process) the background thread that flushes snapshots."""
+        if not self.multiprocess_dir or self._flush_pid == os.getpid():
+            return
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        self._flush_pid = os.getpid()
+
+        def run():
+            while True:
+                time.sleep(self.flush_interval)
+                try:
+                    self.flush()
+                except OSError as e:
+                    app_logger.warning(f"FAILED TO FLUSH METRICS SNAPSHOT: {str(e)}")
+
+        self._flush_thread = threading.Thread(target=run, name="metrics-flush", daemon=True)
+        self._flush_thread.start()
+
+    # ------------------------- EXPOSITION -------------------------
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        values = self._collect()
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.metric_type}")
+            for key, value in sorted(values.get(name, {}).items()):
+                if metric.metric_type == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float("inf"),), value[:-1]):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {value[-1]}")
+                    lines.append(f"{name}_count{_format_labels(key)} {cumulative}")
+                else:
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def clear_multiprocess_dir(path: Optional[str] = METRICS_MULTIPROC_DIR) -> None:
+    """Remove stale snapshots; call once in the master process before forking workers."""
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for snapshot in glob.glob(os.path.join(path, "metrics_*.json*")):
+        os.remove(snapshot)
+
+
+# Global registry instance
+metrics = MetricsRegistry()
+
+# ------------------------- METRIC DEFINITIONS -------------------------
+
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP requests by route, method and status code.")
+HTTP_LATENCY = metrics.histogram("http_request_duration_seconds", "HTTP request latency by route and method.")
+HTTP_IN_FLIGHT = metrics.gauge("http_requests_in_flight", "HTTP requests currently being handled.")
+
+PROVIDER_CALLS = metrics.counter("provider_requests_total", "Calls to external providers by provider, operation and outcome.")
+PROVIDER_LATENCY = metrics.histogram("provider_request_duration_seconds", "External provider call latency.")
+PROVIDER_IN_FLIGHT = metrics.gauge("provider_requests_in_flight", "External provider calls currently in progress.")
+
+PROVIDER_FAILOVERS = metrics.counter("provider_failovers_total", "Post-processing attempts handed to the next provider, by operation and failed provider.")
+PROVIDER_HEALTHY = metrics.gauge("provider_healthy", "1 while a post-processing provider is in rotation, 0 while it is cooling down.")
+
+STORAGE_CALLS = metrics.counter("storage_operations_total", "Storage operations by backend, operation and outcome.")
+STORAGE_LATENCY = metrics.histogram("storage_operation_duration_seconds", "Storage operation latency.")
+STORAGE_IN_FLIGHT = metrics.gauge("storage_operations_in_flight", "Storage operations currently in progress.")
+
+IMAGE_POOL_TASKS = metrics.counter("image_pool_tasks_total", "Image process pool tasks by operation and outcome (success, error, rejected).")
+IMAGE_POOL_TASK_LATENCY = metrics.histogram("image_pool_task_duration_seconds", "Time image pool tasks spend running in a worker, by operation.")
+IMAGE_POOL_QUEUE_WAIT = metrics.histogram("image_pool_queue_wait_seconds", "Time image pool tasks wait for a free worker, by operation.")
+IMAGE_POOL_QUEUE_DEPTH = metrics.gauge("image_pool_queue_depth", "Image pool tasks waiting for a free worker.")
+IMAGE_POOL_BUSY_WORKERS = metrics.gauge("image_pool_busy_workers", "Image pool workers running a task.")
+IMAGE_POOL_UTILIZATION = metrics.gauge("image_pool_utilization", "Share of image pool worker time spent on tasks since the previous scrape (0-1).")
+
+RESULT_PNG_OPTIMIZATIONS = metrics.counter("result_png_optimizations_total", "Background re-encodes of stored PNG results by outcome (replaced, unchanged) and method.")
+RESULT_PNG_BYTES_SAVED = metrics.counter("result_png_bytes_saved_total", "Bytes removed from stored PNG results by lossless re-encoding.")
+
+LOG_QUEUE_DEPTH = metrics.gauge("log_queue_depth", "Log records waiting for the writer thread.")
+LOG_QUEUE_DROPPED = metrics.gauge("log_queue_dropped_records", "Log records dropped because the log queue was full (since start).")
+
+
+def _collect_log_queue_stats() -> None:
+    stats = get_log_queue_stats()
+    if stats.get("enabled"):
+        LOG_QUEUE_DEPTH.set(stats["depth"])
+        LOG_QUEUE_DROPPED.set(stats["dropped"])
+
+
+metrics.add_collector(_collect_log_queue_stats)
+
+
+@contextmanager
+def _track(span_name: str, calls: Counter, latency: Histogram, in_flight: Gauge, **labels):
+    in_flight.inc(**labels)
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        with span(span_name, **labels):
+            yield
+        outcome = "success"
+    finally:
+        latency.observe(time.perf_counter() - start, **labels)
+        calls.inc(outcome=outcome, **labels)
+        in_flight.dec(**labels)
+
+
+def track_provider(provider: str, operation: str):
+    """
+    Context manager timing one call to an external provider (gemini, openai,
+    picsart, photoroom). Also records a ``provider.operation`` trace span.
+    """
+    return _track(f"{provider}.{operation}", PROVIDER_CALLS, PROVIDER_LATENCY, PROVIDER_IN_FLIGHT, provider=provider, operation=operation)
+
+
+def track_storage(backend: str, operation: str):
+    """
+    Context manager timing one storage operation (save_result,
+    get_result_content, ...). Also records a trace span named after the operation.
+    """
+    return _track(operation, STORAGE_CALLS, STORAGE_LATENCY, STORAGE_IN_FLIGHT, backend=backend, operation=operation)
+
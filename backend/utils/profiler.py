@@ -0,0 +1,236 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Optional
+from backend.config.settings import BASE_DIR, PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_MAX_SECONDS
+from backend.utils.logger import app_logger, get_request_id
+
+# Leaf frames of threads that are parked rather than doing work (the idle
+# event loop, the anyio thread pool, the log/metrics/trace writer threads)
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("_worker.py", "run"),
+}
+
+PROJECT_ROOT = str(BASE_DIR) + os.sep
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(PROJECT_ROOT):
+        filename = filename[len(PROJECT_ROOT):]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler.
+
+    A background thread wakes every ``interval`` seconds, walks the current
+    frame of every other thread and counts the stack in collapsed form
+    (``thread;outer;...;inner``), the input format of flamegraph.pl,
+    speedscope and inferno. Nothing is traced between samples, so the
+    profiled code runs at full speed.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL, on_tick=None):
+        self.interval = interval
+        self.on_tick = on_tick
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                    self.idle_samples += 1
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+            if self.on_tick is not None:
+                self.on_tick()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileController:
+    """
+    Runs the sampling profiler for the next N requests and/or a time window.
+
+    ``armed`` is the only thing the middleware reads on the hot path; while
+    it is False no profiler thread exists and requests pay nothing. A session
+    ends when its request budget has been handed out and those requests have
+    finished, or when its time window expires, and is written to
+    ``PROFILE_DIR`` as a ``.collapsed`` file.
+    """
+
+    def __init__(self, output_dir: str = PROFILE_DIR, interval: float = PROFILE_SAMPLE_INTERVAL,
+                 max_seconds: float = PROFILE_MAX_SECONDS, history_size: int = 20):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.armed = False
+        self.history = deque(maxlen=history_size)
+        self._lock = threading.Lock()
+        self._profiler: Optional[SamplingProfiler] = None
+        self._session: Optional[dict] = None
+        self._remaining: Optional[int] = None
+        self._deadline = 0.0
+        self._in_flight = 0
+
+    @property
+    def running(self) -> bool:
+        return self._profiler is not None
+
+    def start(self, requests: Optional[int] = None, seconds: Optional[float] = None) -> dict:
+        """Arm a session; with neither limit given only the next request is profiled."""
+        with self._lock:
+            if self._profiler is not None:
+                raise RuntimeError("PROFILING ALREADY IN PROGRESS")
+            return self._start(requests, seconds)
+
+    def _start(self, requests: Optional[int], seconds: Optional[float]) -> dict:
+        if requests is None and seconds is None:
+            requests = 1
+        window = min(seconds, self.max_seconds) if seconds else self.max_seconds
+        name = f"profile_{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{os.getpid()}.collapsed"
+        self._session = {
+            "name": name,
+            "started_at": time.time(),
+            "requests_limit": requests,
+            "seconds_limit": window,
+            "requests": 0,
+            "request_ids": [],
+        }
+        self._remaining = requests
+        self._deadline = time.monotonic() + window
+        self._in_flight = 0
+        self._profiler = SamplingProfiler(self.interval, on_tick=self._check_deadline)
+        self._profiler.start()
+        self.armed = True
+        app_logger.info("PROFILING STARTED", extra={"profile": name, "requests": requests, "seconds": window})
+        return dict(self._session)
+
+    def stop(self) -> Optional[dict]:
+        """End the current session early and write what was sampled so far."""
+        with self._lock:
+            if self._profiler is None:
+                return None
+            return self._finish()
+
+    def begin_request(self, triggered: bool = False) -> Optional[str]:
+        """
+        Called by the middleware for requests arriving while armed, or carrying
+        a valid profile header (which starts a one-request session if none is
+        running). Returns the profile name when the request is being profiled.
+        """
+        with self._lock:
+            if not self.armed:
+                if not triggered or self._profiler is not None:
+                    return None
+                self._start(requests=1, seconds=None)
+            session = self._session
+            session["requests"] += 1
+            if len(session["request_ids"]) < 100:
+                session["request_ids"].append(get_request_id())
+            if self._remaining is not None:
+                self._remaining -= 1
+                if self._remaining <= 0:
+                    self.armed = False
+            self._in_flight += 1
+            return session["name"]
+
+    def end_request(self, name: str) -> None:
+        with self._lock:
+            if self._session is None or self._session["name"] != name:
+                return
+            self._in_flight -= 1
+            if not self.armed and self._in_flight <= 0 and self._profiler is not None:
+                self._finish()
+
+    def _check_deadline(self) -> None:
+        if time.monotonic() < self._deadline:
+            return
+        # Runs on the profiler thread: never block on a thread that is joining us
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._profiler is None:
+                return
+            self.armed = False
+            # Give requests still in flight one more window to finish
+            if self._in_flight <= 0 or time.monotonic() >= self._deadline + self.max_seconds:
+                self._finish()
+        finally:
+            self._lock.release()
+
+    def _finish(self) -> dict:
+        profiler, session = self._profiler, self._session
+        self.armed = False
+        self._profiler = None
+        self._session = None
+        profiler.stop()
+
+        session.update({
+            "duration": round(time.time() - session["started_at"], 3),
+            "samples": profiler.samples,
+            "idle_samples": profiler.idle_samples,
+        })
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(os.path.join(self.output_dir, session["name"]), "w", encoding="utf-8") as f:
+                f.write(profiler.collapsed())
+        except OSError as e:
+            session["error"] = str(e)
+            app_logger.error("FAILED TO WRITE PROFILE", exception=e, extra={"profile": session["name"]})
+        else:
+            app_logger.info("PROFILING FINISHED", extra={k: session[k] for k in ("name", "requests", "samples", "duration")})
+        self.history.append(session)
+        return session
+
+    def status(self) -> dict:
+        with self._lock:
+            current = dict(self._session) if self._session is not None else None
+            if current is not None:
+                current["in_flight"] = self._in_flight
+                current["samples"] = self._profiler.samples
+        return {"armed": self.armed, "current": current, "profiles": list(self.history)[::-1]}
+
+    def get_profile_path(self, name: str) -> Optional[str]:
+        """Path of a finished profile from this process, or None for unknown names."""
+        if not any(session["name"] == name and "error" not in session for session in self.history):
+            return None
+        return os.path.join(self.output_dir, name)
+
+
+# Global controller instance
+profile_controller = ProfileController()
@@ -0,0 +1,52 @@
+"""
+Strip-wise upscaling, run in worker processes by LocalUpscaleService.
+
+Kept free of app imports (``image_ops`` is Pillow only) so that spawned
+workers start quickly.
+"""
+import math
+from typing import List, Tuple
+from PIL import Image, ImageFilter
+from backend.utils.image_ops import attached
+
+# Lanczos-3 reads 3 source pixels on each side when upscaling
+LANCZOS_SUPPORT = 3
+
+# Unsharp mask applied after resampling (radius in output pixels)
+SHARPEN_RADIUS = 1.5
+SHARPEN_PERCENT = 60
+SHARPEN_THRESHOLD = 2
+
+
+def strip_margin(factor: int) -> int:
+    """
+    Source rows added above and below each strip so that both the resampling
+    kernel and the sharpening blur see the same neighbourhood as they would on
+    the whole image. The margin is cut off again after processing.
+    """
+    return LANCZOS_SUPPORT + math.ceil(3 * SHARPEN_RADIUS / factor) + 1
+
+
+def plan_strips(height: int, rows: int) -> List[Tuple[int, int]]:
+    """[(first_row, end_row), ...] covering ``height`` rows in strips of ``rows``."""
+    return [(top, min(top + rows, height)) for top in range(0, height, rows)]
+
+
+def upscale_strip(mode: str, size: Tuple[int, int], data: bytes, factor: int, trim_top: int, trim_bottom: int) -> bytes:
+    """
+    Upscale one strip of raw pixels by ``factor`` and sharpen it. ``trim_top``
+    and ``trim_bottom`` are the margin rows (in source pixels) to drop from the
+    result. Returns the raw pixels of the trimmed output strip.
+    """
+    strip = Image.frombytes(mode, size, data)
+    width, height = size[0] * factor, size[1] * factor
+    upscaled = strip.resize((width, height), Image.Resampling.LANCZOS)
+    upscaled = upscaled.filter(ImageFilter.UnsharpMask(SHARPEN_RADIUS, SHARPEN_PERCENT, SHARPEN_THRESHOLD))
+    return upscaled.crop((0, trim_top * factor, width, height - trim_bottom * factor)).tobytes()
+
+
+def upscale_strip_into(output: str, offset: int, mode: str, size: Tuple[int, int], data: bytes, factor: int, trim_top: int, trim_bottom: int) -> None:
+    """``upscale_strip``, written at byte ``offset`` of the shared memory segment ``output``."""
+    pixels = upscale_strip(mode, size, data, factor, trim_top, trim_bottom)
+    with attached(output) as buffer:
+        buffer[offset:offset + len(pixels)] = pixels
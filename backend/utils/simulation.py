@@ -0,0 +1,61 @@
+import random
+import hashlib
+from io import BytesIO
+from functools import lru_cache
+from typing import Optional
+from PIL import Image
+
+
+class LatencyDistribution:
+    """
+    Seconds a simulated provider takes to answer. ``distribution`` is one of
+    constant (``value``), uniform (``min``/``max``), normal (``mean``/``stddev``),
+    lognormal (``median``/``sigma``) or exponential (``mean``). An optional
+    ``tail`` (``probability``/``multiplier``) adds rare latency spikes.
+    """
+
+    def __init__(self, spec: Optional[dict] = None):
+        spec = spec or {"distribution": "constant", "value": 0.0}
+        self.spec = spec
+        self.kind = spec.get("distribution", "constant")
+        self.tail = spec.get("tail")
+        if self.kind not in ("constant", "uniform", "normal", "lognormal", "exponential"):
+            raise ValueError(f"Unknown latency distribution: {self.kind}")
+
+    def sample(self, rng: random.Random) -> float:
+        spec = self.spec
+        if self.kind == "constant":
+            value = spec.get("value", 0.0)
+        elif self.kind == "uniform":
+            value = rng.uniform(spec["min"], spec["max"])
+        elif self.kind == "normal":
+            value = rng.gauss(spec["mean"], spec["stddev"])
+        elif self.kind == "lognormal":
+            value = spec["median"] * rng.lognormvariate(0.0, spec["sigma"])
+        else:
+            value = rng.expovariate(1.0 / spec["mean"])
+        if self.tail and rng.random() < self.tail["probability"]:
+            value *= self.tail["multiplier"]
+        return max(value, 0.0)
+
+
+@lru_cache(maxsize=8)
+def deterministic_png(seed: str, width: int, height: int, noise: float = 0.25) -> bytes:
+    """
+    A PNG that depends only on its arguments: a colour gradient picked from
+    ``seed`` blended with seeded noise. ``noise`` (0-1) controls how well it
+    compresses, i.e. how close the byte size gets to raw RGB.
+    """
+    rng = random.Random(hashlib.sha256(seed.encode()).digest())
+    gradient = Image.linear_gradient("L").resize((width, height))
+    channels = [
+        gradient.point(lambda v, lo=rng.randrange(128), hi=rng.randrange(128, 256): lo + v * (hi - lo) // 255),
+        gradient.transpose(Image.Transpose.ROTATE_90).resize((width, height)),
+        Image.new("L", (width, height), rng.randrange(256)),
+    ]
+    image = Image.merge("RGB", channels)
+    if noise > 0:
+        image = Image.blend(image, Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3)), noise)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import uuid
+import queue
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+from backend.config.settings import TRACE_EXPORT_FILE
+from backend.utils.logger import app_logger
+
+
+class Span:
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "start", "duration", "attributes", "error")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.attributes = attributes
+        self.error = None
+
+
+class Trace:
+    """All spans recorded while handling one request, plus request-level attributes."""
+
+    def __init__(self, trace_id: Optional[str] = None, name: str = "request"):
+        # Only a valid W3C trace id is kept; anything else (a client's X-Request-ID) gets a fresh one
+        self.trace_id = trace_id if _is_trace_id(trace_id) else uuid.uuid4().hex
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans: List[Span] = []
+        self.attributes = {}
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.start
+
+    def stage_durations(self) -> dict:
+        """Total seconds per span name, in order of first appearance."""
+        stages = {}
+        for span in self.spans:
+            if span.duration is not None:
+                stages[span.name] = stages.get(span.name, 0.0) + span.duration
+        return stages
+
+    def server_timing(self) -> str:
+        """Render the stage breakdown as a Server-Timing header value."""
+        metrics = [f"{_token(name)};dur={seconds * 1000:.1f}" for name, seconds in self.stage_durations().items()]
+        metrics.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(metrics)
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def _is_trace_id(value: Optional[str]) -> bool:
+    # 32 lowercase hex digits, not all zero
+    return value is not None and len(value) == 32 and all(c in "0123456789abcdef" for c in value) and value != "0" * 32
+
+
+def _token(name: str) -> str:
+    # Server-Timing metric names are HTTP tokens
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a stage of the current request. Outside of a traced request this is
+    a no-op, so library code can be instrumented unconditionally.
+    """
+    trace = current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = current_span.get()
+    record = Span(name, parent.span_id if parent else None, attributes)
+    trace.spans.append(record)
+    token = current_span.set(record)
+    try:
+        yield record
+    except BaseException as e:
+        record.error = type(e).__name__
+        raise
+    finally:
+        record.duration = time.perf_counter() - record.start
+        current_span.reset(token)
+
+
+def set_attribute(key: str, value) -> None:
+    """Attach a request-level attribute (provider, model, payload size, ...) to the current trace."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.attributes[key] = value
+
+
+def get_current_trace() -> Optional[Trace]:
+    return current_trace.get()
+
+
+# ------------------------- OTLP/JSON EXPORT -------------------------
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def to_otlp(trace: Trace, service_name: str = "image-gen-api") -> dict:
+    """Convert a finished trace to an OTLP/JSON ExportTraceServiceRequest."""
+    root_id = uuid.uuid4().hex[:16]
+    end_ns = trace.start_ns + int((trace.duration or 0.0) * 1e9)
+    spans = [{
+        "traceId": trace.trace_id,
+        "spanId": root_id,
+        "name": trace.name,
+        "kind": 2,  # SPAN_KIND_SERVER
+        "startTimeUnixNano": str(trace.start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": _otlp_attributes(trace.attributes),
+        "status": {},
+    }]
+    for record in trace.spans:
+        span_end = record.start_ns + int((record.duration or 0.0) * 1e9)
+        spans.append({
+            "traceId": trace.trace_id,
+            "spanId": record.span_id,
+            "parentSpanId": record.parent_id or root_id,
+            "name": record.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(record.start_ns),
+            "endTimeUnixNano": str(span_end),
+            "attributes": _otlp_attributes(record.attributes),
+            "status": {"code": 2, "message": record.error} if record.error else {},
+        })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": service_name, "process.pid": os.getpid()})},
+            "scopeSpans": [{"scope": {"name": "backend.utils.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class TraceFileExporter:
+    """
+    Appends one OTLP/JSON line per trace to a file from a background thread
+    (the same layout as the OpenTelemetry collector's file exporter).
+    """
+
+    def __init__(self, path: str, max_queue: int = 1000):
+        self.path = path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(to_otlp(trace), separators=(",", ":")) + "\n")
+            except OSError as e:
+                app_logger.warning(f"FAILED TO EXPORT TRACE: {str(e)}")
+
+
+trace_exporter = TraceFileExporter(TRACE_EXPORT_FILE) if TRACE_EXPORT_FILE else None
@@ -0,0 +1,88 @@
+import os
+import json
+import queue
+import random
+import threading
+from typing import Optional
+from backend.config.settings import TRAFFIC_CAPTURE_DIR, TRAFFIC_CAPTURE_SAMPLE_RATE
+from backend.utils.logger import app_logger
+
+# Only these trace attributes are captured; prompts, identifiers, client IPs
+# and user agents never leave the process.
+CAPTURED_ATTRIBUTES = ("model", "prompt_length", "upload_size", "upscale_factor", "upscale_provider")
+SKIPPED_PREFIXES = ("/admin", "/metrics")
+
+
+class TrafficRecorder:
+    """
+    Writes one compact, privacy-scrubbed JSON line per request (arrival
+    time, endpoint, shape attributes, sizes, status and stage latencies) to
+    ``capture_<pid>.jsonl`` from a background thread. Replay merges the
+    files of all workers by arrival time.
+    """
+
+    def __init__(self, directory: str, sample_rate: float = 1.0, max_queue: int = 10000):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.max_queue = max_queue
+        self.dropped = 0
+        self.path = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> None:
+        # Started lazily (once per process) so that forked workers get their own file and thread
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, f"capture_{os.getpid()}.jsonl")
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            threading.Thread(target=self._run, args=(self._queue, self.path), name="traffic-recorder", daemon=True).start()
+            self._pid = os.getpid()
+
+    def record(self, arrival: float, method: str, route: str, status_code: int, duration: float,
+               request_bytes: Optional[int], response_bytes: int, trace=None) -> None:
+        if route == "unmatched" or route.startswith(SKIPPED_PREFIXES):
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+
+        entry = {
+            "t": round(arrival, 4),
+            "endpoint": f"{method} {route}",
+            "status": status_code,
+            "duration": round(duration, 4),
+            "request_bytes": request_bytes,
+            "response_bytes": response_bytes,
+        }
+        if trace is not None:
+            attributes = {key: trace.attributes[key] for key in CAPTURED_ATTRIBUTES if trace.attributes.get(key) is not None}
+            if attributes:
+                entry["attributes"] = attributes
+            stages = trace.stage_durations()
+            if stages:
+                entry["stages"] = {name: round(seconds, 4) for name, seconds in stages.items()}
+        if self._pid != os.getpid():
+            self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self, entries_queue: queue.Queue, path: str) -> None:
+        while True:
+            entries = [entries_queue.get()]
+            while len(entries) < 500:
+                try:
+                    entries.append(entries_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries))
+            except OSError as e:
+                app_logger.warning(f"FAILED TO WRITE TRAFFIC CAPTURE: {str(e)}")
+
+
+traffic_recorder = TrafficRecorder(TRAFFIC_CAPTURE_DIR, TRAFFIC_CAPTURE_SAMPLE_RATE) if TRAFFIC_CAPTURE_DIR else None
@@ -0,0 +1,89 @@
+"""
+Per-call overhead of ``AppLogger`` compared with the previous eager implementation.
+
+Scenarios:
+  * disabled   - debug() while the logger is at INFO (the call should be nearly free)
+  * enqueued   - info() that reaches a handler which does not format (e.g. a queue)
+  * formatted  - info() formatted and written to an in-memory stream
+  * sampled    - debug() in a hot loop with max_per_second=1
+
+Usage:
+    python -m benchmarks.bench_logger [--calls 200000]
+"""
+import argparse
+import io
+import json
+import logging
+import timeit
+from typing import Optional
+
+from backend.utils.logger import AppLogger
+
+
+class LegacyAppLogger:
+    """The previous implementation: f-strings and json.dumps before the level check."""
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(name)
+
+    def info(self, message: str, extra: Optional[dict] = None):
+        if extra:
+            message = f"{message} | Extra: {json.dumps(extra)}"
+        self.logger.info(message)
+
+    def debug(self, message: str, extra: Optional[dict] = None):
+        if extra:
+            message = f"{message} | Extra: {json.dumps(extra)}"
+        self.logger.debug(message)
+
+
+EXTRA = {"prompt": "A sunset over the sea", "model": "gemini", "has_file": True, "filename": "reference.png"}
+
+
+def configure(name: str, handler: logging.Handler, level: int) -> None:
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+
+def per_call_ns(fn, calls: int) -> float:
+    best = min(timeit.repeat(fn, number=calls, repeat=5))
+    return best / calls * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    legacy = LegacyAppLogger("bench.legacy")
+    current = AppLogger("bench.current")
+    stream_handler = logging.StreamHandler(io.StringIO())
+
+    scenarios = [
+        ("disabled", logging.NullHandler(), logging.INFO,
+         lambda: legacy.debug("GENERATE IMAGE ENDPOINT ACCESSED", extra=EXTRA),
+         lambda: current.debug("GENERATE IMAGE ENDPOINT ACCESSED", extra=EXTRA)),
+        ("enqueued", logging.NullHandler(), logging.DEBUG,
+         lambda: legacy.info("GENERATE IMAGE ENDPOINT ACCESSED", extra=EXTRA),
+         lambda: current.info("GENERATE IMAGE ENDPOINT ACCESSED", extra=EXTRA)),
+        ("formatted", stream_handler, logging.DEBUG,
+         lambda: legacy.info("GENERATE IMAGE ENDPOINT ACCESSED", extra=EXTRA),
+         lambda: current.info("GENERATE IMAGE ENDPOINT ACCESSED", extra=EXTRA)),
+        ("sampled", logging.NullHandler(), logging.DEBUG,
+         lambda: legacy.debug("DRIVE DOWNLOAD PROGRESS", extra={"progress": 0.5}),
+         lambda: current.debug("DRIVE DOWNLOAD PROGRESS", extra={"progress": 0.5}, max_per_second=1)),
+    ]
+
+    print(f"{'scenario':<12} {'legacy ns/call':>16} {'current ns/call':>16} {'ratio':>8}")
+    for name, handler, level, legacy_call, current_call in scenarios:
+        configure("bench.legacy", handler, level)
+        configure("bench.current", handler, level)
+        before = per_call_ns(legacy_call, args.calls)
+        after = per_call_ns(current_call, args.calls)
+        print(f"{name:<12} {before:16.0f} {after:16.0f} {before / after:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
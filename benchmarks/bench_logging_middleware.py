@@ -0,0 +1,103 @@
+"""
+Requests/sec on ``/`` with the legacy ``BaseHTTPMiddleware`` access logger
+versus the pure ASGI ``LoggingMiddleware``.
+
+The app is driven in-process through ``httpx.ASGITransport`` so that the
+numbers reflect middleware overhead rather than socket I/O. Log records are
+routed to a ``NullHandler`` for the same reason.
+
+Usage:
+    python -m benchmarks.bench_logging_middleware [--requests 5000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Callable
+
+import httpx
+from fastapi import FastAPI, Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from backend.middleware.logging_middleware import LoggingMiddleware, get_client_ip
+from backend.utils.logger import app_logger
+
+
+class LegacyLoggingMiddleware(BaseHTTPMiddleware):
+    """The previous BaseHTTPMiddleware implementation, kept here as the baseline."""
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        start_time = time.time()
+        method = request.method
+        url = str(request.url)
+        client_ip = get_client_ip(request.scope, request.headers)
+        user_agent = request.headers.get("user-agent", "")
+        app_logger.debug(f"Incoming request: {method} {url} from {client_ip}")
+        response = await call_next(request)
+        processing_time = time.time() - start_time
+        app_logger.log_request(
+            method=method,
+            url=url,
+            client_ip=client_ip,
+            user_agent=user_agent,
+            status_code=response.status_code,
+            processing_time=processing_time
+        )
+        return response
+
+
+def build_app(middleware_class) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware_class)
+
+    @app.get("/")
+    async def root():
+        return {"message": "Image Generation API is running"}
+
+    return app
+
+
+async def run(app: FastAPI, total: int, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm up
+        for _ in range(50):
+            await client.get("/")
+
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                response = await client.get("/")
+                assert response.status_code == 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    for name in ("image_gen_api", "image_gen_api.access"):
+        logger = logging.getLogger(name)
+        logger.handlers = [logging.NullHandler()]
+        logger.propagate = False
+
+    results = {}
+    for label, middleware in (("before (BaseHTTPMiddleware)", LegacyLoggingMiddleware), ("after (pure ASGI)", LoggingMiddleware)):
+        app = build_app(middleware)
+        best = max(asyncio.run(run(app, args.requests, args.concurrency)) for _ in range(args.rounds))
+        results[label] = best
+        print(f"{label:<30} {best:10.0f} req/s")
+
+    before, after = results.values()
+    print(f"{'speedup':<30} {after / before:10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Peak memory per request on the image data path, against stub providers.
+
+Every endpoint that moves image bytes is driven in-process with 1/5/10 MB
+(incompressible) PNGs, one request at a time and then ``--concurrency``
+requests at once. For each run the benchmark reports:
+
+  * traced  - peak ``tracemalloc`` allocations above the pre-request baseline
+              (Python-level copies: request body, UploadFile spool reads,
+              ``bytes`` returned by storage, base64 decoding, ...)
+  * rss     - peak RSS above the pre-request RSS, read from /proc after
+              resetting the high-water mark. This also sees memory that
+              tracemalloc cannot, such as PIL's decoded pixel buffers.
+
+Both are also reported as a ratio to the payload size (image size x
+concurrency), which is what the budget file constrains. The run exits with
+status 1 when any ratio exceeds its budget by more than the tolerance, so it
+can gate CI; ``--update-budget`` rewrites the budget from the current run.
+
+Provider responses are prebuilt before measuring, so the numbers cover the
+copies the app makes, not the stubs. The request body is fed to the ASGI app
+in 64 KB chunks like a server would.
+
+Usage:
+    python -m benchmarks.bench_memory [--sizes 1,5,10] [--concurrency 4] [--update-budget]
+"""
+import os
+
+# Must be set before the app (and the provider clients it builds) is imported
+os.environ.setdefault("STORAGE_TYPE", "local")
+os.environ.setdefault("GEMINI_API_KEY", "bench")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import argparse
+import asyncio
+import base64
+import gc
+import json
+import logging
+import sys
+import tempfile
+import tracemalloc
+import uuid
+from contextlib import ExitStack
+from io import BytesIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+from PIL import Image
+
+from app import app
+from backend.config.settings import PICSART_UPSCALE_URL
+from backend.services.generation_service.service_factory import get_service
+from backend.services.storage.storage_factory import get_storage_service
+from backend.services.storage.variants import variant_builder
+
+MB = 1024 * 1024
+RECEIVE_CHUNK = 64 * 1024
+DEFAULT_BUDGET = os.path.join(os.path.dirname(__file__), "memory_budget.json")
+
+
+# ------------------------- PAYLOADS -------------------------
+
+def make_png(size: int) -> bytes:
+    """A noise PNG of roughly ``size`` bytes (noise does not compress)."""
+    side = max(int((size / 3) ** 0.5), 1)
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def multipart(fields: dict, files: dict = None) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in (files or {}).items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: image/png\r\n\r\n'.encode()
+        )
+        parts.append(content)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+# ------------------------- STUB PROVIDERS -------------------------
+
+class StubGeminiModels:
+    def __init__(self, result: bytes):
+        self.result = result
+
+    def generate_content(self, model, contents, config=None):
+        # The SDK re-encodes PIL images, then base64-encodes image data into the JSON request body
+        for part in contents:
+            if isinstance(part, Image.Image):
+                buffer = BytesIO()
+                part.save(buffer, format=part.format or "PNG")
+                base64.b64encode(buffer.getvalue())
+            elif getattr(part, "inline_data", None) is not None:
+                base64.b64encode(part.inline_data.data)
+        inline = SimpleNamespace(data=self.result)
+        content = SimpleNamespace(parts=[SimpleNamespace(inline_data=inline)])
+        return SimpleNamespace(candidates=[SimpleNamespace(content=content)], text='{"description": "stub"}')
+
+
+class StubOpenAIImages:
+    def __init__(self, result: bytes):
+        self.b64_json = base64.b64encode(result).decode()
+
+    def generate(self, **kwargs):
+        return SimpleNamespace(data=[SimpleNamespace(b64_json=self.b64_json)])
+
+    edit = generate
+
+
+def stub_post_processing_transport(result: bytes) -> httpx.MockTransport:
+    """Answers Picsart and PhotoRoom on the shared HTTP client; request bodies (multipart) are still encoded."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        if str(request.url) == PICSART_UPSCALE_URL:
+            return httpx.Response(200, json={"data": {"url": "https://stub/result.png"}})
+        return httpx.Response(200, content=result)
+
+    return httpx.MockTransport(handler)
+
+
+# ------------------------- SCENARIOS -------------------------
+
+def build_scenarios(image: bytes) -> dict:
+    """name -> (path, body, content_type); result-side scenarios reuse a seeded result."""
+    result_identifier = get_storage_service().save_result(image, extension="png")
+    return {
+        "generate:gemini+reference": ("/generate", *multipart({"prompt": "A sunset", "model": "gemini"}, {"file": ("reference.png", image)})),
+        "generate:openai": ("/generate", *multipart({"prompt": "A sunset", "model": "openai"})),
+        "describe:gemini": ("/generate/generate_image_description", *multipart({"file_identifier": result_identifier})),
+        "download:photoroom": ("/download", *multipart({"file_identifier": result_identifier})),
+        "upscale:picsart": ("/upscale", *multipart({"image_identifier": result_identifier, "upscale_factor": "2"})),
+    }
+
+
+def install_stubs(stack: ExitStack, result: bytes) -> None:
+    stack.enter_context(patch.object(get_service("gemini"), "client", SimpleNamespace(models=StubGeminiModels(result))))
+    stack.enter_context(patch.object(get_service("openai"), "client", SimpleNamespace(images=StubOpenAIImages(result))))
+    stack.enter_context(patch("backend.utils.http_client.create_transport", lambda: stub_post_processing_transport(result)))
+    stack.enter_context(patch("backend.services.upscale.upscale_service.PICSART_API_KEY", "bench"))
+    stack.enter_context(patch("backend.services.bg_rem.photoroom_service.PHOTOTOOM_API_KEY", "bench"))
+    # Result variants and thumbnails are built on a background thread, not per request; left running
+    # they would be charged to whichever scenario happens to overlap them
+    stack.enter_context(patch.object(variant_builder, "submit"))
+
+
+# ------------------------- ASGI DRIVER -------------------------
+
+async def call(path: str, body: bytes, content_type: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http",
+        "method": "POST", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"content-type", content_type.encode()), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    view = memoryview(body)
+    offset = 0
+    status = 0
+
+    async def receive():
+        nonlocal offset
+        chunk = bytes(view[offset:offset + RECEIVE_CHUNK])
+        offset += RECEIVE_CHUNK
+        return {"type": "http.request", "body": chunk, "more_body": offset < len(body)}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def run_concurrently(request: tuple, concurrency: int) -> list:
+    return await asyncio.gather(*(call(*request) for _ in range(concurrency)))
+
+
+# ------------------------- MEASUREMENT -------------------------
+
+def read_status_kb(field: str) -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    raise KeyError(field)
+
+
+def reset_peak_rss() -> bool:
+    """Reset VmHWM to the current RSS (Linux >= 4.0); False when unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        read_status_kb("VmHWM")
+        return True
+    except (OSError, KeyError):
+        return False
+
+
+def measure(request: tuple, concurrency: int) -> dict:
+    gc.collect()
+    base_traced = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    rss_supported = reset_peak_rss()
+    base_rss = read_status_kb("VmRSS") if rss_supported else 0
+
+    statuses = asyncio.run(run_concurrently(request, concurrency))
+
+    traced = tracemalloc.get_traced_memory()[1] - base_traced
+    rss = read_status_kb("VmHWM") - base_rss if rss_supported else None
+    if any(status != 200 for status in statuses):
+        raise RuntimeError(f"{request[0]} returned {statuses}")
+    return {"traced": traced, "rss": rss}
+
+
+# ------------------------- BUDGET -------------------------
+
+def check_budget(results: list, budget: dict) -> list:
+    tolerance = budget.get("tolerance", 0.1)
+    failures = []
+    for result in results:
+        limits = budget["scenarios"].get(result["scenario"], {})
+        for metric in ("traced", "rss"):
+            limit = limits.get(f"{metric}_ratio")
+            ratio = result[f"{metric}_ratio"]
+            if limit is not None and ratio is not None and ratio > limit * (1 + tolerance):
+                failures.append(
+                    f"{result['scenario']} {result['size_mb']}MB x{result['concurrency']}: "
+                    f"{metric} {ratio:.2f}x payload > budget {limit:.2f}x (+{tolerance:.0%})"
+                )
+    return failures
+
+
+def budget_from(results: list, tolerance: float) -> dict:
+    scenarios = {}
+    for result in results:
+        limits = scenarios.setdefault(result["scenario"], {})
+        for metric in ("traced", "rss"):
+            ratio = result[f"{metric}_ratio"]
+            if ratio is None:
+                continue
+            if metric == "rss":
+                # RSS only grows when the allocator cannot reuse freed pages, so a
+                # low reading is luck; never budget below the traced peak
+                ratio = max(ratio, result["traced_ratio"])
+            limits[f"{metric}_ratio"] = max(limits.get(f"{metric}_ratio", 0.0), round(ratio + 0.05, 1))
+    return {"tolerance": tolerance, "scenarios": scenarios}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,5,10", help="image sizes in MB, comma separated")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--scenarios", default=None, help="comma separated subset of scenarios")
+    parser.add_argument("--budget", default=DEFAULT_BUDGET)
+    parser.add_argument("--update-budget", action="store_true", help="write the measured ratios as the new budget")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="tolerance written by --update-budget")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args()
+
+    for name in ("image_gen_api", "image_gen_api.access", "httpx"):
+        logger = logging.getLogger(name)
+        logger.handlers = [logging.NullHandler()]
+        logger.propagate = False
+
+    sizes = [float(size) for size in args.sizes.split(",")]
+    results = []
+    with tempfile.TemporaryDirectory() as upload_dir, tempfile.TemporaryDirectory() as result_dir, ExitStack() as stack:
+        stack.enter_context(patch("backend.services.storage.local_storage.UPLOAD_DIR", upload_dir))
+        stack.enter_context(patch("backend.services.storage.local_storage.RESULT_DIR", result_dir))
+        tracemalloc.start()
+
+        print(f"{'scenario':<28} {'size':>6} {'conc':>5} {'traced MB':>10} {'ratio':>7} {'rss MB':>9} {'ratio':>7}")
+        for size_mb in sizes:
+            image = make_png(int(size_mb * MB))
+            payload_mb = len(image) / MB
+            with ExitStack() as stubs:
+                install_stubs(stubs, image)
+                scenarios = build_scenarios(image)
+                selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+                for name in selected:
+                    request = scenarios[name]
+                    measure(request, 1)  # warm up imports and caches
+                    for concurrency in sorted({1, args.concurrency}):
+                        measured = measure(request, concurrency)
+                        payload = len(image) * concurrency
+                        result = {
+                            "scenario": name,
+                            "size_mb": size_mb,
+                            "payload_mb": round(payload_mb, 2),
+                            "concurrency": concurrency,
+                            "traced_bytes": measured["traced"],
+                            "rss_bytes": measured["rss"],
+                            "traced_ratio": round(measured["traced"] / payload, 2),
+                            "rss_ratio": round(max(measured["rss"], 0) / payload, 2) if measured["rss"] is not None else None,
+                        }
+                        results.append(result)
+                        rss_mb = f"{measured['rss'] / MB:9.1f}" if measured["rss"] is not None else f"{'n/a':>9}"
+                        rss_ratio = f"{result['rss_ratio']:6.2f}x" if result["rss_ratio"] is not None else f"{'n/a':>7}"
+                        print(f"{name:<28} {size_mb:5.0f}M {concurrency:5d} {measured['traced'] / MB:10.1f} "
+                              f"{result['traced_ratio']:6.2f}x {rss_mb} {rss_ratio}")
+        tracemalloc.stop()
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_budget:
+        with open(args.budget, "w") as f:
+            json.dump(budget_from(results, args.tolerance), f, indent=2)
+            f.write("\n")
+        print(f"\nBudget written to {args.budget}")
+        return
+
+    if not os.path.exists(args.budget):
+        print(f"\nNo budget file at {args.budget}; run with --update-budget to create one")
+        return
+
+    with open(args.budget) as f:
+        failures = check_budget(results, json.load(f))
+    if failures:
+        print("\nMEMORY BUDGET EXCEEDED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll scenarios within budget")
+
+
+if __name__ == "__main__":
+    main()
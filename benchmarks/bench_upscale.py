@@ -0,0 +1,90 @@
+"""
+Throughput of the local upscale provider in output megapixels per second.
+
+For every input size and factor the strip-tiled, process-pool path of
+``LocalUpscaleService`` is timed against the same resampling and sharpening
+done in one piece in this process (``single``), which is what the tiling
+has to beat. Decoding, encoding and storage are left out; they are the same
+for both and are not what the pool parallelises.
+
+Output megapixels are counted, since that is what the work scales with.
+
+Usage:
+    python -m benchmarks.bench_upscale [--sizes 1,4,12] [--factors 2,4] [--workers 1,4] [--rounds 3]
+"""
+import os
+
+# The benchmark never stores anything
+os.environ.setdefault("STORAGE_TYPE", "local")
+
+import argparse
+import asyncio
+import json
+import time
+
+from PIL import Image
+
+from backend.services.upscale.local_upscale_service import LocalUpscaleService
+from backend.utils.image_pool import image_pool, shared_segment
+from backend.utils.resample import upscale_strip
+
+
+def make_image(megapixels: float) -> Image.Image:
+    """A noise image of about ``megapixels`` with a 4:3 aspect ratio."""
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    return Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+
+
+def time_single(image: Image.Image, factor: int) -> float:
+    start = time.perf_counter()
+    upscale_strip(image.mode, image.size, image.tobytes(), factor, 0, 0)
+    return time.perf_counter() - start
+
+
+def time_pool(image: Image.Image, factor: int, workers: int) -> float:
+    if image_pool.workers != workers:
+        image_pool.shutdown()
+        image_pool.workers = workers
+    # Start the worker processes outside the timing
+    image_pool.run_sync(int)
+
+    service = LocalUpscaleService(storage_service=None)
+    pixels = image.tobytes()
+    with shared_segment(len(pixels) * factor * factor) as output:
+        start = time.perf_counter()
+        asyncio.run(service._upscale(image.mode, image.size, pixels, factor, output.name))
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,4,12", help="input sizes in megapixels")
+    parser.add_argument("--factors", default="2,4")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="pool sizes to compare")
+    parser.add_argument("--rounds", type=int, default=3, help="best of N")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'input':>8} {'factor':>6} {'path':>10} {'seconds':>9} {'MP/s':>8}")
+    for size in [float(s) for s in args.sizes.split(",")]:
+        image = make_image(size)
+        for factor in [int(f) for f in args.factors.split(",")]:
+            output_mp = image.width * image.height * factor * factor / 1_000_000
+            runs = [("single", lambda: time_single(image, factor))]
+            for workers in sorted({int(w) for w in args.workers.split(",")}):
+                runs.append((f"pool x{workers}", lambda workers=workers: time_pool(image, factor, workers)))
+            for label, run in runs:
+                seconds = min(run() for _ in range(args.rounds))
+                results.append({"input_mp": size, "factor": factor, "path": label, "seconds": round(seconds, 3),
+                                "output_mp_per_s": round(output_mp / seconds, 2)})
+                print(f"{size:>7g}M {factor:>6} {label:>10} {seconds:>9.3f} {output_mp / seconds:>8.1f}")
+    image_pool.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Re-drive captured production traffic against a build with stubbed providers.
+
+Input is one or more capture files (or directories of ``capture_*.jsonl``)
+written by the app when ``TRAFFIC_CAPTURE_DIR`` is set. Files of all
+workers are merged by arrival time, and each request is sent at its
+original offset divided by ``--speed``, so the real inter-arrival pattern
+(bursts, lulls, endpoint mix) is preserved at 1x or compressed at Nx.
+
+Captures hold no prompts or identifiers, so requests are rebuilt from their
+shape: prompts of the captured length, reference images of the captured
+upload size, the captured model and upscale factor, and a seeded result for
+the endpoints that take an identifier. Endpoints that cannot be rebuilt are
+counted as skipped.
+
+Without ``--target`` the stub providers and the app are started exactly as
+in ``benchmarks.loadtest.run``; with it, any running build is used (e.g. one
+started with ``SIM_MODE=1``). The report compares captured and replayed
+latency and error rates per endpoint.
+
+Usage:
+    python -m benchmarks.loadtest.replay captures/ [--speed 4] [--target http://127.0.0.1:8000]
+        [--config benchmarks/loadtest/default.json] [--limit 1000] [--output replay_results.json]
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.loadtest.run import git_commit, percentile, running_stack, seed_result
+from benchmarks.loadtest.stub_providers import DEFAULT_CONFIG, make_png
+
+UPLOAD_SIZE_BUCKET = 16 * 1024
+
+
+def load_capture(paths: List[str]) -> List[dict]:
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "capture_*.jsonl"))) if os.path.isdir(path) else [path])
+    entries = []
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            entries.extend(json.loads(line) for line in f if line.strip())
+    return sorted(entries, key=lambda entry: entry["t"])
+
+
+@lru_cache(maxsize=64)
+def reference_image(size: int) -> bytes:
+    return make_png(size)
+
+
+def build_request(entry: dict, result_identifier: str) -> Optional[dict]:
+    """kwargs for ``httpx.AsyncClient.request`` reproducing the captured request's shape."""
+    attributes = entry.get("attributes", {})
+    endpoint = entry["endpoint"]
+    if endpoint == "GET /":
+        return {"method": "GET", "url": "/"}
+    if endpoint == "POST /generate":
+        request = {
+            "method": "POST", "url": "/generate",
+            "data": {"prompt": "x" * max(attributes.get("prompt_length", 1), 1), "model": attributes.get("model", "gemini")},
+        }
+        if attributes.get("upload_size"):
+            # Bucketed so that a long capture does not encode thousands of distinct images
+            size = max(round(attributes["upload_size"] / UPLOAD_SIZE_BUCKET), 1) * UPLOAD_SIZE_BUCKET
+            request["files"] = {"file": ("reference.png", reference_image(size), "image/png")}
+        return request
+    if endpoint == "POST /generate/generate_image_description":
+        return {"method": "POST", "url": "/generate/generate_image_description", "data": {"file_identifier": result_identifier}}
+    if endpoint == "POST /download":
+        return {"method": "POST", "url": "/download", "data": {"file_identifier": result_identifier}}
+    if endpoint == "POST /upscale":
+        data = {"image_identifier": result_identifier, "upscale_factor": str(attributes.get("upscale_factor", 2))}
+        if attributes.get("upscale_provider"):
+            data["provider"] = attributes["upscale_provider"]
+        return {"method": "POST", "url": "/upscale", "data": data}
+    return None
+
+
+async def replay(base_url: str, entries: List[dict], speed: float, result_identifier: str, max_in_flight: int) -> Dict[str, list]:
+    """Send every entry on its (scaled) original schedule; returns endpoint -> [(latency, status)]."""
+    loop = asyncio.get_running_loop()
+    outcomes: Dict[str, list] = defaultdict(list)
+    tasks = set()
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        async def send(endpoint: str, request: dict, scheduled: float):
+            try:
+                response = await client.request(**request)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            outcomes[endpoint].append((loop.time() - scheduled, status))
+
+        start = loop.time()
+        origin = entries[0]["t"]
+        for entry in entries:
+            request = build_request(entry, result_identifier)
+            if request is None:
+                outcomes[entry["endpoint"]].append((None, "skipped"))
+                continue
+            scheduled = start + (entry["t"] - origin) / speed
+            await asyncio.sleep(max(scheduled - loop.time(), 0))
+            if len(tasks) >= max_in_flight:
+                outcomes[entry["endpoint"]].append((None, "dropped"))
+                continue
+            task = asyncio.ensure_future(send(entry["endpoint"], request, scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+    return outcomes
+
+
+def latency_summary(latencies: List[float], statuses: List[str]) -> dict:
+    latencies = sorted(latencies)
+    sent = [status for status in statuses if status not in ("skipped",)]
+    errors = sum(1 for status in sent if not (status.isdigit() and int(status) < 400))
+    return {
+        "count": len(sent),
+        "error_rate": round(errors / len(sent), 4) if sent else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p90": percentile(latencies, 0.90),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+def compare(entries: List[dict], outcomes: Dict[str, list]) -> dict:
+    captured = defaultdict(list)
+    for entry in entries:
+        captured[entry["endpoint"]].append(entry)
+
+    report = {}
+    for endpoint, endpoint_entries in captured.items():
+        replayed = outcomes.get(endpoint, [])
+        report[endpoint] = {
+            "captured": latency_summary([e["duration"] for e in endpoint_entries], [str(e["status"]) for e in endpoint_entries]),
+            "replayed": latency_summary([latency for latency, _ in replayed if latency is not None], [status for _, status in replayed]),
+            "skipped": sum(1 for _, status in replayed if status == "skipped"),
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", nargs="+", help="capture files or directories")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay N times faster than captured")
+    parser.add_argument("--target", default=None, help="URL of a running build (default: start stubs and the app)")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="stub provider config when starting the app")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL for the app under test")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N captured requests")
+    parser.add_argument("--max-in-flight", type=int, default=500)
+    parser.add_argument("--output", default="replay_results.json")
+    args = parser.parse_args()
+
+    entries = load_capture(args.capture)[:args.limit]
+    if not entries:
+        parser.error("The capture is empty")
+    span = entries[-1]["t"] - entries[0]["t"]
+    print(f"Replaying {len(entries)} requests captured over {span:.1f}s at {args.speed}x "
+          f"({span / args.speed:.1f}s)")
+
+    stack = nullcontext((args.target, None)) if args.target else running_stack(args.config, args.workers, args.seed, args.log_level)
+    with stack as (base_url, _):
+        result_identifier = seed_result(base_url)
+        outcomes = asyncio.run(replay(base_url, entries, args.speed, result_identifier, args.max_in_flight))
+
+    endpoints = compare(entries, outcomes)
+    for endpoint, result in endpoints.items():
+        captured, replayed = result["captured"], result["replayed"]
+        print(f"{endpoint:<45} n={captured['count']:<6} p50 {captured['p50']} -> {replayed['p50']}  "
+              f"p99 {captured['p99']} -> {replayed['p99']}  errors {captured['error_rate']:.1%} -> {replayed['error_rate']:.1%}")
+
+    gaps = [b["t"] - a["t"] for a, b in zip(entries, entries[1:])]
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "target": args.target,
+        "speed": args.speed,
+        "requests": len(entries),
+        "captured_span": round(span, 3),
+        "mean_inter_arrival": round(sum(gaps) / len(gaps), 4) if gaps else None,
+        "endpoints": endpoints,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""
+Open-loop load test of the API against the local stub providers.
+
+Starts ``stub_providers`` and the app (gunicorn with ``gunicorn.conf.py``,
+Drive storage pointed at the stub) on free local ports, seeds one generated
+result for the result-side endpoints, then drives each endpoint in turn with
+Poisson arrivals at its configured rate for ``duration`` seconds.
+
+Load is open-loop: requests are sent on schedule whether or not earlier ones
+have finished, and latency is measured from the scheduled send time, so a
+stalled server shows up as latency instead of silently lowering the offered
+load. ``max_in_flight`` bounds client-side concurrency; arrivals beyond it
+are counted as ``dropped``.
+
+Results (throughput, p50/p90/p99, error rate, status counts per endpoint,
+plus the commit and the full config) are written as JSON for diffing across
+commits.
+
+Usage:
+    python -m benchmarks.loadtest.run [--config benchmarks/loadtest/default.json]
+        [--endpoints generate:gemini,upscale:picsart] [--duration 30] [--rate-scale 1.0]
+        [--workers 2] [--output loadtest_results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.loadtest.stub_providers import DEFAULT_CONFIG, load_config, make_png
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# ------------------------- PROCESSES -------------------------
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with {process.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def stop(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+@contextmanager
+def running_stack(config_path: str, workers: int, seed: int, log_level: str) -> Iterator[Tuple[str, str]]:
+    """Start the stub providers and the app wired to them; yields (app URL, stub URL)."""
+    stub_port, app_port = free_port(), free_port()
+    stub_url, base_url = f"http://127.0.0.1:{stub_port}", f"http://127.0.0.1:{app_port}"
+
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.loadtest.stub_providers", "--port", str(stub_port),
+         "--config", config_path, "--seed", str(seed)],
+        cwd=PROJECT_ROOT,
+    )
+    server = None
+    try:
+        wait_ready(f"{stub_url}/_stats", stub)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "app:app", "-c", "gunicorn.conf.py",
+             "--workers", str(workers), "--bind", f"127.0.0.1:{app_port}"],
+            cwd=PROJECT_ROOT, env=app_environment(stub_url, log_level),
+        )
+        wait_ready(f"{base_url}/", server)
+        yield base_url, stub_url
+    finally:
+        if server is not None:
+            stop(server)
+        stop(stub)
+
+
+def app_environment(stub_url: str, log_level: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "STORAGE_TYPE": "gcp",
+        "GOOGLE_DRIVE_APP_FOLDER_ID": "stub-root",
+        "GOOGLE_DRIVE_API_ENDPOINT": f"{stub_url}/",
+        "GEMINI_BASE_URL": stub_url,
+        "GEMINI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"{stub_url}/v1",
+        "OPENAI_API_KEY": "stub",
+        "PICSART_UPSCALE_URL": f"{stub_url}/picsart/upscale",
+        "PICSART_API_KEY": "stub",
+        "PHOTOROOM_SEGMENT_URL": f"{stub_url}/photoroom/v1/segment",
+        "PHOTOTOOM_API_KEY": "stub",
+        "LOG_LEVEL": log_level,
+        "METRICS_MULTIPROC_DIR": tempfile.mkdtemp(prefix="loadtest_metrics_"),
+    })
+    return env
+
+
+# ------------------------- REQUESTS -------------------------
+
+RequestFactory = Callable[[], dict]
+
+
+def build_requests(reference: bytes, result_identifier: str) -> Dict[str, RequestFactory]:
+    """Endpoint name -> kwargs for ``httpx.AsyncClient.request``."""
+    return {
+        "root": lambda: {"method": "GET", "url": "/"},
+        "generate:gemini": lambda: {"method": "POST", "url": "/generate", "data": {"prompt": "A sunset", "model": "gemini"}},
+        "generate:gemini+reference": lambda: {
+            "method": "POST", "url": "/generate", "data": {"prompt": "A sunset", "model": "gemini"},
+            "files": {"file": ("reference.png", reference, "image/png")},
+        },
+        "generate:openai": lambda: {"method": "POST", "url": "/generate", "data": {"prompt": "A sunset", "model": "openai"}},
+        "describe:gemini": lambda: {"method": "POST", "url": "/generate/generate_image_description", "data": {"file_identifier": result_identifier}},
+        "download:photoroom": lambda: {"method": "POST", "url": "/download", "data": {"file_identifier": result_identifier}},
+        "upscale:picsart": lambda: {"method": "POST", "url": "/upscale", "data": {"image_identifier": result_identifier, "upscale_factor": "2", "provider": "picsart"}},
+        "upscale:local": lambda: {"method": "POST", "url": "/upscale", "data": {"image_identifier": result_identifier, "upscale_factor": "2", "provider": "local"}},
+    }
+
+
+def seed_result(base_url: str) -> str:
+    response = httpx.post(f"{base_url}/generate", data={"prompt": "seed", "model": "gemini"}, timeout=120)
+    response.raise_for_status()
+    return response.json()["result_identifier"]
+
+
+# ------------------------- LOAD -------------------------
+
+async def open_loop(client: httpx.AsyncClient, factory: RequestFactory, rate: float, duration: float,
+                    max_in_flight: int, rng: random.Random) -> dict:
+    loop = asyncio.get_running_loop()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    tasks = set()
+    dropped = 0
+
+    async def send(scheduled: float):
+        try:
+            response = await client.request(**factory())
+            outcome = str(response.status_code)
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        latencies.append(loop.time() - scheduled)
+        statuses[outcome] = statuses.get(outcome, 0) + 1
+
+    start = loop.time()
+    next_arrival = start
+    while True:
+        next_arrival += rng.expovariate(rate)
+        if next_arrival - start >= duration:
+            break
+        await asyncio.sleep(max(next_arrival - loop.time(), 0))
+        if len(tasks) >= max_in_flight:
+            dropped += 1
+            continue
+        task = asyncio.ensure_future(send(next_arrival))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    if tasks:
+        await asyncio.wait(tasks)
+    elapsed = loop.time() - start
+
+    return summarize(latencies, statuses, dropped, rate, duration, elapsed)
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return round(sorted_values[index], 4)
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], dropped: int, rate: float,
+              duration: float, elapsed: float) -> dict:
+    completed = len(latencies)
+    successes = sum(count for status, count in statuses.items() if status.isdigit() and int(status) < 400)
+    latencies = sorted(latencies)
+    return {
+        "offered_rate": rate,
+        "sent": completed,
+        "dropped": dropped,
+        "throughput_rps": round(successes / elapsed, 3) if elapsed else 0.0,
+        "error_rate": round((completed - successes + dropped) / (completed + dropped), 4) if completed + dropped else 0.0,
+        "latency": {
+            "mean": round(sum(latencies) / completed, 4) if completed else None,
+            "p50": percentile(latencies, 0.50),
+            "p90": percentile(latencies, 0.90),
+            "p99": percentile(latencies, 0.99),
+            "max": round(latencies[-1], 4) if latencies else None,
+        },
+        "status_counts": dict(sorted(statuses.items())),
+        "duration": duration,
+        "elapsed": round(elapsed, 3),
+    }
+
+
+async def run_endpoints(base_url: str, config: dict, requests: Dict[str, RequestFactory], names: List[str],
+                        duration: float, rate_scale: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=config["max_in_flight"], max_keepalive_connections=config["max_in_flight"])
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        for name in names:
+            rate = config["endpoints"][name]["rate"] * rate_scale
+            print(f"{name:<28} {rate:6.2f} req/s for {duration:.0f}s ...", end=" ", flush=True)
+            result = await open_loop(client, requests[name], rate, duration, config["max_in_flight"], rng)
+            results[name] = result
+            latency = result["latency"]
+            print(f"{result['throughput_rps']:7.2f} ok/s  p50 {latency['p50']}s  p99 {latency['p99']}s  "
+                  f"errors {result['error_rate']:.1%}")
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default=DEFAULT_CONFIG)
+    parser.add_argument("--endpoints", default=None, help="comma separated subset of the configured endpoints")
+    parser.add_argument("--duration", type=float, default=None, help="seconds per endpoint (overrides the config)")
+    parser.add_argument("--rate-scale", type=float, default=1.0, help="multiply every configured rate")
+    parser.add_argument("--workers", type=int, default=None, help="gunicorn workers (overrides the config)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL for the app under test")
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    duration = args.duration or config.get("duration", 30)
+    workers = args.workers or config.get("workers", 2)
+    config.setdefault("max_in_flight", 500)
+    names = args.endpoints.split(",") if args.endpoints else list(config["endpoints"])
+    unknown = [name for name in names if name not in config["endpoints"]]
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(unknown)}")
+
+    with running_stack(args.config, workers, args.seed, args.log_level) as (base_url, stub_url):
+        requests = build_requests(make_png(int(config.get("reference_kb", 1024) * 1024)), seed_result(base_url))
+        results = asyncio.run(run_endpoints(base_url, config, requests, names, duration, args.rate_scale, args.seed))
+        provider_calls = httpx.get(f"{stub_url}/_stats").json()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "workers": workers,
+        "duration": duration,
+        "rate_scale": args.rate_scale,
+        "seed": args.seed,
+        "config": config,
+        "endpoints": results,
+        "provider_calls": provider_calls,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Local stand-ins for the external providers, served from one process.
+
+Routes mirror the real APIs closely enough for the production clients
+(google-genai, openai, requests, http.client, googleapiclient) to talk to
+them unmodified once the app is pointed here through its endpoint settings:
+
+    GEMINI_BASE_URL            http://host:port
+    OPENAI_BASE_URL            http://host:port/v1
+    PICSART_UPSCALE_URL        http://host:port/picsart/upscale
+    PHOTOROOM_SEGMENT_URL      http://host:port/photoroom/v1/segment
+    GOOGLE_DRIVE_API_ENDPOINT  http://host:port/
+
+Each provider has its own latency distribution, payload size and error rate
+(see ``default.json``). Latency is simulated with ``asyncio.sleep`` so one
+stub process can hold thousands of requests open.
+
+Usage:
+    python -m benchmarks.loadtest.stub_providers [--port 9100] [--config benchmarks/loadtest/default.json]
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import uuid
+from collections import OrderedDict
+from io import BytesIO
+from typing import Optional
+
+import uvicorn
+from PIL import Image
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from backend.utils.simulation import LatencyDistribution
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(__file__), "default.json")
+DRIVE_MAX_FILES = 1000
+
+
+def make_png(size: int) -> bytes:
+    """A noise PNG of roughly ``size`` bytes (noise does not compress)."""
+    side = max(int((size / 3) ** 0.5), 1)
+    image = Image.frombytes("RGB", (side, side), os.urandom(side * side * 3))
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+class StubProvider:
+    def __init__(self, name: str, spec: dict, rng: random.Random):
+        self.name = name
+        self.latency = LatencyDistribution(spec.get("latency"))
+        self.error_rate = spec.get("error_rate", 0.0)
+        self.error_status = spec.get("error_status", 500)
+        self.payload = make_png(int(spec.get("payload_kb", 0) * 1024)) if spec.get("payload_kb") else b""
+        self.payload_b64 = base64.b64encode(self.payload).decode() if self.payload else ""
+        self.rng = rng
+        self.calls = 0
+        self.errors = 0
+
+    async def respond(self, build) -> Response:
+        """Wait for a sampled latency, then fail with the configured probability or build the response."""
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample(self.rng))
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            return JSONResponse({"error": {"code": self.error_status, "message": f"stub {self.name} error"}}, status_code=self.error_status)
+        return build()
+
+
+def create_app(config: dict, seed: Optional[int] = None) -> Starlette:
+    rng = random.Random(seed)
+    specs = config.get("providers", {})
+    providers = {name: StubProvider(name, specs.get(name, {}), rng)
+                 for name in ("gemini", "openai", "picsart", "picsart_download", "photoroom", "drive")}
+    drive_files: "OrderedDict[str, bytes]" = OrderedDict()
+
+    # ------------------------- GEMINI -------------------------
+
+    async def gemini_generate_content(request: Request):
+        body = await request.json()
+        provider = providers["gemini"]
+        if "systemInstruction" in body or "system_instruction" in body:
+            part = {"text": '{"description": "stub description"}'}
+        else:
+            part = {"inlineData": {"mimeType": "image/png", "data": provider.payload_b64}}
+        return await provider.respond(lambda: JSONResponse({
+            "candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP"}],
+        }))
+
+    # ------------------------- OPENAI -------------------------
+
+    async def openai_images(request: Request):
+        await request.body()
+        provider = providers["openai"]
+        return await provider.respond(lambda: JSONResponse({"created": 0, "data": [{"b64_json": provider.payload_b64}]}))
+
+    # ------------------------- PICSART -------------------------
+
+    async def picsart_upscale(request: Request):
+        await request.body()
+        result_url = f"{str(request.base_url).rstrip('/')}/picsart/results/{uuid.uuid4().hex}.png"
+        return await providers["picsart"].respond(lambda: JSONResponse({
+            "status": "success", "data": {"id": uuid.uuid4().hex, "url": result_url},
+        }))
+
+    async def picsart_result(request: Request):
+        provider = providers["picsart_download"]
+        return await provider.respond(lambda: Response(provider.payload, media_type="image/png"))
+
+    # ------------------------- PHOTOROOM -------------------------
+
+    async def photoroom_segment(request: Request):
+        await request.body()
+        provider = providers["photoroom"]
+        return await provider.respond(lambda: Response(provider.payload, media_type="image/png"))
+
+    # ------------------------- GOOGLE DRIVE -------------------------
+
+    def store(content: bytes) -> str:
+        file_id = uuid.uuid4().hex
+        drive_files[file_id] = content
+        while len(drive_files) > DRIVE_MAX_FILES:
+            drive_files.popitem(last=False)
+        return file_id
+
+    async def drive_list_files(request: Request):
+        # Only used to look up the app's folders: pretend they always exist
+        query = request.query_params.get("q", "")
+        name = query.split("name='", 1)[1].split("'", 1)[0] if "name='" in query else "folder"
+        return await providers["drive"].respond(lambda: JSONResponse({"files": [{"id": f"folder-{name}", "name": name}]}))
+
+    async def drive_create_file(request: Request):
+        await request.body()
+        return await providers["drive"].respond(lambda: JSONResponse({"id": uuid.uuid4().hex}))
+
+    async def drive_start_upload(request: Request):
+        await request.body()
+        session_url = f"{str(request.base_url).rstrip('/')}/upload/drive/v3/sessions/{uuid.uuid4().hex}"
+        return await providers["drive"].respond(lambda: JSONResponse({}, headers={"location": session_url}))
+
+    async def drive_upload_content(request: Request):
+        content = await request.body()
+        return await providers["drive"].respond(lambda: JSONResponse({"id": store(content)}))
+
+    async def drive_get_file(request: Request):
+        file_id = request.path_params["file_id"]
+        if file_id not in drive_files:
+            return JSONResponse({"error": {"code": 404, "message": "File not found"}}, status_code=404)
+        if request.query_params.get("alt") == "media":
+            return await providers["drive"].respond(lambda: Response(drive_files[file_id], media_type="image/png"))
+        link = f"{str(request.base_url).rstrip('/')}/drive/v3/files/{file_id}?alt=media"
+        return await providers["drive"].respond(lambda: JSONResponse({"id": file_id, "webContentLink": link}))
+
+    async def drive_create_permission(request: Request):
+        await request.body()
+        return await providers["drive"].respond(lambda: JSONResponse({"id": "anyoneWithLink", "type": "anyone", "role": "reader"}))
+
+    # ------------------------- CONTROL -------------------------
+
+    async def stats(request: Request):
+        return JSONResponse({name: {"calls": p.calls, "errors": p.errors} for name, p in providers.items()})
+
+    return Starlette(routes=[
+        Route("/v1beta/models/{model_action}", gemini_generate_content, methods=["POST"]),
+        Route("/v1/images/generations", openai_images, methods=["POST"]),
+        Route("/v1/images/edits", openai_images, methods=["POST"]),
+        Route("/picsart/upscale", picsart_upscale, methods=["POST"]),
+        Route("/picsart/results/{name}", picsart_result, methods=["GET"]),
+        Route("/photoroom/v1/segment", photoroom_segment, methods=["POST"]),
+        Route("/drive/v3/files", drive_list_files, methods=["GET"]),
+        Route("/drive/v3/files", drive_create_file, methods=["POST"]),
+        Route("/upload/drive/v3/files", drive_start_upload, methods=["POST"]),
+        Route("/upload/drive/v3/sessions/{session_id}", drive_upload_content, methods=["PUT", "POST"]),
+        Route("/drive/v3/files/{file_id}", drive_get_file, methods=["GET"]),
+        Route("/drive/v3/files/{file_id}/permissions", drive_create_permission, methods=["POST"]),
+        Route("/_stats", stats, methods=["GET"]),
+    ])
+
+
+def load_config(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--config", default=DEFAULT_CONFIG)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    app = create_app(load_config(args.config), seed=args.seed)
+    # Keep idle connections open as long as the real APIs do, so pooled clients reuse them
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False, timeout_keep_alive=75)
+
+
+if __name__ == "__main__":
+    main()
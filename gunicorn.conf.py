@@ -0,0 +1,22 @@
+"""
+Gunicorn configuration.
+
+    gunicorn app:app -c gunicorn.conf.py
+
+Workers write metrics snapshots to METRICS_MULTIPROC_DIR so that /metrics on
+any worker reports totals for the whole server.
+"""
+import os
+import tempfile
+
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "image_gen_api_metrics"))
+
+
+def on_starting(server):
+    # Drop snapshots left over from a previous run before any worker starts
+    from backend.utils.metrics import clear_multiprocess_dir
+    clear_multiprocess_dir(os.environ["METRICS_MULTIPROC_DIR"])